@@ -1,38 +1,54 @@
 import streamlit as st
+import importlib
+import logging
 import sys
 import os
-from core.database import get_db, engine, Base, SessionLocal
-from core.crud import get_user_by_username, verify_password
-from core.backup import auto_restore_if_empty
+from core.bootstrap import initialize_process
 
 # Ensure project root is in path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from ui.login import login_page
 from ui.register import register_page
-from ui.admin_dashboard import admin_dashboard
-from ui.student_dashboard import student_dashboard
-from ui.calendar_view import calendar_view
-from ui.team_leader_dashboard import team_leader_dashboard
-from ui.group_chief_dashboard import group_chief_dashboard
-from ui.teacher_dashboard import teacher_dashboard
-
-def _init_and_restore():
-    """Crea tablas y restaura backup de GitHub si la BD está vacía."""
-    Base.metadata.create_all(bind=engine)
-    db = SessionLocal()
-    try:
-        msg = auto_restore_if_empty(db)
-        if msg:
-            st.toast(msg, icon="\u2705")
-    finally:
-        db.close()
+
+logger = logging.getLogger(__name__)
+
+# Rol -> (módulo, función) del panel. Cada panel (y lo que importa: pandas, el
+# motor GA, el backup) se carga la primera vez que alguien con ese rol lo abre.
+ROUTES = {
+    "SUPERADMIN": ("ui.admin_dashboard", "admin_dashboard"),
+    "TEACHER": ("ui.teacher_dashboard", "teacher_dashboard"),
+    "GROUP_CHIEF": ("ui.group_chief_dashboard", "group_chief_dashboard"),
+    "TEAM_LEADER": ("ui.team_leader_dashboard", "team_leader_dashboard"),
+    "TEAM_MEMBER": ("ui.student_dashboard", "student_dashboard"),
+}
+
+
+def _load_view(role):
+    """Retorna la función del panel de `role`, importando su módulo si hace falta, o None."""
+    route = ROUTES.get(role.value if hasattr(role, "value") else str(role))
+    if route is None:
+        return None
+    module_name, func_name = route
+    return getattr(importlib.import_module(module_name), func_name)
+
+@st.cache_resource(show_spinner=False)
+def _init_process():
+    """Inicialización única por proceso (tablas, triggers, restauración, warm-up); no se repite en cada rerun."""
+    report = initialize_process()
+    timings = ", ".join(f"{name} {ms} ms" for name, ms in report["timings"].items())
+    logger.info("init %s ms (%s)", report["total_ms"], timings)
+    return report
 
 
 def main():
     st.set_page_config(page_title="Sistema de Gestión de Laboratorio de Robótica", layout="wide")
 
-    _init_and_restore()
+    # El reporte cacheado es compartido entre sesiones: solo se lee, nunca se modifica
+    restore_message = _init_process()["restore_message"]
+    if restore_message and not st.session_state.get("restore_message_shown"):
+        st.session_state["restore_message_shown"] = True
+        st.toast(restore_message, icon="\u26a0\ufe0f" if restore_message.startswith("Error") else "\u2705")
 
     if "user" not in st.session_state:
         st.session_state["user"] = None
@@ -72,17 +88,9 @@ def main():
                 st.rerun()
 
         # Routing based on role
-        role = user['role']
-        if role == "SUPERADMIN":
-            admin_dashboard()
-        elif role == "TEACHER":
-            teacher_dashboard()
-        elif role == "GROUP_CHIEF":
-            group_chief_dashboard()
-        elif role == "TEAM_LEADER":
-            team_leader_dashboard()
-        elif role == "TEAM_MEMBER":
-            student_dashboard()
+        view = _load_view(user['role'])
+        if view is not None:
+            view()
         else:
             st.error("Rol desconocido")
 
@@ -0,0 +1,134 @@
+"""
+Authentication service: password checks on a bounded worker pool.
+
+bcrypt is CPU-bound and releases the GIL, so running it on a small thread pool keeps
+the Streamlit script threads responsive and caps how many hashes run at once when a
+whole group logs in together. Hashes made with a cost other than Config.BCRYPT_ROUNDS
+are upgraded (or downgraded) on the next successful login.
+"""
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import bcrypt
+from sqlalchemy.orm import Session
+from core.config import Config
+from core.crud import get_user_by_username, get_password_hash, verify_password
+
+_pool = None
+_pool_lock = threading.Lock()
+
+_metrics_lock = threading.Lock()
+_metrics = {"logins": 0, "failures": 0, "rehashes": 0, "in_flight": 0}
+_latencies = deque(maxlen=500)     # seconds per authenticate() call
+_queue_waits = deque(maxlen=500)   # seconds spent waiting for a pool worker
+
+# Checked when the username does not exist, so unknown users take as long as wrong
+# passwords. Built with the configured cost on first use, and rebuilt if it changes.
+_dummy_hash = {"rounds": None, "hash": None}
+_dummy_lock = threading.Lock()
+
+
+def _get_dummy_hash() -> bytes:
+    with _dummy_lock:
+        if _dummy_hash["rounds"] != Config.BCRYPT_ROUNDS:
+            _dummy_hash.update(
+                rounds=Config.BCRYPT_ROUNDS,
+                hash=bcrypt.hashpw(b"dummy-password", bcrypt.gensalt(Config.BCRYPT_ROUNDS)),
+            )
+        return _dummy_hash["hash"]
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=Config.AUTH_WORKERS, thread_name_prefix="auth")
+        return _pool
+
+
+def hash_cost(password_hash) -> int | None:
+    """Returns the bcrypt cost factor of a hash ("$2b$12$..." -> 12)."""
+    if isinstance(password_hash, bytes):
+        password_hash = password_hash.decode("ascii", "ignore")
+    try:
+        return int(password_hash.split("$")[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+
+def needs_rehash(password_hash) -> bool:
+    return hash_cost(password_hash) != Config.BCRYPT_ROUNDS
+
+
+def _run_in_pool(fn, *args):
+    """Runs fn on the auth pool and waits for it. Returns (result, seconds waited for a worker)."""
+    submitted = time.perf_counter()
+    started = []
+
+    def task():
+        started.append(time.perf_counter())
+        return fn(*args)
+
+    result = _get_pool().submit(task).result()
+    return result, started[0] - submitted
+
+
+def authenticate(db: Session, username: str, password: str):
+    """
+    Returns the user if the password is correct, None otherwise. Rehashes the stored
+    password when its cost differs from Config.BCRYPT_ROUNDS.
+    """
+    start = time.perf_counter()
+    with _metrics_lock:
+        _metrics["in_flight"] += 1
+    ok, rehashed, waited = False, False, 0.0
+    try:
+        user = get_user_by_username(db, username) if username else None
+        stored = user.password_hash if user else _get_dummy_hash()
+        ok, waited = _run_in_pool(verify_password, password or "", stored)
+        ok = ok and user is not None
+
+        if ok and needs_rehash(user.password_hash):
+            user.password_hash, _ = _run_in_pool(get_password_hash, password)
+            db.commit()
+            rehashed = True
+        return user if ok else None
+    finally:
+        elapsed = time.perf_counter() - start
+        with _metrics_lock:
+            _metrics["in_flight"] -= 1
+            _metrics["logins"] += 1
+            _metrics["failures"] += 0 if ok else 1
+            _metrics["rehashes"] += 1 if rehashed else 0
+            _latencies.append(elapsed)
+            _queue_waits.append(waited)
+
+
+def _percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 1)
+
+
+def get_login_metrics() -> dict:
+    """Login counters plus latency percentiles (ms) over the last 500 attempts."""
+    with _metrics_lock:
+        latencies, waits = list(_latencies), list(_queue_waits)
+        return {
+            **_metrics,
+            "p50_ms": _percentile(latencies, 0.5),
+            "p95_ms": _percentile(latencies, 0.95),
+            "max_ms": round(max(latencies) * 1000, 1) if latencies else None,
+            "queue_wait_p95_ms": _percentile(waits, 0.95),
+            "bcrypt_rounds": Config.BCRYPT_ROUNDS,
+            "workers": Config.AUTH_WORKERS,
+        }
+
+
+def reset_login_metrics():
+    with _metrics_lock:
+        _metrics.update(logins=0, failures=0, rehashes=0)
+        _latencies.clear()
+        _queue_waits.clear()
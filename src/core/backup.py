@@ -1,260 +1,755 @@
 """
-Backup & restore de la base de datos a JSON, con persistencia en GitHub.
+Backup & restore de la base de datos a JSON, con persistencia en GitHub o en un directorio local.
 """
 import json
-import base64
+import datetime
+import gzip
+import hashlib
+import io
 import os
-import requests
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from enum import Enum
+from sqlalchemy import select, delete, func, tuple_, DateTime
+from core.config import Config
+from core.backup_config import get_github_config
 from core.database import SessionLocal
+from core.transport import GitHubTransport, LocalDirTransport, TransportError
+from core.changelog import get_changed_keys, last_change_seq, prune_change_log, change_tracking_available
+from core.crud import invalidate_settings_cache, invalidate_schedule_cache
 from core.models import (
     User, Team, Availability, GroupBlock,
-    RoboticsClassSchedule, Reservation, SystemSetting
+    RoboticsClassSchedule, Reservation, SystemSetting, ScheduleVersion,
+    AvailabilityMask, GroupBlockMask, RoboticsClassMask, ChangeLog, ScheduleArtifact,
+    KEY_SETTINGS_VERSION
 )
 
-try:
-    import streamlit as st
-    _secrets = getattr(st, "secrets", {})
-except Exception:
-    _secrets = {}
-
-
-def _get_github_config():
-    """Obtiene la configuración de GitHub desde st.secrets o variables de entorno."""
-    gh = _secrets.get("github", {})
-    token = gh.get("token") or os.getenv("GITHUB_TOKEN", "")
-    repo = gh.get("repo") or os.getenv("GITHUB_REPO", "")
-    path = gh.get("backup_path") or os.getenv("GITHUB_BACKUP_PATH", "backup.json")
-    branch = gh.get("branch") or os.getenv("GITHUB_BACKUP_BRANCH", "main")
-    return token, repo, path, branch
-
-
 # ---------------------------------------------------------------------------
 # Export
 # ---------------------------------------------------------------------------
 
+# (clave JSON, modelo, columnas) en orden de dependencias: los padres primero.
+BACKUP_TABLES = [
+    ("teams", Team, ["id", "name", "group_name", "is_locked"]),
+    ("users", User, ["id", "username", "password_hash", "full_name", "role", "team_id", "group_name"]),
+    ("availabilities", Availability, ["id", "user_id", "day_of_week", "period"]),
+    ("group_blocks", GroupBlock, ["id", "group_name", "day_of_week", "period"]),
+    ("robotics_class_schedule", RoboticsClassSchedule, ["id", "teacher_id", "group_name", "day_of_week", "period"]),
+    ("reservations", Reservation, ["id", "team_id", "day_of_week", "period", "is_manual", "is_robotics_class", "group_name"]),
+    ("system_settings", SystemSetting, ["key", "value"]),
+    ("schedule_versions", ScheduleVersion, ["id", "created_at", "snapshot"]),
+    ("availability_masks", AvailabilityMask, ["user_id", "mask"]),
+    ("group_block_masks", GroupBlockMask, ["group_name", "mask"]),
+    ("robotics_class_masks", RoboticsClassMask, ["teacher_id", "group_name", "mask"]),
+]
+
+EXPORT_CHUNK_SIZE = 1000
+
+
+def _json_value(value):
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    return value
+
+
+def iter_table_rows(db, model, columns, chunk_size=EXPORT_CHUNK_SIZE):
+    """Recorre una tabla como tuplas de columnas, leyendo `chunk_size` filas a la vez."""
+    stmt = select(*[getattr(model, c) for c in columns]).order_by(*model.__table__.primary_key.columns)
+    for row in db.execute(stmt.execution_options(yield_per=chunk_size)):
+        yield {c: _json_value(v) for c, v in zip(columns, row)}
+
+
+def get_backup_stats(db) -> dict:
+    """Número de filas por tabla del backup, con un COUNT(*) por tabla en una sola consulta."""
+    counts = select(*[
+        select(func.count()).select_from(model.__table__).scalar_subquery().label(key)
+        for key, model, columns in BACKUP_TABLES
+    ])
+    return dict(db.execute(counts).one()._mapping)
+
+
+def get_table_page(db, key, limit=50, offset=0) -> list:
+    """Una página de filas (como en el JSON del backup) de la tabla `key` de BACKUP_TABLES."""
+    model, columns = next((m, c) for k, m, c in BACKUP_TABLES if k == key)
+    stmt = select(*[getattr(model, c) for c in columns]).order_by(
+        *model.__table__.primary_key.columns
+    ).limit(limit).offset(offset)
+    return [{c: _json_value(v) for c, v in zip(columns, row)} for row in db.execute(stmt)]
+
+
 def export_db_to_json(db) -> dict:
     """Serializa todas las tablas de la BD a un diccionario."""
-    data = {}
-
-    data["teams"] = [
-        {"id": t.id, "name": t.name, "group_name": t.group_name.value, "is_locked": t.is_locked}
-        for t in db.query(Team).all()
-    ]
-
-    data["users"] = [
-        {
-            "id": u.id,
-            "username": u.username,
-            "password_hash": u.password_hash,
-            "full_name": u.full_name,
-            "role": u.role.value,
-            "team_id": u.team_id,
-            "group_name": u.group_name.value if u.group_name else None,
-        }
-        for u in db.query(User).all()
-    ]
-
-    data["availabilities"] = [
-        {"id": a.id, "user_id": a.user_id, "day_of_week": a.day_of_week, "period": a.period}
-        for a in db.query(Availability).all()
-    ]
-
-    data["group_blocks"] = [
-        {"id": b.id, "group_name": b.group_name.value, "day_of_week": b.day_of_week, "period": b.period}
-        for b in db.query(GroupBlock).all()
-    ]
-
-    data["robotics_class_schedule"] = [
-        {
-            "id": r.id,
-            "teacher_id": r.teacher_id,
-            "group_name": r.group_name.value,
-            "day_of_week": r.day_of_week,
-            "period": r.period,
-        }
-        for r in db.query(RoboticsClassSchedule).all()
-    ]
-
-    data["reservations"] = [
-        {
-            "id": r.id,
-            "team_id": r.team_id,
-            "day_of_week": r.day_of_week,
-            "period": r.period,
-            "is_manual": r.is_manual,
-            "is_robotics_class": r.is_robotics_class,
-            "group_name": r.group_name.value if r.group_name else None,
-        }
-        for r in db.query(Reservation).all()
-    ]
+    return {
+        key: list(iter_table_rows(db, model, columns))
+        for key, model, columns in BACKUP_TABLES
+    }
 
-    data["system_settings"] = [
-        {"key": s.key, "value": s.value}
-        for s in db.query(SystemSetting).all()
-    ]
 
-    return data
+def stream_db_to_json(db, fp, chunk_size=EXPORT_CHUNK_SIZE) -> dict:
+    """
+    Escribe el mismo JSON que export_db_to_json directamente en `fp` (texto),
+    tabla por tabla y en bloques, sin mantener la BD completa en memoria.
+    Retorna el número de filas escritas por tabla.
+    """
+    counts = {}
+    fp.write("{")
+    for i, (key, model, columns) in enumerate(BACKUP_TABLES):
+        if i:
+            fp.write(",")
+        fp.write(json.dumps(key) + ":[")
+        n = 0
+        for row in iter_table_rows(db, model, columns, chunk_size):
+            if n:
+                fp.write(",")
+            fp.write(json.dumps(row, ensure_ascii=False, separators=(",", ":")))
+            n += 1
+        fp.write("]")
+        counts[key] = n
+    fp.write("}")
+    return counts
 
 
 # ---------------------------------------------------------------------------
-# Import
+# Formato compacto (gzip + cabecera con versión, conteos y hash)
 # ---------------------------------------------------------------------------
+#
+# Un backup compacto es un stream gzip con dos partes separadas por "\n":
+#   1. Cabecera JSON: {"format", "schema_version", "created_at", "counts", "sha256"}
+#   2. Cuerpo: el mismo JSON que export_db_to_json, sin espacios.
+# `sha256` es el hash del cuerpo, así que dos backups de la misma BD tienen el
+# mismo hash. Los backups antiguos (JSON plano) se siguen leyendo.
+
+BACKUP_FORMAT = "robolab-backup"
+BACKUP_SCHEMA_VERSION = 1
+_GZIP_MAGIC = b"\x1f\x8b"
+
+
+class _HashingSink:
+    """Sink de texto que escribe UTF-8 en un archivo binario y calcula su SHA-256."""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.sha = hashlib.sha256()
+
+    def write(self, text):
+        data = text.encode("utf-8") if isinstance(text, str) else text
+        self.sha.update(data)
+        self.raw.write(data)
+
+
+def _write_envelope(fp, fmt, write_body, **extra) -> dict:
+    """
+    Escribe cabecera + cuerpo comprimidos en el archivo binario `fp`. `write_body(sink)`
+    escribe el cuerpo y retorna los conteos por tabla. Retorna la cabecera.
+    """
+    with tempfile.TemporaryFile() as body:
+        sink = _HashingSink(body)
+        counts = write_body(sink)
+        header = {
+            "format": fmt,
+            "schema_version": BACKUP_SCHEMA_VERSION,
+            "created_at": datetime.datetime.utcnow().isoformat(),
+            "counts": counts,
+            "sha256": sink.sha.hexdigest(),
+            **extra,
+        }
+        body.seek(0)
+        with gzip.GzipFile(fileobj=fp, mode="wb", mtime=0) as gz:
+            gz.write(json.dumps(header, separators=(",", ":")).encode() + b"\n")
+            shutil.copyfileobj(body, gz)
+    return header
 
-def import_db_from_json(db, data: dict):
-    """Restaura la BD desde un diccionario JSON. Borra datos existentes primero."""
-    # Orden de borrado: tablas dependientes primero
-    db.query(Availability).delete()
-    db.query(RoboticsClassSchedule).delete()
-    db.query(Reservation).delete()
-    db.query(GroupBlock).delete()
-    db.query(SystemSetting).delete()
-    db.query(User).delete()
-    db.query(Team).delete()
-    db.commit()
-
-    # Restaurar teams
-    for t in data.get("teams", []):
-        db.execute(
-            Team.__table__.insert().values(
-                id=t["id"], name=t["name"], group_name=t["group_name"], is_locked=t.get("is_locked", False)
-            )
-        )
 
-    # Restaurar users
-    for u in data.get("users", []):
-        db.execute(
-            User.__table__.insert().values(
-                id=u["id"],
-                username=u["username"],
-                password_hash=u["password_hash"],
-                full_name=u["full_name"],
-                role=u["role"],
-                team_id=u.get("team_id"),
-                group_name=u.get("group_name"),
-            )
-        )
+def _read_envelope(raw: bytes, fmt):
+    """Descomprime y valida un archivo compacto. Retorna (cabecera, cuerpo decodificado)."""
+    header, body = _open_envelope(raw, fmt)
+    return header, json.loads(body)
 
-    # Restaurar availabilities
-    for a in data.get("availabilities", []):
-        db.execute(
-            Availability.__table__.insert().values(
-                id=a["id"], user_id=a["user_id"], day_of_week=a["day_of_week"], period=a["period"]
-            )
-        )
 
-    # Restaurar group_blocks
-    for b in data.get("group_blocks", []):
-        db.execute(
-            GroupBlock.__table__.insert().values(
-                id=b["id"], group_name=b["group_name"], day_of_week=b["day_of_week"], period=b["period"]
-            )
-        )
+def _open_envelope(raw: bytes, fmt):
+    """Descomprime y valida un archivo compacto. Retorna (cabecera, cuerpo en bytes)."""
+    header_line, _, body = gzip.decompress(raw).partition(b"\n")
+    header = json.loads(header_line)
+    if header.get("format") != fmt or header.get("schema_version", 0) > BACKUP_SCHEMA_VERSION:
+        raise ValueError(f"Formato de backup no soportado: {header.get('format')} v{header.get('schema_version')}")
+    if hashlib.sha256(body).hexdigest() != header.get("sha256"):
+        raise ValueError("El hash del backup no coincide; el archivo está corrupto.")
+    return header, body
 
-    # Restaurar robotics_class_schedule
-    for r in data.get("robotics_class_schedule", []):
-        db.execute(
-            RoboticsClassSchedule.__table__.insert().values(
-                id=r["id"],
-                teacher_id=r["teacher_id"],
-                group_name=r["group_name"],
-                day_of_week=r["day_of_week"],
-                period=r["period"],
-            )
-        )
 
-    # Restaurar reservations
-    for r in data.get("reservations", []):
-        db.execute(
-            Reservation.__table__.insert().values(
-                id=r["id"],
-                team_id=r.get("team_id"),
-                day_of_week=r["day_of_week"],
-                period=r["period"],
-                is_manual=r.get("is_manual", False),
-                is_robotics_class=r.get("is_robotics_class", False),
-                group_name=r.get("group_name"),
-            )
-        )
+def write_backup(db, fp, **extra) -> dict:
+    """
+    Escribe un backup compacto de la BD en el archivo binario `fp`.
+    El cuerpo se genera en streaming a un temporal y luego se comprime. Retorna la cabecera.
+    """
+    return _write_envelope(fp, BACKUP_FORMAT, lambda sink: stream_db_to_json(db, sink), **extra)
 
-    # Restaurar system_settings
-    for s in data.get("system_settings", []):
-        db.execute(
-            SystemSetting.__table__.insert().values(key=s["key"], value=s["value"])
-        )
 
-    db.commit()
+def read_backup_header(raw: bytes) -> dict | None:
+    """Retorna la cabecera de un backup compacto, o None si es un backup JSON antiguo."""
+    if not raw.startswith(_GZIP_MAGIC):
+        return None
+    with gzip.GzipFile(fileobj=io.BytesIO(raw)) as gz:
+        return json.loads(gz.readline())
+
+
+def read_backup(raw: bytes) -> dict:
+    """
+    Decodifica un backup (compacto o JSON antiguo) al diccionario de tablas.
+    Lanza ValueError si la versión no es compatible o el hash no coincide.
+    """
+    if not raw.startswith(_GZIP_MAGIC):
+        return json.loads(raw.decode("utf-8"))
+    return _read_envelope(raw, BACKUP_FORMAT)[1]
 
 
 # ---------------------------------------------------------------------------
-# GitHub persistence
+# Backups incrementales (deltas sobre el último snapshot completo)
 # ---------------------------------------------------------------------------
+#
+# En remoto se guardan: el snapshot completo (`path`), los deltas posteriores
+# (`path.delta-0001`, ...) y un manifiesto (`path.manifest.json`) con el orden
+# en que se aplican. El change_log local contiene exactamente los cambios aún
+# no subidos; tras subir un delta o un snapshot se poda.
+
+DELTA_FORMAT = "robolab-delta"
+MANIFEST_FORMAT = "robolab-manifest"
+
+
+def _key_columns(model):
+    return [c.name for c in model.__table__.primary_key.columns]
+
+
+def build_delta(db, since=0):
+    """
+    Retorna (to_seq, delta) con el estado actual de cada fila cambiada después de `since`.
+    delta = {"upserts": {tabla: [filas]}, "deletes": {tabla: [claves]}}.
+    """
+    to_seq, changed = get_changed_keys(db, since)
+    upserts, deletes = {}, {}
+    for key, model, columns in BACKUP_TABLES:
+        keys = changed.get(model.__tablename__)
+        if not keys:
+            continue
+        pk = _key_columns(model)
+        pk_cols = [getattr(model, c) for c in pk]
+        key_list = sorted(keys)
+        found = {}
+        for i in range(0, len(key_list), EXPORT_CHUNK_SIZE):
+            chunk = key_list[i:i + EXPORT_CHUNK_SIZE]
+            if len(pk_cols) > 1:
+                condition = tuple_(*pk_cols).in_(chunk)
+            else:
+                condition = pk_cols[0].in_([k[0] for k in chunk])
+            for row in db.execute(select(*[getattr(model, c) for c in columns]).where(condition)):
+                values = {c: _json_value(v) for c, v in zip(columns, row)}
+                found[tuple(values[c] for c in pk)] = values
+        upserts[key] = list(found.values())
+        deletes[key] = [list(k) for k in key_list if k not in found]
+    return to_seq, {"upserts": upserts, "deletes": deletes}
+
+
+def write_delta(fp, delta, **extra) -> dict:
+    """Escribe un delta en formato compacto. Retorna la cabecera."""
+    def write_body(sink):
+        sink.write(json.dumps(delta, ensure_ascii=False, separators=(",", ":")))
+        return {k: len(v) for k, v in delta["upserts"].items()}
+    return _write_envelope(fp, DELTA_FORMAT, write_body, **extra)
+
+
+def read_delta(raw: bytes) -> dict:
+    return _read_envelope(raw, DELTA_FORMAT)[1]
+
+
+def apply_delta_to_data(data: dict, delta: dict) -> dict:
+    """Aplica un delta sobre un diccionario de backup (in place) y lo retorna."""
+    for key, model, columns in BACKUP_TABLES:
+        pk = _key_columns(model)
+        upserts = delta["upserts"].get(key, [])
+        drop = set(tuple(k) for k in delta["deletes"].get(key, []))
+        if not upserts and not drop:
+            continue
+        drop |= set(tuple(r[c] for c in pk) for r in upserts)
+        rows = [r for r in data.get(key, []) if tuple(r[c] for c in pk) not in drop]
+        rows.extend(upserts)
+        rows.sort(key=lambda r: tuple(r[c] for c in pk))  # mismo orden que el export
+        data[key] = rows
+    return data
 
-def save_backup_to_github(data: dict) -> str:
-    """Guarda el JSON de backup en el repositorio de GitHub. Retorna mensaje de estado."""
-    token, repo, path, branch = _get_github_config()
-    if not token or not repo:
-        return "Error: Configura GITHUB_TOKEN y GITHUB_REPO en st.secrets o variables de entorno."
-
-    url = f"https://api.github.com/repos/{repo}/contents/{path}"
-    headers = {"Authorization": f"token {token}", "Accept": "application/vnd.github.v3+json"}
-
-    # Obtener SHA del archivo si ya existe (necesario para actualizar)
-    sha = None
-    resp = requests.get(url, headers=headers, params={"ref": branch})
-    if resp.status_code == 200:
-        sha = resp.json().get("sha")
-
-    content = base64.b64encode(json.dumps(data, ensure_ascii=False, indent=2).encode()).decode()
-    payload = {
-        "message": "Auto-backup base de datos",
-        "content": content,
-        "branch": branch,
-    }
-    if sha:
-        payload["sha"] = sha
 
-    resp = requests.put(url, headers=headers, json=payload)
-    if resp.status_code in (200, 201):
-        return "Backup guardado en GitHub exitosamente."
-    return f"Error al guardar backup: {resp.status_code} - {resp.text}"
+# ---------------------------------------------------------------------------
+# Import
+# ---------------------------------------------------------------------------
+
+# Durante una restauración se relaja la durabilidad de SQLite; se restablece al terminar.
+_RESTORE_PRAGMAS = {"synchronous": "OFF", "journal_mode": "MEMORY"}
+
+
+@contextmanager
+def _relaxed_durability(conn):
+    """Relaja los pragmas de durabilidad de SQLite en `conn` y los restaura al salir."""
+    if conn.dialect.name != "sqlite":
+        yield
+        return
+    previous = {}
+    for name, value in _RESTORE_PRAGMAS.items():
+        current = conn.exec_driver_sql(f"PRAGMA {name}").scalar()
+        if name == "journal_mode" and str(current).lower() == "wal":
+            continue  # salir de WAL requiere acceso exclusivo; se deja como está
+        previous[name] = current
+        conn.exec_driver_sql(f"PRAGMA {name} = {value}")
+    try:
+        yield
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        for name, value in previous.items():
+            conn.exec_driver_sql(f"PRAGMA {name} = {value}")
+        conn.commit()
+
+
+def _column_converters(model, columns):
+    """Para cada columna: (valor por defecto, conversión desde JSON)."""
+    converters = {}
+    for c in columns:
+        col = model.__table__.columns[c]
+        default = col.default.arg if col.default is not None and col.default.is_scalar else None
+        parse = datetime.datetime.fromisoformat if isinstance(col.type, DateTime) else None
+        converters[c] = (default, parse)
+    return converters
+
+
+def _prepare_rows(model, columns, rows):
+    converters = _column_converters(model, columns)
+    prepared = []
+    for r in rows:
+        row = {}
+        for c, (default, parse) in converters.items():
+            value = r.get(c, default)
+            if parse is not None and isinstance(value, str):
+                value = parse(value)
+            row[c] = value
+        prepared.append(row)
+    return prepared
+
+
+def _settings_version(conn) -> int:
+    value = conn.execute(select(SystemSetting.value).where(SystemSetting.key == KEY_SETTINGS_VERSION)).scalar()
+    return int(value or 0)
+
+
+def _bump_settings_version_past(conn, previous: int):
+    """
+    Lo restaurado trae la versión de ajustes del backup, que puede coincidir con la que
+    otro proceso tiene en caché y dejarlo sirviendo ajustes viejos. Se deja por encima
+    tanto de la anterior a restaurar (`previous`) como de la restaurada.
+    """
+    version = max(previous, _settings_version(conn)) + 1
+    conn.execute(delete(SystemSetting.__table__).where(SystemSetting.key == KEY_SETTINGS_VERSION))
+    conn.execute(SystemSetting.__table__.insert().values(key=KEY_SETTINGS_VERSION, value=str(version)))
+
+
+def import_db_from_json(db, data: dict) -> dict:
+    """
+    Restaura la BD desde un diccionario JSON. Borra datos existentes primero.
+    Todo ocurre en una sola transacción, con un executemany por tabla.
+    Retorna {tabla: {"rows", "seconds", "rows_per_sec"}}.
+    """
+    # La restauración usa su propia conexión; la sesión no debe retener la BD.
+    db.close()
+    stats = {}
+    with db.get_bind().connect() as conn:
+        with _relaxed_durability(conn):
+            previous_version = _settings_version(conn)
+            # Los artefactos (feeds iCalendar) se derivan de las versiones: se regeneran al leerlos
+            conn.execute(ScheduleArtifact.__table__.delete())
+            # Orden de borrado: tablas dependientes primero
+            for key, model, columns in reversed(BACKUP_TABLES):
+                conn.execute(model.__table__.delete())
+
+            for key, model, columns in BACKUP_TABLES:
+                rows = _prepare_rows(model, columns, data.get(key, []))
+                start = time.perf_counter()
+                if rows:
+                    conn.execute(model.__table__.insert(), rows)
+                elapsed = time.perf_counter() - start
+                stats[key] = {
+                    "rows": len(rows),
+                    "seconds": round(elapsed, 4),
+                    "rows_per_sec": round(len(rows) / elapsed) if rows and elapsed > 0 else 0,
+                }
+            _bump_settings_version_past(conn, previous_version)
+            # Lo restaurado ya coincide con el backup: no hay cambios pendientes de subir
+            conn.execute(ChangeLog.__table__.delete())
+            conn.commit()
+
+    invalidate_settings_cache()
+    invalidate_schedule_cache()
+    return stats
+
+
+# ---------------------------------------------------------------------------
+# Snapshot SQLite (API de backup en línea)
+# ---------------------------------------------------------------------------
+#
+# Alternativa al JSON para despliegues SQLite: el cuerpo del archivo compacto es
+# una copia página a página de la BD hecha con sqlite3.Connection.backup, que
+# avanza por pasos y deja escribir a otras conexiones entre paso y paso.
+# Restaurar es reemplazar el archivo de la BD (o copiar páginas si es en memoria).
 
+SNAPSHOT_FORMAT = "robolab-sqlite"
+SNAPSHOT_PAGES_PER_STEP = 1024
+
+
+def _sqlite_file(engine):
+    """Ruta del archivo SQLite del engine, o None si es en memoria."""
+    database = engine.url.database
+    if not database or database == ":memory:" or database.startswith("file::memory:"):
+        return None
+    return database
+
+
+def supports_sqlite_snapshot(db) -> bool:
+    return db.get_bind().dialect.name == "sqlite"
+
+
+@contextmanager
+def _sqlite_copy(engine, pages_per_step=SNAPSHOT_PAGES_PER_STEP):
+    """Copia consistente de la BD a un archivo temporal; produce su ruta."""
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    try:
+        raw_conn = engine.raw_connection()
+        try:
+            dst = sqlite3.connect(path)
+            try:
+                raw_conn.driver_connection.backup(dst, pages=pages_per_step)
+            finally:
+                dst.close()
+        finally:
+            raw_conn.close()
+        yield path
+    finally:
+        os.remove(path)
+
+
+def write_sqlite_snapshot(db, fp, pages_per_step=SNAPSHOT_PAGES_PER_STEP, **extra) -> dict:
+    """
+    Escribe un snapshot SQLite de la BD en el archivo binario `fp`, con la misma
+    cabecera (conteos y hash) que los backups compactos. Retorna la cabecera.
+    """
+    def write_body(sink):
+        with _sqlite_copy(db.get_bind(), pages_per_step) as path:
+            copy = sqlite3.connect(path)
+            try:
+                counts = {
+                    key: copy.execute(f'SELECT COUNT(*) FROM "{model.__tablename__}"').fetchone()[0]
+                    for key, model, columns in BACKUP_TABLES
+                }
+            finally:
+                copy.close()
+            with open(path, "rb") as f:
+                shutil.copyfileobj(f, sink)
+        return counts
+    return _write_envelope(fp, SNAPSHOT_FORMAT, write_body, **extra)
+
+
+def restore_sqlite_snapshot(db, raw: bytes) -> dict:
+    """
+    Restaura la BD desde un snapshot SQLite reemplazando el archivo de la BD
+    (engine.dispose() cierra antes las conexiones del pool). Lanza ValueError si
+    el snapshot no es válido. Retorna {"bytes", "seconds"}.
+    """
+    start = time.perf_counter()
+    header, body = _open_envelope(raw, SNAPSHOT_FORMAT)
+    engine = db.get_bind()
+    db.close()
+    with engine.connect() as conn:
+        previous_version = _settings_version(conn)
+
+    path = _sqlite_file(engine)
+    fd, tmp = tempfile.mkstemp(suffix=".db", dir=os.path.dirname(os.path.abspath(path)) if path else None)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(body)
+        check = sqlite3.connect(tmp)
+        try:
+            if check.execute("PRAGMA quick_check").fetchone()[0] != "ok":
+                raise ValueError("El snapshot SQLite está dañado.")
+            if path is None:
+                # BD en memoria: se copian las páginas sobre la conexión viva
+                raw_conn = engine.raw_connection()
+                try:
+                    check.backup(raw_conn.driver_connection)
+                finally:
+                    raw_conn.close()
+        finally:
+            check.close()
+
+        if path is not None:
+            engine.dispose()
+            # Un WAL o journal del archivo anterior no debe aplicarse al nuevo
+            for suffix in ("-wal", "-shm", "-journal"):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+            os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+    with engine.begin() as conn:
+        _bump_settings_version_past(conn, previous_version)
+        conn.execute(ChangeLog.__table__.delete())
+    invalidate_settings_cache()
+    invalidate_schedule_cache()
+    return {"bytes": len(body), "seconds": round(time.perf_counter() - start, 4)}
+
+
+def apply_delta_to_db(conn, delta: dict):
+    """Aplica un delta directamente sobre la BD (por ejemplo, tras restaurar un snapshot SQLite)."""
+    for key, model, columns in reversed(BACKUP_TABLES):
+        keys = delta["deletes"].get(key)
+        if not keys:
+            continue
+        pk_cols = list(model.__table__.primary_key.columns)
+        if len(pk_cols) > 1:
+            condition = tuple_(*pk_cols).in_([tuple(k) for k in keys])
+        else:
+            condition = pk_cols[0].in_([k[0] for k in keys])
+        conn.execute(delete(model.__table__).where(condition))
+    for key, model, columns in BACKUP_TABLES:
+        rows = delta["upserts"].get(key)
+        if rows:
+            conn.execute(model.__table__.insert().prefix_with("OR REPLACE"), _prepare_rows(model, columns, rows))
+
+
+# ---------------------------------------------------------------------------
+# Persistencia (GitHub o directorio local, ver core.transport)
+# ---------------------------------------------------------------------------
 
-def load_backup_from_github() -> dict | None:
-    """Descarga el JSON de backup desde GitHub. Retorna dict o None."""
-    token, repo, path, branch = _get_github_config()
-    if not token or not repo:
+# Transporte por configuración, para reutilizar la sesión HTTP entre backups
+_transport_cache = {"key": None, "transport": None}
+
+
+def _get_transport():
+    """
+    Retorna el transporte configurado en Config.BACKUP_TRANSPORT ('github' o 'local'),
+    o None si GitHub no está configurado.
+    """
+    if Config.BACKUP_TRANSPORT == "local":
+        key = ("local", Config.BACKUP_LOCAL_DIR, Config.BACKUP_CHUNK_SIZE)
+        factory = lambda: LocalDirTransport(Config.BACKUP_LOCAL_DIR, chunk_size=Config.BACKUP_CHUNK_SIZE)
+    else:
+        token, repo, _, branch = get_github_config()
+        if not token or not repo:
+            return None
+        key = ("github", token, repo, branch, Config.GITHUB_API_URL, Config.BACKUP_CHUNK_SIZE)
+        factory = lambda: GitHubTransport(
+            token, repo, branch, api_url=Config.GITHUB_API_URL, chunk_size=Config.BACKUP_CHUNK_SIZE
+        )
+    if _transport_cache["key"] != key:
+        _transport_cache.update(key=key, transport=factory())
+    return _transport_cache["transport"]
+
+
+_NOT_CONFIGURED = "Error: Configura GITHUB_TOKEN y GITHUB_REPO en st.secrets o variables de entorno."
+
+
+def _save_backup_files(files: dict) -> str:
+    """Escribe {ruta: bytes o None} en un único commit del transporte. Retorna mensaje de estado."""
+    transport = _get_transport()
+    if transport is None:
+        return _NOT_CONFIGURED
+    try:
+        transport.put(files)
+    except TransportError as e:
+        return f"Error al guardar backup: {e}"
+    return f"Backup guardado en {transport.label} exitosamente."
+
+
+def restore_latest_backup(db) -> dict | None:
+    """
+    Restaura el último backup remoto, sea JSON o snapshot SQLite, más sus deltas.
+    Retorna las estadísticas de la restauración, o None si no hay backup con usuarios.
+    Lanza ValueError si el backup está corrupto.
+    """
+    manifest = _load_manifest()
+    raw = load_backup_bytes_from_github(manifest["full"]["path"] if manifest else None)
+    if raw is None:
         return None
+    deltas = _load_deltas(manifest)
+
+    header = read_backup_header(raw)
+    if header and header["format"] == SNAPSHOT_FORMAT:
+        engine = db.get_bind()
+        stats = restore_sqlite_snapshot(db, raw)
+        with engine.begin() as conn:
+            previous_version = _settings_version(conn)
+            for delta in deltas:
+                apply_delta_to_db(conn, delta)
+            _bump_settings_version_past(conn, previous_version)
+            conn.execute(ChangeLog.__table__.delete())
+        invalidate_settings_cache()
+        invalidate_schedule_cache()
+        return {"snapshot": stats}
+
+    data = read_backup(raw)
+    for delta in deltas:
+        apply_delta_to_data(data, delta)
+    if not data.get("users"):
+        return None
+    return import_db_from_json(db, data)
+
+
+def _load_deltas(manifest) -> list:
+    """Descarga y decodifica, en orden, los deltas listados en el manifiesto."""
+    deltas = []
+    for entry in (manifest or {}).get("deltas", []):
+        delta_raw = load_backup_bytes_from_github(entry["path"])
+        if delta_raw is None:
+            raise ValueError(f"Falta el delta {entry['path']} listado en el manifiesto.")
+        deltas.append(read_delta(delta_raw))
+    return deltas
+
+
+def _manifest_path():
+    return get_github_config()[2] + ".manifest.json"
 
-    url = f"https://api.github.com/repos/{repo}/contents/{path}"
-    headers = {"Authorization": f"token {token}", "Accept": "application/vnd.github.v3+json"}
 
-    resp = requests.get(url, headers=headers, params={"ref": branch})
-    if resp.status_code != 200:
+def _load_manifest() -> dict | None:
+    raw = load_backup_bytes_from_github(_manifest_path())
+    if raw is None:
         return None
+    manifest = json.loads(raw)
+    return manifest if manifest.get("format") == MANIFEST_FORMAT else None
 
-    content = resp.json().get("content", "")
-    raw = base64.b64decode(content).decode()
-    return json.loads(raw)
+
+def _encode_manifest(manifest: dict) -> bytes:
+    return json.dumps(manifest, indent=1).encode()
+
+
+def load_backup_bytes_from_github(path: str | None = None) -> bytes | None:
+    """
+    Descarga el contenido crudo de `path` (o del backup configurado), verificando
+    sus partes si está dividido. Retorna bytes o None; lanza ValueError si está corrupto.
+    """
+    transport = _get_transport()
+    if transport is None:
+        return None
+    try:
+        return transport.get(path or get_github_config()[2])
+    except TransportError as e:
+        raise ValueError(str(e)) from e
 
 
 # ---------------------------------------------------------------------------
 # Helper de alto nivel
 # ---------------------------------------------------------------------------
 
-def trigger_backup(db):
-    """Exporta la BD y la guarda en GitHub. Retorna mensaje de estado."""
-    data = export_db_to_json(db)
-    return save_backup_to_github(data)
+# Serializa los backups manuales y los del worker de auto-backup
+_backup_lock = threading.Lock()
+
+
+def trigger_backup(db, force=False, full=False):
+    """
+    Guarda un backup. Normalmente sube solo un delta con los cambios registrados
+    en change_log; sube un snapshot completo si no hay manifiesto, si se acumularon
+    Config.BACKUP_FULL_EVERY deltas o si `full` es True. El archivo y el manifiesto
+    se escriben juntos en un solo commit. Retorna mensaje de estado.
+    """
+    with _backup_lock:
+        return _trigger_backup(db, force, full)
+
+
+def _trigger_backup(db, force, full):
+    if _get_transport() is None:
+        return _NOT_CONFIGURED
+    try:
+        manifest = _load_manifest()
+    except ValueError as e:
+        return f"Error al leer el manifiesto: {e}"
+    # Sin triggers (BD no SQLite) no hay deltas: siempre snapshot completo, omitido si no cambió
+    if (full or manifest is None or len(manifest["deltas"]) >= Config.BACKUP_FULL_EVERY
+            or not change_tracking_available(db.get_bind())):
+        return _upload_full_backup(db, force, manifest)
+
+    to_seq, delta = build_delta(db)
+    if to_seq == 0:
+        return "Sin cambios desde el último backup; no se subió nada."
+
+    path = f"{manifest['full']['path']}.delta-{len(manifest['deltas']) + 1:04d}"
+    manifest["deltas"].append({"path": path, "sha256": None, "change_seq": to_seq})
+    with tempfile.TemporaryFile() as tmp:
+        header = write_delta(tmp, delta, change_seq=to_seq)
+        manifest["deltas"][-1]["sha256"] = header["sha256"]
+        tmp.seek(0)
+        msg = _save_backup_files({path: tmp.read(), _manifest_path(): _encode_manifest(manifest)})
+    if msg.startswith("Error"):
+        return msg
+    prune_change_log(db, to_seq)
+    return f"Backup incremental guardado en {_get_transport().label} ({sum(header['counts'].values())} filas cambiadas)."
+
+
+def _upload_full_backup(db, force=False, old_manifest=None):
+    """
+    Sube un snapshot completo (JSON, o SQLite si Config.BACKUP_FULL_FORMAT == 'sqlite'),
+    reinicia el manifiesto borrando los deltas anteriores y poda change_log.
+    Solo se omite si el remoto ya es exactamente ese snapshot: manifiesto sin deltas,
+    change_log vacío y mismo hash. Con deltas en el manifiesto el hash del snapshot
+    anterior no dice nada (un cambio revertido vuelve a dar el mismo hash).
+    """
+    seq = last_change_seq(db)
+    path = get_github_config()[2]
+    use_sqlite = Config.BACKUP_FULL_FORMAT == "sqlite" and supports_sqlite_snapshot(db)
+    with tempfile.TemporaryFile() as tmp:
+        if use_sqlite:
+            header = write_sqlite_snapshot(db, tmp, change_seq=seq)
+        else:
+            header = write_backup(db, tmp, change_seq=seq)
+        unchanged = (
+            old_manifest is not None and not old_manifest["deltas"] and seq == 0
+            and old_manifest["full"]["sha256"] == header["sha256"]
+        )
+        if unchanged and not force:
+            return "Sin cambios desde el último backup; no se subió nada."
+        manifest = {
+            "format": MANIFEST_FORMAT,
+            "full": {"path": path, "format": header["format"], "sha256": header["sha256"], "change_seq": seq},
+            "deltas": [],
+        }
+        files = {entry["path"]: None for entry in (old_manifest or {}).get("deltas", [])}
+        tmp.seek(0)
+        files[path] = tmp.read()
+        files[_manifest_path()] = _encode_manifest(manifest)
+        msg = _save_backup_files(files)
+    if msg.startswith("Error"):
+        return msg
+    prune_change_log(db, seq)
+    return msg
 
 
 def auto_restore_if_empty(db):
-    """Si la BD está vacía (sin usuarios), intenta restaurar desde GitHub."""
+    """
+    Si la BD está vacía (sin usuarios), intenta restaurar desde el backup.
+    Los errores (token inválido, rama inexistente, backup corrupto...) se reportan
+    en el mensaje en lugar de lanzarse: la app arranca con la BD vacía.
+    """
     user_count = db.query(User).count()
     if user_count > 0:
         return None  # BD tiene datos, no restaurar
 
-    data = load_backup_from_github()
-    if data and data.get("users"):
-        import_db_from_json(db, data)
+    try:
+        restored = restore_latest_backup(db)
+    except (TransportError, ValueError) as e:
+        db.rollback()
+        return f"Error al restaurar el backup al iniciar: {e}"
+    if restored is not None:
         return "Base de datos restaurada desde backup de GitHub."
     return None
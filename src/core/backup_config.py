@@ -0,0 +1,34 @@
+"""
+Configuración del destino de los backups, sin cargar el transporte (requests).
+
+La usan core.backup y el arranque del auto-backup, que solo comprueba si hay
+un destino configurado antes de iniciar el worker.
+"""
+import os
+from core.config import Config
+
+
+def _secrets():
+    try:
+        import streamlit as st
+        return st.secrets.get("github", {})
+    except Exception:
+        return {}  # sin streamlit o sin secrets.toml: solo variables de entorno
+
+
+def get_github_config():
+    """Obtiene la configuración de GitHub desde st.secrets o variables de entorno."""
+    gh = _secrets()
+    token = gh.get("token") or os.getenv("GITHUB_TOKEN", "")
+    repo = gh.get("repo") or os.getenv("GITHUB_REPO", "")
+    path = gh.get("backup_path") or os.getenv("GITHUB_BACKUP_PATH", "backup.json")
+    branch = gh.get("branch") or os.getenv("GITHUB_BACKUP_BRANCH", "main")
+    return token, repo, path, branch
+
+
+def backup_transport_configured() -> bool:
+    """True si Config.BACKUP_TRANSPORT tiene destino: directorio local, o token y repo de GitHub."""
+    if Config.BACKUP_TRANSPORT == "local":
+        return True
+    token, repo, _, _ = get_github_config()
+    return bool(token and repo)
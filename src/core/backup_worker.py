@@ -0,0 +1,217 @@
+"""
+Auto-backup en segundo plano.
+
+Cada commit de una sesión avisa al worker; el worker espera un periodo de calma
+(Config.AUTO_BACKUP_QUIET_SECONDS) para agrupar ráfagas de escrituras en un solo
+backup y lo ejecuta en su propio hilo, con reintentos y backoff exponencial.
+Las peticiones de los usuarios nunca esperan a la red.
+"""
+import atexit
+import datetime
+import threading
+import time
+from sqlalchemy import event
+from core.config import Config
+from core.changelog import last_change_seq, change_tracking_available
+from core.backup_config import backup_transport_configured
+
+# Marca en session.info para que los commits del propio backup no vuelvan a avisar
+_SKIP_NOTIFY = "skip_backup_notify"
+
+
+class BackupWorker:
+    """
+    Hilo que ejecuta `backup_fn(db)` (por defecto core.backup.trigger_backup, que se
+    importa en el primer backup) tras un periodo de calma sin commits.
+    """
+
+    def __init__(self, session_factory, backup_fn=None, quiet_period=None, max_delay=None,
+                 backoff_base=5.0, backoff_max=300.0):
+        self.session_factory = session_factory
+        self.backup_fn = backup_fn
+        self.quiet_period = Config.AUTO_BACKUP_QUIET_SECONDS if quiet_period is None else quiet_period
+        self.max_delay = Config.AUTO_BACKUP_MAX_DELAY if max_delay is None else max_delay
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self._cond = threading.Condition()
+        self._run_lock = threading.Lock()  # un solo backup a la vez (hilo o flush)
+        self._thread = None
+        self._stopping = False
+        self._first_event = None   # monotonic del primer commit pendiente
+        self._last_event = None    # monotonic del último commit pendiente
+        self._retry_at = None
+        self._running = False
+        self._health = {
+            "last_success_at": None,
+            "last_attempt_at": None,
+            "last_message": None,
+            "last_error": None,
+            "consecutive_failures": 0,
+            "backups_done": 0,
+        }
+
+    # --- Ciclo de vida ---
+    def start(self):
+        with self._cond:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopping = False
+                self._thread = threading.Thread(target=self._run, name="auto-backup", daemon=True)
+                self._thread.start()
+        return self
+
+    def stop(self, flush=True, timeout=30):
+        """Detiene el hilo; con `flush` ejecuta antes el backup pendiente, si lo hay."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        if flush and self._first_event is not None:
+            self._backup_once()
+
+    # --- Eventos ---
+    def notify(self):
+        """Registra un commit; el backup se hará tras el periodo de calma."""
+        now = time.monotonic()
+        with self._cond:
+            if self._first_event is None:
+                self._first_event = now
+            self._last_event = now
+            self._cond.notify_all()
+
+    def attach(self, session_factory=None):
+        """Avisa al worker tras cada commit de las sesiones de `session_factory`."""
+        factory = session_factory or self.session_factory
+
+        def _after_commit(session):
+            if not session.info.get(_SKIP_NOTIFY):
+                self.notify()
+
+        event.listen(factory, "after_commit", _after_commit)
+        return _after_commit
+
+    def flush(self):
+        """Ejecuta ya el backup pendiente en el hilo que llama. Retorna el mensaje o None."""
+        with self._cond:
+            if self._first_event is None:
+                return None
+        return self._backup_once()
+
+    # --- Estado ---
+    def health(self) -> dict:
+        """Estado del worker: 'idle', 'pending', 'running', 'retrying' o 'stopped'."""
+        with self._cond:
+            if self._thread is None or not self._thread.is_alive():
+                state = "stopped"
+            elif self._running:
+                state = "running"
+            elif self._retry_at is not None:
+                state = "retrying"
+            elif self._first_event is not None:
+                state = "pending"
+            else:
+                state = "idle"
+            return {"state": state, "pending": self._first_event is not None, **self._health}
+
+    # --- Hilo ---
+    def _due_at(self):
+        """Momento (monotonic) en que toca el siguiente backup, o None si no hay nada pendiente."""
+        if self._first_event is None:
+            return None
+        due = min(self._last_event + self.quiet_period, self._first_event + self.max_delay)
+        return max(due, self._retry_at) if self._retry_at is not None else due
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._stopping:
+                    due = self._due_at()
+                    now = time.monotonic()
+                    if due is not None and now >= due:
+                        break
+                    self._cond.wait(None if due is None else due - now)
+                if self._stopping:
+                    return
+            self._backup_once()
+
+    def _backup_once(self):
+        with self._run_lock:
+            return self._backup_locked()
+
+    def _backup_locked(self):
+        with self._cond:
+            started = time.monotonic()
+            self._running = True
+        message, error = None, None
+        try:
+            db = self.session_factory()
+            db.info[_SKIP_NOTIFY] = True
+            try:
+                if change_tracking_available(db.get_bind()) and last_change_seq(db) == 0:
+                    message = "Sin cambios desde el último backup; no se subió nada."
+                else:
+                    if self.backup_fn is None:
+                        from core.backup import trigger_backup
+                        self.backup_fn = trigger_backup
+                    message = self.backup_fn(db)
+            finally:
+                db.close()
+            if message.startswith("Error"):
+                error = message
+        except Exception as e:
+            error = f"Error: {e}"
+
+        now = datetime.datetime.utcnow()
+        with self._cond:
+            self._running = False
+            self._health["last_attempt_at"] = now
+            self._health["last_message"] = message
+            if error is None:
+                self._health.update(last_success_at=now, last_error=None, consecutive_failures=0)
+                self._health["backups_done"] += 1
+                self._retry_at = None
+                # Los commits llegados durante el backup quedan para la siguiente ronda
+                if self._last_event is not None and self._last_event < started:
+                    self._first_event = self._last_event = None
+                elif self._first_event is not None:
+                    self._first_event = self._last_event
+            else:
+                failures = self._health["consecutive_failures"] + 1
+                self._health.update(last_error=error, consecutive_failures=failures)
+                delay = min(self.backoff_base * 2 ** (failures - 1), self.backoff_max)
+                self._retry_at = time.monotonic() + delay
+            self._cond.notify_all()
+        return message or error
+
+
+# ---------------------------------------------------------------------------
+# Worker del proceso
+# ---------------------------------------------------------------------------
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def start_auto_backup(session_factory=None):
+    """
+    Arranca (una vez por proceso) el worker de auto-backup enganchado a los commits
+    de `session_factory`. Retorna el worker, o None si Config.AUTO_BACKUP está desactivado
+    o no hay destino de backup configurado (cada intento fallaría y se reintentaría sin fin).
+    """
+    global _worker
+    if not Config.AUTO_BACKUP or not backup_transport_configured():
+        return None
+    with _worker_lock:
+        if _worker is None:
+            if session_factory is None:
+                from core.database import SessionLocal as session_factory
+            _worker = BackupWorker(session_factory)
+            _worker.attach()
+            _worker.start()
+            atexit.register(_worker.stop)
+    return _worker
+
+
+def get_auto_backup_worker():
+    return _worker
@@ -0,0 +1,71 @@
+"""
+Process-level initialization: schema, change tracking, restore check and warm-ups.
+
+Runs once per process (app.py wraps it in st.cache_resource), not on every rerun.
+"""
+import time
+from core.database import engine, Base, SessionLocal
+from core.changelog import install_change_tracking
+from core.crud import ensure_settings_version, get_system_settings
+from core.models import User
+
+# Report of the last initialization in this process (see get_init_report)
+_init_report = None
+
+
+def initialize_process(bind=None, session_factory=None) -> dict:
+    """
+    Creates tables and triggers, restores the backup if the database is empty,
+    warms up the engine and the settings cache and starts the auto-backup worker.
+    Returns {"timings": {step: ms}, "total_ms": ..., "restore_message": str | None}.
+    """
+    global _init_report
+    bind = bind or engine
+    session_factory = session_factory or SessionLocal
+    timings = {}
+    started = time.perf_counter()
+
+    def step(name, fn):
+        t = time.perf_counter()
+        result = fn()
+        timings[name] = round((time.perf_counter() - t) * 1000, 1)
+        return result
+
+    step("create_all", lambda: Base.metadata.create_all(bind=bind))
+    step("change_tracking", lambda: install_change_tracking(bind))
+
+    def warm_up_engine():
+        with bind.connect() as conn:
+            conn.exec_driver_sql("SELECT 1")
+    step("engine_warmup", warm_up_engine)
+
+    db = session_factory()
+    try:
+        def restore_check():
+            if db.query(User.id).first() is not None:
+                return None
+            from core.backup import auto_restore_if_empty  # only needed for an empty database
+            return auto_restore_if_empty(db)
+        restore_message = step("restore_check", restore_check)
+        def warm_up_settings():
+            ensure_settings_version(db)
+            get_system_settings(db)
+        step("settings_warmup", warm_up_settings)
+    finally:
+        db.close()
+
+    def start_worker():
+        from core.backup_worker import start_auto_backup
+        start_auto_backup(session_factory)
+    step("auto_backup", start_worker)
+
+    _init_report = {
+        "timings": timings,
+        "total_ms": round((time.perf_counter() - started) * 1000, 1),
+        "restore_message": restore_message,
+    }
+    return _init_report
+
+
+def get_init_report() -> dict | None:
+    return _init_report
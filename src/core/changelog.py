@@ -0,0 +1,80 @@
+"""
+Row-level change tracking for incremental backups.
+
+SQLite triggers append one change_log row for every insert, update and delete on
+the tracked tables, so bulk statements, raw SQL and restores are captured as well
+as ORM writes. Only the key of the touched row is logged; the backup reads the
+current row state when it builds a delta.
+"""
+import json
+from sqlalchemy import func, text
+from sqlalchemy.orm import Session
+from core.database import Base
+from core.models import ChangeLog, ScheduleArtifact
+
+_TRIGGER_EVENTS = (("I", "INSERT", "NEW"), ("U", "UPDATE", "NEW"), ("D", "DELETE", "OLD"))
+
+
+# The log itself and derived data that is rebuilt on demand
+_UNTRACKED = {ChangeLog.__tablename__, ScheduleArtifact.__tablename__}
+
+
+def tracked_tables():
+    return [t for t in Base.metadata.sorted_tables if t.name not in _UNTRACKED]
+
+
+def change_tracking_available(bind) -> bool:
+    """Change tracking uses SQLite triggers; other databases only get full backups."""
+    return bind.dialect.name == "sqlite"
+
+
+def install_change_tracking(bind) -> bool:
+    """Creates the change_log triggers if missing. Returns False on non-SQLite databases."""
+    if not change_tracking_available(bind):
+        return False
+    with bind.begin() as conn:
+        for table in tracked_tables():
+            for op, event, ref in _TRIGGER_EVENTS:
+                key = ", ".join(f'{ref}."{c.name}"' for c in table.primary_key.columns)
+                conn.exec_driver_sql(
+                    f'CREATE TRIGGER IF NOT EXISTS "trg_{table.name}_{op.lower()}" '
+                    f'AFTER {event} ON "{table.name}" BEGIN '
+                    f"INSERT INTO change_log (table_name, op, row_key) "
+                    f"VALUES ('{table.name}', '{op}', json_array({key})); END"
+                )
+    return True
+
+
+def data_version(db: Session) -> int | None:
+    """
+    Counter that grows with every tracked write: change_log's AUTOINCREMENT sequence,
+    which survives pruning. Used as a cache key; None when change tracking is unavailable.
+    """
+    if not change_tracking_available(db.get_bind()):
+        return None
+    return db.execute(text("SELECT seq FROM sqlite_sequence WHERE name = 'change_log'")).scalar() or 0
+
+
+def last_change_seq(db: Session) -> int:
+    return db.query(func.max(ChangeLog.id)).scalar() or 0
+
+
+def get_changed_keys(db: Session, since: int = 0):
+    """
+    Returns (to_seq, {table_name: set of primary-key tuples}) for changes after `since`.
+    Several changes to the same row collapse into one entry.
+    """
+    changed = {}
+    to_seq = since
+    for seq, table_name, row_key in db.query(
+        ChangeLog.id, ChangeLog.table_name, ChangeLog.row_key
+    ).filter(ChangeLog.id > since).order_by(ChangeLog.id):
+        changed.setdefault(table_name, set()).add(tuple(json.loads(row_key)))
+        to_seq = seq
+    return to_seq, changed
+
+
+def prune_change_log(db: Session, upto: int):
+    """Drops log entries that are already covered by an uploaded backup."""
+    db.query(ChangeLog).filter(ChangeLog.id <= upto).delete(synchronize_session=False)
+    db.commit()
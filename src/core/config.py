@@ -4,6 +4,35 @@ class Config:
     # Database
     DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./robotics_lab.db")
 
+    # Slot storage: 'rows' (one row per slot) or 'mask' (one week mask per owner)
+    SLOT_STORAGE = os.getenv("SLOT_STORAGE", "rows")
+
+    # Seconds between version checks of the in-process system settings cache
+    SETTINGS_CACHE_TTL = float(os.getenv("SETTINGS_CACHE_TTL", "2"))
+
+    # Incremental backups: upload a full snapshot after this many deltas
+    BACKUP_FULL_EVERY = int(os.getenv("BACKUP_FULL_EVERY", "20"))
+    # Full backup format: 'json' (portable) or 'sqlite' (page-level online-backup copy)
+    BACKUP_FULL_FORMAT = os.getenv("BACKUP_FULL_FORMAT", "json")
+
+    # Background auto-backup: runs after this many quiet seconds without commits,
+    # and at most AUTO_BACKUP_MAX_DELAY seconds after the first pending commit
+    AUTO_BACKUP = os.getenv("AUTO_BACKUP", "true").lower() == "true"
+    AUTO_BACKUP_QUIET_SECONDS = float(os.getenv("AUTO_BACKUP_QUIET_SECONDS", "30"))
+    AUTO_BACKUP_MAX_DELAY = float(os.getenv("AUTO_BACKUP_MAX_DELAY", "300"))
+
+    # Backup transport: 'github' (git data API) or 'local' (BACKUP_LOCAL_DIR)
+    BACKUP_TRANSPORT = os.getenv("BACKUP_TRANSPORT", "github")
+    BACKUP_LOCAL_DIR = os.getenv("BACKUP_LOCAL_DIR", "./backups")
+    GITHUB_API_URL = os.getenv("GITHUB_API_URL", "https://api.github.com")
+    # Backup files larger than this are uploaded as checksummed chunks
+    BACKUP_CHUNK_SIZE = int(os.getenv("BACKUP_CHUNK_SIZE", str(4 * 1024 * 1024)))
+
+    # Password hashing: bcrypt cost for new hashes (stored hashes with another cost are
+    # rehashed on login) and the size of the worker pool that runs the checks
+    BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+    AUTH_WORKERS = int(os.getenv("AUTH_WORKERS", "4"))
+
     # App Settings
     SECRET_KEY = os.getenv("SECRET_KEY", "super-secret-key-change-in-prod")
     DEBUG = True
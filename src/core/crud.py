@@ -1,10 +1,21 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
+from sqlalchemy import and_, delete, insert, tuple_, cast, Integer, String, select, func, literal, case
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
 from core.models import (
     User, Team, Availability, GroupBlock, Reservation, SystemSetting,
-    RoboticsClassSchedule, UserRole, GroupName, ScheduleState,
-    KEY_FIRST_PERIOD, KEY_MANUAL_MODE, KEY_SCHEDULE_STATUS
+    RoboticsClassSchedule, AvailabilityMask, GroupBlockMask, RoboticsClassMask,
+    ScheduleVersion, ScheduleArtifact, UserRole, GroupName, ScheduleState, ReservationOutcome,
+    KEY_FIRST_PERIOD, KEY_MANUAL_MODE, KEY_SCHEDULE_STATUS, KEY_SETTINGS_VERSION,
+    KEY_PUBLISHED_VERSION
 )
+from core.config import Config
+from core.periods import PERIOD_INDICES, DAYS
+from core.ics import build_feeds, build_calendar, feed_name, is_feed_key
+from collections import defaultdict
+import json
+import threading
+import time
 import bcrypt
 from typing import List, Optional
 
@@ -13,14 +24,17 @@ def verify_password(plain_password, hashed_password):
         hashed_password = hashed_password.encode('utf-8')
     return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password)
 
-def get_password_hash(password):
-    salt = bcrypt.gensalt()
+def get_password_hash(password, rounds=None):
+    salt = bcrypt.gensalt(rounds=rounds or Config.BCRYPT_ROUNDS)
     return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
 
 # --- User Management ---
 def get_user_by_username(db: Session, username: str):
     return db.query(User).filter(User.username == username).first()
 
+def get_user_by_id(db: Session, user_id: int):
+    return db.get(User, user_id)
+
 def create_user(db: Session, username, password, full_name, role, team_id=None, group_name=None):
     hashed_password = get_password_hash(password)
     db_user = User(
@@ -42,6 +56,33 @@ def get_users_by_team(db: Session, team_id: int):
 def get_all_users(db: Session):
     return db.query(User).all()
 
+def search_users(db: Session, role: UserRole = None, team_id: int = None, group_name: GroupName = None,
+                 name_prefix: str = None, limit: int = 50, offset: int = 0):
+    """
+    Returns (rows, total) for one page of users matching the filters, ordered by id.
+    name_prefix matches the start of the full name or the username (case-insensitive).
+    rows are dicts with id, username, full_name, role, team_id, team_name and group_name.
+    """
+    filters = []
+    if role is not None:
+        filters.append(User.role == role)
+    if team_id is not None:
+        filters.append(User.team_id == team_id)
+    if group_name is not None:
+        filters.append(User.group_name == group_name)
+    if name_prefix:
+        filters.append(
+            User.full_name.istartswith(name_prefix, autoescape=True)
+            | User.username.istartswith(name_prefix, autoescape=True)
+        )
+
+    total = db.query(func.count(User.id)).filter(*filters).scalar()
+    rows = db.query(
+        User.id, User.username, User.full_name, User.role, User.team_id, Team.name, User.group_name
+    ).outerjoin(Team, Team.id == User.team_id).filter(*filters).order_by(User.id).limit(limit).offset(offset)
+    keys = ("id", "username", "full_name", "role", "team_id", "team_name", "group_name")
+    return [dict(zip(keys, row)) for row in rows], total
+
 def update_user_role_and_team(db: Session, user_id: int, role: UserRole, team_id: int = None, group_name: GroupName = None):
     user = db.query(User).filter(User.id == user_id).first()
     if user:
@@ -91,37 +132,199 @@ def update_team(db: Session, team_id: int, name: str, group_name: GroupName):
         db.refresh(team)
     return team
 
-# --- Availability Management ---
-def set_user_availability(db: Session, user_id: int, slots: List[tuple]):
-    """slots: List of (day_of_week, period) tuples"""
-    db.query(Availability).filter(Availability.user_id == user_id).delete()
+# --- Week Masks ---
+# A week mask packs a set of (day_of_week, period) slots into one integer:
+# bit (day * SLOTS_PER_DAY + period position) is set when the slot is selected.
+SLOTS_PER_DAY = len(PERIOD_INDICES)
+_PERIOD_POS = {p: i for i, p in enumerate(PERIOD_INDICES)}
+
+def uses_slot_masks():
+    return Config.SLOT_STORAGE == "mask"
+
+def slots_to_mask(slots) -> int:
+    """slots: iterable of (day_of_week, period). Out-of-range slots are ignored."""
+    mask = 0
     for day, period in slots:
-        avail = Availability(user_id=user_id, day_of_week=day, period=period)
-        db.add(avail)
+        if 0 <= day < len(DAYS) and period in _PERIOD_POS:
+            mask |= 1 << (day * SLOTS_PER_DAY + _PERIOD_POS[period])
+    return mask
+
+def mask_to_slots(mask: int) -> List[tuple]:
+    """Returns the (day_of_week, period) slots set in `mask`, ordered by day then period."""
+    slots = []
+    while mask:
+        low = mask & -mask
+        bit = low.bit_length() - 1
+        slots.append((bit // SLOTS_PER_DAY, PERIOD_INDICES[bit % SLOTS_PER_DAY]))
+        mask ^= low
+    return slots
+
+def _set_slot_mask(db: Session, model, key: dict, slots: List[tuple]):
+    """Mask-mode counterpart of _apply_slot_diff. Returns (added, removed) counts."""
+    new_mask = slots_to_mask(slots)
+    row = db.get(model, key)
+    old_mask = row.mask if row else 0
+    if new_mask == old_mask:
+        return 0, 0
+    if row:
+        row.mask = new_mask
+    else:
+        db.add(model(mask=new_mask, **key))
     db.commit()
+    return bin(new_mask & ~old_mask).count("1"), bin(old_mask & ~new_mask).count("1")
+
+def backfill_slot_masks(db: Session):
+    """
+    Rebuilds the week-mask tables from the per-slot tables.
+    Run once before switching SLOT_STORAGE to 'mask'. Returns row counts per table.
+    """
+    avail = defaultdict(int)
+    for user_id, day, period in db.query(Availability.user_id, Availability.day_of_week, Availability.period):
+        avail[user_id] |= slots_to_mask([(day, period)])
+
+    blocks = defaultdict(int)
+    for group_name, day, period in db.query(GroupBlock.group_name, GroupBlock.day_of_week, GroupBlock.period):
+        blocks[group_name] |= slots_to_mask([(day, period)])
+
+    classes = defaultdict(int)
+    for teacher_id, group_name, day, period in db.query(
+        RoboticsClassSchedule.teacher_id, RoboticsClassSchedule.group_name,
+        RoboticsClassSchedule.day_of_week, RoboticsClassSchedule.period
+    ):
+        classes[(teacher_id, group_name)] |= slots_to_mask([(day, period)])
+
+    db.query(AvailabilityMask).delete()
+    db.query(GroupBlockMask).delete()
+    db.query(RoboticsClassMask).delete()
+    if avail:
+        db.execute(insert(AvailabilityMask), [{"user_id": k, "mask": m} for k, m in avail.items()])
+    if blocks:
+        db.execute(insert(GroupBlockMask), [{"group_name": k, "mask": m} for k, m in blocks.items()])
+    if classes:
+        db.execute(insert(RoboticsClassMask), [
+            {"teacher_id": t, "group_name": g, "mask": m} for (t, g), m in classes.items()
+        ])
+    db.commit()
+    return {
+        "availability_masks": len(avail),
+        "group_block_masks": len(blocks),
+        "robotics_class_masks": len(classes),
+    }
+
+# --- Slot Sets (availability, group blocks, robotics classes) ---
+def _apply_slot_diff(db: Session, model, owner: dict, slots: List[tuple]):
+    """
+    Replaces the (day_of_week, period) slots stored for `owner` with `slots`,
+    touching only the rows that actually changed. `owner` maps column names
+    to values (e.g. {"user_id": 5}). Returns (added, removed) counts.
+    """
+    owner_filter = and_(*[getattr(model, col) == val for col, val in owner.items()])
+    current = set(
+        db.query(model.day_of_week, model.period).filter(owner_filter).all()
+    )
+    wanted = set((int(day), int(period)) for day, period in slots)
+
+    added = wanted - current
+    removed = current - wanted
+    if not added and not removed:
+        return 0, 0
+
+    if removed:
+        db.execute(
+            delete(model).where(
+                owner_filter,
+                tuple_(model.day_of_week, model.period).in_(sorted(removed))
+            )
+        )
+    if added:
+        db.execute(
+            insert(model),
+            [dict(owner, day_of_week=day, period=period) for day, period in sorted(added)]
+        )
+    db.commit()
+    return len(added), len(removed)
+
+# --- Availability Management ---
+def set_user_availability(db: Session, user_id: int, slots: List[tuple]):
+    """slots: List of (day_of_week, period) tuples. Only changed slots are written."""
+    if uses_slot_masks():
+        return _set_slot_mask(db, AvailabilityMask, {"user_id": user_id}, slots)
+    return _apply_slot_diff(db, Availability, {"user_id": user_id}, slots)
 
 def get_user_availability(db: Session, user_id: int):
     return db.query(Availability).filter(Availability.user_id == user_id).all()
 
-def get_team_availability(db: Session, team_id: int):
-    """Returns a dictionary mapping (day, period) to count of available members."""
-    users = get_users_by_team(db, team_id)
-    user_ids = [u.id for u in users]
-    avails = db.query(Availability).filter(Availability.user_id.in_(user_ids)).all()
-    counts = {}
-    for a in avails:
-        key = (a.day_of_week, a.period)
-        counts[key] = counts.get(key, 0) + 1
-    return counts, len(users)
+def get_user_slots(db: Session, user_id: int) -> List[tuple]:
+    """Returns the user's available (day_of_week, period) slots in either storage mode."""
+    if uses_slot_masks():
+        mask = db.query(AvailabilityMask.mask).filter(AvailabilityMask.user_id == user_id).scalar()
+        return mask_to_slots(mask or 0)
+    rows = db.query(Availability.day_of_week, Availability.period).filter(
+        Availability.user_id == user_id
+    ).order_by(Availability.day_of_week, Availability.period).all()
+    return [tuple(r) for r in rows]
+
+def get_users_slots(db: Session, user_ids=None) -> dict:
+    """Returns {user_id: set of (day_of_week, period)} for the given users (all users if None)."""
+    result = defaultdict(set)
+    if uses_slot_masks():
+        query = db.query(AvailabilityMask.user_id, AvailabilityMask.mask)
+        if user_ids is not None:
+            query = query.filter(AvailabilityMask.user_id.in_(user_ids))
+        for user_id, mask in query:
+            result[user_id] = set(mask_to_slots(mask))
+    else:
+        query = db.query(Availability.user_id, Availability.day_of_week, Availability.period)
+        if user_ids is not None:
+            query = query.filter(Availability.user_id.in_(user_ids))
+        for user_id, day, period in query:
+            result[user_id].add((day, period))
+    return dict(result)
+
+def get_team_availability_summary(db: Session, team_id: int) -> dict:
+    """
+    Aggregates a team's availability in the database:
+    {"member_count", "members": [{"id", "full_name", "role", "slots"}],
+     "slots": {(day_of_week, period): {"available": member count, "leader": bool}}}.
+    Row storage uses two GROUP BY queries; mask storage reads the team's masks in one query.
+    """
+    is_leader = case((User.role == UserRole.TEAM_LEADER, 1), else_=0)
+    slots = {}
+    if uses_slot_masks():
+        member_rows = db.query(User.id, User.full_name, User.role, AvailabilityMask.mask).outerjoin(
+            AvailabilityMask, AvailabilityMask.user_id == User.id
+        ).filter(User.team_id == team_id).order_by(User.id).all()
+        members = []
+        for user_id, full_name, role, mask in member_rows:
+            user_slots = mask_to_slots(mask or 0)
+            members.append({"id": user_id, "full_name": full_name, "role": role, "slots": len(user_slots)})
+            for slot in user_slots:
+                info = slots.setdefault(slot, {"available": 0, "leader": False})
+                info["available"] += 1
+                info["leader"] = info["leader"] or role == UserRole.TEAM_LEADER
+    else:
+        member_rows = db.query(User.id, User.full_name, User.role, func.count(Availability.id)).outerjoin(
+            Availability, Availability.user_id == User.id
+        ).filter(User.team_id == team_id).group_by(User.id).order_by(User.id).all()
+        members = [
+            {"id": user_id, "full_name": full_name, "role": role, "slots": count}
+            for user_id, full_name, role, count in member_rows
+        ]
+        slot_rows = db.query(
+            Availability.day_of_week, Availability.period, func.count(Availability.id), func.max(is_leader)
+        ).join(User, User.id == Availability.user_id).filter(User.team_id == team_id).group_by(
+            Availability.day_of_week, Availability.period
+        )
+        for day, period, count, leader in slot_rows:
+            slots[(day, period)] = {"available": count, "leader": bool(leader)}
+    return {"member_count": len(members), "members": members, "slots": slots}
 
 # --- Group Blocks (Theory Classes) ---
 def set_group_blocks(db: Session, group_name: GroupName, slots: List[tuple]):
-    """slots: List of (day_of_week, period) tuples"""
-    db.query(GroupBlock).filter(GroupBlock.group_name == group_name).delete()
-    for day, period in slots:
-        block = GroupBlock(group_name=group_name, day_of_week=day, period=period)
-        db.add(block)
-    db.commit()
+    """slots: List of (day_of_week, period) tuples. Only changed slots are written."""
+    if uses_slot_masks():
+        return _set_slot_mask(db, GroupBlockMask, {"group_name": group_name}, slots)
+    return _apply_slot_diff(db, GroupBlock, {"group_name": group_name}, slots)
 
 def get_group_blocks(db: Session, group_name: GroupName):
     return db.query(GroupBlock).filter(GroupBlock.group_name == group_name).all()
@@ -129,20 +332,38 @@ def get_group_blocks(db: Session, group_name: GroupName):
 def get_all_group_blocks(db: Session):
     return db.query(GroupBlock).all()
 
+def get_group_block_slots(db: Session, group_name: GroupName) -> List[tuple]:
+    """Returns the group's blocked (day_of_week, period) slots in either storage mode."""
+    if uses_slot_masks():
+        mask = db.query(GroupBlockMask.mask).filter(GroupBlockMask.group_name == group_name).scalar()
+        return mask_to_slots(mask or 0)
+    rows = db.query(GroupBlock.day_of_week, GroupBlock.period).filter(
+        GroupBlock.group_name == group_name
+    ).order_by(GroupBlock.day_of_week, GroupBlock.period).all()
+    return [tuple(r) for r in rows]
+
+def get_all_group_block_slots(db: Session) -> set:
+    """Returns a set of (group_name, day_of_week, period) for every group."""
+    if uses_slot_masks():
+        return set(
+            (group_name, day, period)
+            for group_name, mask in db.query(GroupBlockMask.group_name, GroupBlockMask.mask)
+            for day, period in mask_to_slots(mask)
+        )
+    return set(tuple(r) for r in db.query(GroupBlock.group_name, GroupBlock.day_of_week, GroupBlock.period))
+
 # --- Robotics Class Schedule ---
 def set_robotics_class_schedule(db: Session, teacher_id: int, group_name: GroupName, slots: List[tuple]):
-    """slots: List of (day_of_week, period) tuples. Replaces all existing entries."""
-    db.query(RoboticsClassSchedule).filter(
-        RoboticsClassSchedule.teacher_id == teacher_id,
-        RoboticsClassSchedule.group_name == group_name
-    ).delete()
-    for day, period in slots:
-        entry = RoboticsClassSchedule(
-            teacher_id=teacher_id, group_name=group_name,
-            day_of_week=day, period=period
+    """slots: List of (day_of_week, period) tuples. Replaces all existing entries,
+    writing only the slots that changed."""
+    if uses_slot_masks():
+        return _set_slot_mask(
+            db, RoboticsClassMask, {"teacher_id": teacher_id, "group_name": group_name}, slots
         )
-        db.add(entry)
-    db.commit()
+    return _apply_slot_diff(
+        db, RoboticsClassSchedule,
+        {"teacher_id": teacher_id, "group_name": group_name}, slots
+    )
 
 def get_robotics_class_schedule_by_teacher(db: Session, teacher_id: int):
     return db.query(RoboticsClassSchedule).filter(
@@ -152,6 +373,58 @@ def get_robotics_class_schedule_by_teacher(db: Session, teacher_id: int):
 def get_all_robotics_class_schedules(db: Session):
     return db.query(RoboticsClassSchedule).all()
 
+def get_robotics_class_slots_by_teacher(db: Session, teacher_id: int) -> List[tuple]:
+    """Returns the teacher's robotics class (day_of_week, period) slots in either storage mode."""
+    if uses_slot_masks():
+        mask = 0
+        for (group_mask,) in db.query(RoboticsClassMask.mask).filter(RoboticsClassMask.teacher_id == teacher_id):
+            mask |= group_mask
+        return mask_to_slots(mask)
+    rows = db.query(RoboticsClassSchedule.day_of_week, RoboticsClassSchedule.period).filter(
+        RoboticsClassSchedule.teacher_id == teacher_id
+    ).order_by(RoboticsClassSchedule.day_of_week, RoboticsClassSchedule.period).all()
+    return [tuple(r) for r in rows]
+
+def get_all_robotics_class_slots(db: Session) -> List[dict]:
+    """Returns [{'group_name', 'day', 'period'}] for every robotics class, as the GA expects."""
+    if uses_slot_masks():
+        return [
+            {'group_name': group_name, 'day': day, 'period': period}
+            for group_name, mask in db.query(RoboticsClassMask.group_name, RoboticsClassMask.mask)
+            for day, period in mask_to_slots(mask)
+        ]
+    return [
+        {'group_name': group_name, 'day': day, 'period': period}
+        for group_name, day, period in db.query(
+            RoboticsClassSchedule.group_name, RoboticsClassSchedule.day_of_week, RoboticsClassSchedule.period
+        )
+    ]
+
+# --- Schedule generation inputs ---
+def get_ga_inputs(db: Session) -> dict:
+    """
+    Everything a schedule engine needs, as keyword arguments for its constructor:
+    {"teams_data", "availabilities", "group_blocks", "robotics_class_slots", "first_period"}.
+    """
+    teams_data = {
+        team_id: {'id': team_id, 'name': name, 'group_name': group_name, 'members': []}
+        for team_id, name, group_name in db.query(Team.id, Team.name, Team.group_name).order_by(Team.id)
+    }
+    for user_id, role, team_id in db.query(User.id, User.role, User.team_id).filter(
+        User.team_id.isnot(None)
+    ).order_by(User.id):
+        if team_id in teams_data:
+            teams_data[team_id]['members'].append({'id': user_id, 'role': role})
+
+    member_ids = [m['id'] for t in teams_data.values() for m in t['members']]
+    return {
+        "teams_data": list(teams_data.values()),
+        "availabilities": get_users_slots(db, member_ids),
+        "group_blocks": get_all_group_block_slots(db),
+        "robotics_class_slots": get_all_robotics_class_slots(db),
+        "first_period": int(get_system_setting(db, KEY_FIRST_PERIOD, "1")),
+    }
+
 # --- Reservations / Schedule ---
 def create_reservation(db: Session, team_id, day: int, period: int, is_manual: bool,
                        is_robotics_class: bool = False, group_name=None):
@@ -167,6 +440,41 @@ def create_reservation(db: Session, team_id, day: int, period: int, is_manual: b
     db.commit()
     return res
 
+def _dialect_insert(db: Session):
+    """INSERT construct with ON CONFLICT support for the session's database."""
+    return postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+
+def reserve_slot_for_team(db: Session, team_id: int, day: int, period: int, max_per_team: int):
+    """
+    Manual-mode booking in a single conditional INSERT: the row is only inserted if the
+    slot is free (ON CONFLICT DO NOTHING on the slot constraint) and the team holds fewer
+    than `max_per_team` reservations. Every reservation of the team counts toward the cap,
+    generated or manual, matching the weekly limit shown to team leaders.
+    The team row is locked first (SELECT ... FOR UPDATE) so concurrent bookings for the same
+    team queue up instead of both passing the count under READ COMMITTED; SQLite already
+    serializes writers and ignores the lock. Returns a ReservationOutcome.
+    """
+    db.query(Team.id).filter(Team.id == team_id).with_for_update().first()
+    dialect_insert = _dialect_insert(db)
+    under_quota = select(func.count()).select_from(Reservation).where(
+        Reservation.team_id == team_id
+    ).scalar_subquery() < max_per_team
+    source = select(
+        literal(team_id), literal(day), literal(period), literal(True), literal(False)
+    ).where(under_quota)
+    stmt = dialect_insert(Reservation).from_select(
+        ["team_id", "day_of_week", "period", "is_manual", "is_robotics_class"], source
+    ).on_conflict_do_nothing(index_elements=["day_of_week", "period"])
+
+    result = db.execute(stmt)
+    db.commit()
+    if result.rowcount == 1:
+        return ReservationOutcome.CREATED
+
+    # Nothing inserted: tell the two causes apart (only on the failure path)
+    taken = db.query(Reservation.id).filter_by(day_of_week=day, period=period).first()
+    return ReservationOutcome.SLOT_TAKEN if taken else ReservationOutcome.QUOTA_EXCEEDED
+
 def delete_reservation(db: Session, day: int, period: int):
     db.query(Reservation).filter_by(day_of_week=day, period=period).delete()
     db.commit()
@@ -181,23 +489,368 @@ def clear_schedule(db: Session, keep_manual=True):
     query.delete()
     db.commit()
 
+def save_schedule_draft(db: Session, schedule: List[dict], keep_manual=False):
+    """
+    Replaces the working reservations with a generated schedule in one transaction
+    and marks it as DRAFT. The published version is left untouched.
+    schedule: List of dicts as returned by GeneticAlgorithmEngine.run().
+    """
+    query = db.query(Reservation)
+    if keep_manual:
+        query = query.filter(Reservation.is_manual == False)
+    query.delete()
+
+    taken = set((day, period) for day, period in db.query(Reservation.day_of_week, Reservation.period))
+    rows = []
+    for item in schedule:
+        slot = (item['day_of_week'], item['period'])
+        if slot in taken:
+            continue
+        taken.add(slot)
+        rows.append({
+            "team_id": item['team_id'],
+            "day_of_week": item['day_of_week'],
+            "period": item['period'],
+            "is_manual": False,
+            "is_robotics_class": item.get('is_robotics_class', False),
+            "group_name": item.get('group_name'),
+        })
+    if rows:
+        db.execute(insert(Reservation), rows)
+    db.commit()
+    set_system_setting(db, KEY_SCHEDULE_STATUS, ScheduleState.DRAFT)
+    return len(rows)
+
+def get_schedule_entries(db: Session) -> List[dict]:
+    """Returns the working reservations joined with their team names, in one query."""
+    rows = db.query(
+        Reservation.day_of_week, Reservation.period, Reservation.team_id, Team.name,
+        Reservation.is_robotics_class, Reservation.group_name, Reservation.is_manual
+    ).outerjoin(Team, Reservation.team_id == Team.id).order_by(
+        Reservation.day_of_week, Reservation.period
+    ).all()
+    return [
+        {
+            "day_of_week": day,
+            "period": period,
+            "team_id": team_id,
+            "team_name": team_name,
+            "is_robotics_class": bool(is_robotics_class),
+            "group_name": group_name.value if group_name else None,
+            "is_manual": bool(is_manual),
+        }
+        for day, period, team_id, team_name, is_robotics_class, group_name, is_manual in rows
+    ]
+
+# --- Schedule Versions (published snapshots) ---
+MAX_SCHEDULE_VERSIONS = 10
+_SNAPSHOT_FIELDS = ("day_of_week", "period", "team_id", "team_name", "is_robotics_class", "group_name", "is_manual")
+_snapshot_cache = {}  # version_id -> list of entries
+_schedule_cache_generation = 0
+
+def invalidate_schedule_cache():
+    global _schedule_cache_generation
+    _snapshot_cache.clear()
+    _schedule_cache_generation += 1
+
+def schedule_cache_generation() -> int:
+    """Bumped whenever cached schedules are invalidated (e.g. after a restore); part of UI cache keys."""
+    return _schedule_cache_generation
+
+def _encode_snapshot(entries: List[dict]) -> str:
+    return json.dumps(
+        [[e[f] for f in _SNAPSHOT_FIELDS] for e in entries],
+        ensure_ascii=False, separators=(",", ":")
+    )
+
+def _decode_snapshot(snapshot: str) -> List[dict]:
+    return [dict(zip(_SNAPSHOT_FIELDS, row)) for row in json.loads(snapshot)]
+
+def publish_schedule(db: Session) -> int:
+    """
+    Freezes the working reservations into a new ScheduleVersion and points
+    KEY_PUBLISHED_VERSION at it, all in one transaction. Returns the version id.
+    """
+    entries = get_schedule_entries(db)
+    version = ScheduleVersion(snapshot=_encode_snapshot(entries))
+    db.add(version)
+    db.flush()
+    _store_schedule_artifacts(db, version.id, entries, version.created_at)
+
+    _put_system_setting(db, KEY_PUBLISHED_VERSION, str(version.id))
+    _put_system_setting(db, KEY_SCHEDULE_STATUS, ScheduleState.PUBLISHED)
+    _bump_settings_version(db)
+    db.query(ScheduleArtifact).filter(
+        ScheduleArtifact.version_id <= version.id - MAX_SCHEDULE_VERSIONS
+    ).delete(synchronize_session=False)
+    db.query(ScheduleVersion).filter(
+        ScheduleVersion.id <= version.id - MAX_SCHEDULE_VERSIONS
+    ).delete(synchronize_session=False)
+    db.commit()
+    invalidate_settings_cache()
+    return version.id
+
+def refresh_published_schedule(db: Session):
+    """
+    Re-publishes the working reservations if the schedule is currently published (manual mode edits).
+    While a draft is pending the working reservations are the draft, so edits reach viewers when it
+    is approved; reject_schedule_draft puts the published schedule back to work on.
+    """
+    if get_system_setting(db, KEY_SCHEDULE_STATUS, ScheduleState.NONE) == ScheduleState.PUBLISHED:
+        return publish_schedule(db)
+    return None
+
+def reject_schedule_draft(db: Session) -> ScheduleState:
+    """
+    Discards the draft. If a version is published, its reservations become the working
+    reservations again and the status goes back to PUBLISHED, so later manual edits keep
+    republishing it; otherwise the schedule is left empty (NONE). Returns the new status.
+    """
+    version_id, entries = get_published_schedule(db)
+    db.query(Reservation).delete()
+    status = ScheduleState.NONE
+    if version_id is not None:
+        team_ids = {team_id for (team_id,) in db.query(Team.id)}
+        rows = [
+            {
+                "team_id": e["team_id"],
+                "day_of_week": e["day_of_week"],
+                "period": e["period"],
+                "is_manual": e["is_manual"],
+                "is_robotics_class": e["is_robotics_class"],
+                "group_name": GroupName(e["group_name"]) if e["group_name"] else None,
+            }
+            for e in entries
+            if e["team_id"] is None or e["team_id"] in team_ids  # teams deleted since publishing
+        ]
+        if rows:
+            db.execute(insert(Reservation), rows)
+        status = ScheduleState.PUBLISHED
+    db.commit()
+    set_system_setting(db, KEY_SCHEDULE_STATUS, status)
+    return status
+
+def migrate_legacy_published_schedule(db: Session):
+    """
+    Databases (and backups) from before schedule versions can be PUBLISHED without a
+    KEY_PUBLISHED_VERSION pointer. Publishes their working reservations once so viewers
+    see them again. Returns the new version id, or None if there was nothing to migrate.
+    """
+    if get_system_setting(db, KEY_PUBLISHED_VERSION):
+        return None
+    if get_system_setting(db, KEY_SCHEDULE_STATUS, ScheduleState.NONE) != ScheduleState.PUBLISHED:
+        return None
+    return publish_schedule(db)
+
+def get_published_schedule(db: Session):
+    """
+    Returns (version_id, entries) for the schedule viewers should see,
+    or (None, []) if nothing has been published yet.
+    """
+    version_id = get_system_setting(db, KEY_PUBLISHED_VERSION)
+    if not version_id:
+        version_id = migrate_legacy_published_schedule(db)
+        if version_id is None:
+            return None, []
+    version_id = int(version_id)
+
+    entries = _snapshot_cache.get(version_id)
+    if entries is None:
+        snapshot = db.query(ScheduleVersion.snapshot).filter(ScheduleVersion.id == version_id).scalar()
+        if snapshot is None:
+            return None, []
+        entries = _decode_snapshot(snapshot)
+        if len(_snapshot_cache) >= MAX_SCHEDULE_VERSIONS:
+            _snapshot_cache.clear()
+        _snapshot_cache[version_id] = entries
+    return version_id, entries
+
+def _store_schedule_artifacts(db: Session, version_id: int, entries: List[dict], published_at) -> dict:
+    """Builds the iCalendar feeds of a version and adds them to the session. Returns {key: content}."""
+    feeds = build_feeds(entries, version_id, published_at)
+    db.execute(insert(ScheduleArtifact), [
+        {"version_id": version_id, "key": key, "content": content} for key, content in feeds.items()
+    ])
+    return feeds
+
+def get_schedule_feed(db: Session, key: str):
+    """
+    Returns (version_id, iCalendar text) of a feed of the published schedule (see core.ics
+    for the keys), or (None, None) if nothing is published or the key is unknown.
+    Feeds are built at publish time; versions without them (published before feeds
+    existed, or restored from a JSON backup) get theirs built on first read.
+    """
+    version_id = get_system_setting(db, KEY_PUBLISHED_VERSION)
+    if not version_id or not is_feed_key(key):
+        return None, None
+    version_id = int(version_id)
+
+    content = db.query(ScheduleArtifact.content).filter_by(version_id=version_id, key=key).scalar()
+    if content is not None:
+        return version_id, content
+
+    version = db.query(ScheduleVersion).filter(ScheduleVersion.id == version_id).first()
+    if version is None:
+        return None, None
+    if db.query(ScheduleArtifact.key).filter_by(version_id=version_id).first() is None:
+        feeds = _store_schedule_artifacts(db, version_id, _decode_snapshot(version.snapshot), version.created_at)
+        try:
+            db.commit()
+        except IntegrityError:
+            db.rollback()  # built concurrently by another session
+        content = feeds.get(key)
+    if content is None:
+        # A team or group with nothing scheduled: an empty calendar
+        content = build_calendar(feed_name(key), [], version_id, version.created_at)
+    return version_id, content
+
+# --- Readiness (admin overview) ---
+def get_readiness_report(db: Session, first_period: int = 1) -> dict:
+    """
+    Cohort-wide readiness for schedule generation, from a few aggregate queries.
+    Returns {"teams": [{"id", "name", "group_name", "is_locked", "members", "submitted", "open_slots"}],
+             "groups": [{"group_name", "teams", "locked", "members", "submitted", "blocked", "unblocked"}]}.
+    open_slots counts the slots (from first_period on) where at least one member is available
+    and the team's group has no theory block; unblocked counts the group's lab slots without a block.
+    """
+    open_periods = [p for p in PERIOD_INDICES if p >= first_period]
+    open_mask = slots_to_mask((day, period) for day in range(len(DAYS)) for period in open_periods)
+    teams = []
+
+    if uses_slot_masks():
+        block_masks = {g: m & open_mask for g, m in db.query(GroupBlockMask.group_name, GroupBlockMask.mask)}
+        blocked = {g: bin(m).count("1") for g, m in block_masks.items()}
+        rows = db.query(Team.id, Team.name, Team.group_name, Team.is_locked, User.id, AvailabilityMask.mask).outerjoin(
+            User, User.team_id == Team.id
+        ).outerjoin(AvailabilityMask, AvailabilityMask.user_id == User.id).order_by(Team.group_name, Team.name)
+        by_team = {}
+        for team_id, name, group_name, is_locked, user_id, mask in rows:
+            team = by_team.get(team_id)
+            if team is None:
+                team = by_team[team_id] = {
+                    "id": team_id, "name": name, "group_name": group_name, "is_locked": bool(is_locked),
+                    "members": 0, "submitted": 0, "_union": 0,
+                }
+                teams.append(team)
+            if user_id is not None:
+                team["members"] += 1
+                team["submitted"] += 1 if mask else 0
+                team["_union"] |= mask or 0
+        for team in teams:
+            usable = team.pop("_union") & open_mask & ~block_masks.get(team["group_name"], 0)
+            team["open_slots"] = bin(usable).count("1")
+    else:
+        blocked = dict(db.query(GroupBlock.group_name, func.count(GroupBlock.id)).filter(
+            GroupBlock.period >= first_period
+        ).group_by(GroupBlock.group_name).all())
+
+        submitted_users = select(Availability.user_id).distinct().subquery()
+        rows = db.query(
+            Team.id, Team.name, Team.group_name, Team.is_locked,
+            func.count(User.id), func.count(submitted_users.c.user_id)
+        ).outerjoin(User, User.team_id == Team.id).outerjoin(
+            submitted_users, submitted_users.c.user_id == User.id
+        ).group_by(Team.id).order_by(Team.group_name, Team.name)
+
+        open_slots = dict(db.query(
+            User.team_id,
+            func.count(func.distinct(Availability.day_of_week * 100 + Availability.period))
+        ).join(Availability, Availability.user_id == User.id).join(Team, Team.id == User.team_id).outerjoin(
+            GroupBlock, and_(
+                GroupBlock.group_name == Team.group_name,
+                GroupBlock.day_of_week == Availability.day_of_week,
+                GroupBlock.period == Availability.period,
+            )
+        ).filter(GroupBlock.id.is_(None), Availability.period >= first_period).group_by(User.team_id).all())
+
+        for team_id, name, group_name, is_locked, members, submitted in rows:
+            teams.append({
+                "id": team_id, "name": name, "group_name": group_name, "is_locked": bool(is_locked),
+                "members": members, "submitted": submitted, "open_slots": open_slots.get(team_id, 0),
+            })
+
+    groups = []
+    for group_name in GroupName:
+        group_teams = [t for t in teams if t["group_name"] == group_name]
+        groups.append({
+            "group_name": group_name,
+            "teams": len(group_teams),
+            "locked": sum(t["is_locked"] for t in group_teams),
+            "members": sum(t["members"] for t in group_teams),
+            "submitted": sum(t["submitted"] for t in group_teams),
+            "blocked": blocked.get(group_name, 0),
+            "unblocked": len(DAYS) * len(open_periods) - blocked.get(group_name, 0),
+        })
+    return {"teams": teams, "groups": groups}
+
 # --- System Settings ---
+# Settings are read several times per rerun on every page, so they are served
+# from an in-process cache. Every write bumps the KEY_SETTINGS_VERSION row; a
+# process that sees a new version reloads all settings in a single query.
+_settings_lock = threading.Lock()
+_settings_cache = {"version": None, "values": {}, "checked_at": 0.0}
+
+def invalidate_settings_cache():
+    with _settings_lock:
+        _settings_cache["version"] = None
+
+def get_system_settings(db: Session) -> dict:
+    """Returns all settings as a dict, checking the version row at most every SETTINGS_CACHE_TTL seconds."""
+    now = time.monotonic()
+    with _settings_lock:
+        if (_settings_cache["version"] is not None
+                and now - _settings_cache["checked_at"] < Config.SETTINGS_CACHE_TTL):
+            return _settings_cache["values"]
+
+    version = db.query(SystemSetting.value).filter(SystemSetting.key == KEY_SETTINGS_VERSION).scalar() or "0"
+    with _settings_lock:
+        if version != _settings_cache["version"]:
+            values = dict(db.query(SystemSetting.key, SystemSetting.value).all())
+            _settings_cache["values"] = values
+            _settings_cache["version"] = values.get(KEY_SETTINGS_VERSION, "0")
+        _settings_cache["checked_at"] = now
+        return _settings_cache["values"]
+
 def get_system_setting(db: Session, key: str, default: str = ""):
-    setting = db.query(SystemSetting).filter(SystemSetting.key == key).first()
-    if setting:
-        return setting.value
-    return default
+    return get_system_settings(db).get(key, default)
 
-def set_system_setting(db: Session, key: str, value: str):
+def _put_system_setting(db: Session, key: str, value: str):
     setting = db.query(SystemSetting).filter(SystemSetting.key == key).first()
     if setting:
         setting.value = value
     else:
         setting = SystemSetting(key=key, value=value)
         db.add(setting)
+
+def _insert_settings_version(db: Session):
+    # ON CONFLICT DO NOTHING: concurrent creators (several processes starting at once) are a no-op
+    db.execute(_dialect_insert(db)(SystemSetting).values(
+        key=KEY_SETTINGS_VERSION, value="0"
+    ).on_conflict_do_nothing(index_elements=["key"]))
+
+def ensure_settings_version(db: Session):
+    """Creates the KEY_SETTINGS_VERSION row if it is missing (called once per process at startup)."""
+    _insert_settings_version(db)
+    db.commit()
+
+def _bump_settings_version(db: Session):
+    bumped = db.query(SystemSetting).filter(SystemSetting.key == KEY_SETTINGS_VERSION).update(
+        {SystemSetting.value: cast(cast(SystemSetting.value, Integer) + 1, String)},
+        synchronize_session=False
+    )
+    if not bumped:
+        # Row lost (e.g. restored from an old backup) after startup: recreate it, then bump
+        _insert_settings_version(db)
+        _bump_settings_version(db)
+
+def set_system_setting(db: Session, key: str, value: str):
+    _put_system_setting(db, key, value)
+    _bump_settings_version(db)
     db.commit()
+    invalidate_settings_cache()
 
 def init_system_settings(db: Session):
+    ensure_settings_version(db)
     if not get_system_setting(db, KEY_FIRST_PERIOD):
         set_system_setting(db, KEY_FIRST_PERIOD, "1")
     if not get_system_setting(db, KEY_MANUAL_MODE):
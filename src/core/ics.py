@@ -0,0 +1,165 @@
+"""
+iCalendar (RFC 5545) feeds of a published schedule.
+
+Each reservation becomes a weekly recurring event; consecutive periods of the same
+team (or the same group's robotics class) are merged into one event when no break
+separates them. UIDs depend only on the owner, day and first period, so calendar
+apps update events in place across publishes (SEQUENCE is the version id).
+
+Feeds: LAB_FEED_KEY (everything), team_feed_key(id) (a team's lab time) and
+group_feed_key(group) (a group's robotics classes). crud.publish_schedule stores
+them as ScheduleArtifact rows.
+"""
+import datetime
+from core.periods import PERIODS
+
+LAB_FEED_KEY = "lab"
+PRODID = "-//RoboLab//Horario del Laboratorio//ES"
+_UID_DOMAIN = "robolab-schedule"
+
+
+def team_feed_key(team_id) -> str:
+    return f"team-{team_id}"
+
+
+def group_feed_key(group_name) -> str:
+    return f"group-{getattr(group_name, 'value', group_name)}"
+
+
+def is_feed_key(key: str) -> bool:
+    if key == LAB_FEED_KEY:
+        return True
+    kind, _, value = key.partition("-")
+    return (kind == "team" and value.isdigit()) or (kind == "group" and value in ("B", "D"))
+
+
+def _parse_time(text):
+    hours, minutes = text.strip().split(":")
+    return datetime.time(int(hours), int(minutes))
+
+
+# period -> (start, end)
+PERIOD_TIMES = {
+    idx: tuple(_parse_time(t) for t in p["time"].split("-"))
+    for idx, p in PERIODS.items()
+}
+
+
+def merge_periods(periods):
+    """Sorted periods -> [(first, last)] runs of back-to-back periods (no break in between)."""
+    runs = []
+    for period in sorted(set(periods)):
+        if runs and runs[-1][1] == period - 1 and PERIOD_TIMES[period - 1][1] == PERIOD_TIMES[period][0]:
+            runs[-1][1] = period
+        else:
+            runs.append([period, period])
+    return [tuple(run) for run in runs]
+
+
+def _escape(text) -> str:
+    return (str(text).replace("\\", "\\\\").replace(";", "\\;")
+            .replace(",", "\\,").replace("\n", "\\n"))
+
+
+def _fold(line: str) -> str:
+    """Folds a content line at 75 octets, as RFC 5545 requires."""
+    raw = line.encode("utf-8")
+    if len(raw) <= 75:
+        return line
+    parts, start, limit = [], 0, 75
+    while start < len(raw):
+        end = min(start + limit, len(raw))
+        while end < len(raw) and (raw[end] & 0xC0) == 0x80:  # don't split a UTF-8 sequence
+            end -= 1
+        parts.append(raw[start:end].decode("utf-8"))
+        start, limit = end, 74  # continuation lines start with a space
+    return "\r\n ".join(parts)
+
+
+def _stamp(moment: datetime.datetime) -> str:
+    return moment.strftime("%Y%m%dT%H%M%SZ")
+
+
+def build_events(entries):
+    """
+    Groups published entries into merged weekly events.
+    Returns [{"uid", "day", "first", "last", "summary", "feeds"}] sorted by day and period.
+    """
+    runs = {}
+    for e in entries:
+        if e["is_robotics_class"]:
+            owner = ("class", e["group_name"])
+        elif e["team_id"] is not None:
+            owner = ("team", e["team_id"])
+        else:
+            continue
+        runs.setdefault((owner, e["day_of_week"]), {"entry": e, "periods": []})["periods"].append(e["period"])
+
+    events = []
+    for ((kind, owner), day), run in runs.items():
+        entry = run["entry"]
+        if kind == "class":
+            summary = f"Clase de Robótica - Grupo {owner}"
+            feeds = [LAB_FEED_KEY, group_feed_key(owner)]
+        else:
+            summary = f"Laboratorio de Robótica - {entry['team_name'] or f'Equipo {owner}'}"
+            feeds = [LAB_FEED_KEY, team_feed_key(owner)]
+        for first, last in merge_periods(run["periods"]):
+            events.append({
+                "uid": f"{kind}-{owner}-d{day}-p{first}@{_UID_DOMAIN}",
+                "day": day, "first": first, "last": last,
+                "summary": summary, "feeds": feeds,
+            })
+    return sorted(events, key=lambda ev: (ev["day"], ev["first"], ev["uid"]))
+
+
+def build_calendar(name, events, version_id, published_at: datetime.datetime) -> str:
+    """One VCALENDAR with weekly events anchored on the week of `published_at`."""
+    monday = published_at.date() - datetime.timedelta(days=published_at.weekday())
+    lines = [
+        "BEGIN:VCALENDAR", "VERSION:2.0", f"PRODID:{PRODID}",
+        "CALSCALE:GREGORIAN", "METHOD:PUBLISH", f"X-WR-CALNAME:{_escape(name)}",
+    ]
+    for ev in events:
+        date = monday + datetime.timedelta(days=ev["day"])
+        start = datetime.datetime.combine(date, PERIOD_TIMES[ev["first"]][0])
+        end = datetime.datetime.combine(date, PERIOD_TIMES[ev["last"]][1])
+        lines += [
+            "BEGIN:VEVENT",
+            f"UID:{ev['uid']}",
+            f"SEQUENCE:{version_id}",
+            f"DTSTAMP:{_stamp(published_at)}",
+            # Floating local times: the lab's periods are wall-clock times
+            f"DTSTART:{start.strftime('%Y%m%dT%H%M%S')}",
+            f"DTEND:{end.strftime('%Y%m%dT%H%M%S')}",
+            "RRULE:FREQ=WEEKLY",
+            f"SUMMARY:{_escape(ev['summary'])}",
+            f"DESCRIPTION:{_escape(PERIODS[ev['first']]['label'])}"
+            + (f"-{_escape(PERIODS[ev['last']]['label'])}" if ev["last"] != ev["first"] else ""),
+            "END:VEVENT",
+        ]
+    lines.append("END:VCALENDAR")
+    return "".join(_fold(line) + "\r\n" for line in lines)
+
+
+def feed_name(key: str, team_name=None) -> str:
+    if key == LAB_FEED_KEY:
+        return "Laboratorio de Robótica"
+    kind, _, value = key.partition("-")
+    if kind == "team":
+        return f"Laboratorio de Robótica - {team_name or f'Equipo {value}'}"
+    return f"Clases de Robótica - Grupo {value}"
+
+
+def build_feeds(entries, version_id, published_at: datetime.datetime) -> dict:
+    """All feeds of a published schedule: {feed key: iCalendar text}."""
+    events = build_events(entries)
+    by_feed = {LAB_FEED_KEY: []}
+    for ev in events:
+        for key in ev["feeds"]:
+            by_feed.setdefault(key, []).append(ev)
+    team_names = {team_feed_key(e["team_id"]): e["team_name"] for e in entries if e["team_id"] is not None}
+    return {
+        key: build_calendar(feed_name(key, team_names.get(key)), evs, version_id, published_at)
+        for key, evs in by_feed.items()
+    }
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Enum as SqEnum, UniqueConstraint, DateTime
+from sqlalchemy import Column, Integer, String, Text, Boolean, ForeignKey, Enum as SqEnum, UniqueConstraint, DateTime
+from sqlalchemy.types import TypeDecorator
 from sqlalchemy.orm import relationship
 from enum import Enum
 import datetime
@@ -20,6 +21,29 @@ class ScheduleState(str, Enum):
     PUBLISHED = "PUBLISHED"
     NONE = "NONE"
 
+class ReservationOutcome(str, Enum):
+    CREATED = "CREATED"
+    SLOT_TAKEN = "SLOT_TAKEN"
+    QUOTA_EXCEEDED = "QUOTA_EXCEEDED"
+
+class WeekMask(TypeDecorator):
+    """
+    A weekly slot bitmask (5 days x 13 periods = 65 bits).
+    Stored as hex text because SQLite integers are limited to 64 bits.
+    """
+    impl = String
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return format(int(value), "x")
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return 0
+        return int(value, 16)
+
 class User(Base):
     __tablename__ = "users"
 
@@ -120,6 +144,64 @@ class Reservation(Base):
         UniqueConstraint('day_of_week', 'period', name='_single_robot_slot_uc'),
     )
 
+class ScheduleVersion(Base):
+    """
+    An immutable, precomputed snapshot of a published schedule.
+    Viewers read the version referenced by KEY_PUBLISHED_VERSION, so regenerating
+    or rejecting drafts in the reservations table never changes what they see.
+    """
+    __tablename__ = "schedule_versions"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow, nullable=False)
+    snapshot = Column(Text, nullable=False)  # compact JSON, see crud.publish_schedule
+
+class ScheduleArtifact(Base):
+    """
+    Files derived from a ScheduleVersion at publish time (iCalendar feeds, see core.ics),
+    so feed requests read one precomputed row. Not tracked for backups: rebuilt on demand.
+    """
+    __tablename__ = "schedule_artifacts"
+
+    version_id = Column(Integer, ForeignKey("schedule_versions.id"), primary_key=True)
+    key = Column(String, primary_key=True)  # 'lab', 'team-<id>' or 'group-<B|D>'
+    content = Column(Text, nullable=False)
+
+class AvailabilityMask(Base):
+    """Compact storage mode: all of a user's available slots in one week mask."""
+    __tablename__ = "availability_masks"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    mask = Column(WeekMask, nullable=False, default=0)
+
+class GroupBlockMask(Base):
+    """Compact storage mode: a group's theory-class blocks in one week mask."""
+    __tablename__ = "group_block_masks"
+
+    group_name = Column(SqEnum(GroupName), primary_key=True)
+    mask = Column(WeekMask, nullable=False, default=0)
+
+class RoboticsClassMask(Base):
+    """Compact storage mode: a teacher's robotics class periods for a group in one week mask."""
+    __tablename__ = "robotics_class_masks"
+
+    teacher_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    group_name = Column(SqEnum(GroupName), primary_key=True)
+    mask = Column(WeekMask, nullable=False, default=0)
+
+class ChangeLog(Base):
+    """
+    Row-level change log filled by database triggers (see core.changelog).
+    Incremental backups ship the rows touched since the last backup.
+    """
+    __tablename__ = "change_log"
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    table_name = Column(String, nullable=False)
+    op = Column(String(1), nullable=False)  # 'I', 'U' or 'D'
+    row_key = Column(String, nullable=False)  # JSON array of primary key values
+
 class SystemSetting(Base):
     __tablename__ = "system_settings"
 
@@ -130,3 +212,5 @@ class SystemSetting(Base):
 KEY_FIRST_PERIOD = "first_period"  # '1' or '3'
 KEY_MANUAL_MODE = "manual_mode"  # 'true' or 'false'
 KEY_SCHEDULE_STATUS = "schedule_status"  # 'DRAFT' or 'PUBLISHED'
+KEY_SETTINGS_VERSION = "settings_version"  # bumped on every settings write
+KEY_PUBLISHED_VERSION = "published_version"  # id of the ScheduleVersion shown to viewers
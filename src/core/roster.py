@@ -0,0 +1,146 @@
+"""
+Bulk roster import: users and teams from a CSV file.
+
+CSV columns (header required): username, full_name, password, role, team, group.
+`role` is a UserRole value (TEAM_MEMBER if empty), `team` a team name (created if
+missing, in the row's group) and `group` B or D. Rows with errors are reported and
+skipped; everything else is inserted in one transaction. Passwords are hashed across
+a process pool, since bcrypt dominates the cost of onboarding a semester.
+"""
+import csv
+import io
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from core.config import Config
+from core.crud import get_password_hash
+from core.models import User, Team, UserRole, GroupName
+
+ROSTER_COLUMNS = ["username", "full_name", "password", "role", "team", "group"]
+_REQUIRED = ["username", "full_name", "password"]
+# Below this many passwords a process pool costs more than it saves
+_MIN_ROWS_FOR_POOL = 8
+
+
+def parse_roster(source):
+    """
+    Reads and validates a roster CSV (text, or a text/binary file object).
+    Returns (rows, errors): rows are dicts with the CSV line number under "line";
+    errors are (line, message) tuples.
+    """
+    if hasattr(source, "read"):
+        source = source.read()
+    if isinstance(source, bytes):
+        source = source.decode("utf-8-sig")
+    reader = csv.DictReader(io.StringIO(source))
+    missing = [c for c in _REQUIRED if c not in (reader.fieldnames or [])]
+    if missing:
+        return [], [(1, f"Faltan columnas: {', '.join(missing)}")]
+
+    rows, errors, seen = [], [], set()
+    for record in reader:
+        line = reader.line_num
+        row = {c: (record.get(c) or "").strip() for c in ROSTER_COLUMNS}
+        # Passwords are taken verbatim
+        row["password"] = record.get("password") or ""
+        empty = [c for c in _REQUIRED if not row[c]]
+        if empty:
+            errors.append((line, f"Campos vacíos: {', '.join(empty)}"))
+            continue
+        try:
+            row["role"] = UserRole(row["role"].upper() or UserRole.TEAM_MEMBER)
+        except ValueError:
+            errors.append((line, f"Rol desconocido: {row['role']}"))
+            continue
+        try:
+            row["group"] = GroupName(row["group"].upper()) if row["group"] else None
+        except ValueError:
+            errors.append((line, f"Grupo desconocido: {row['group']}"))
+            continue
+        if row["username"] in seen:
+            errors.append((line, f"Usuario repetido en el archivo: {row['username']}"))
+            continue
+        seen.add(row["username"])
+        row["line"] = line
+        rows.append(row)
+    return rows, errors
+
+
+def hash_passwords(passwords, workers=None):
+    """Hashes passwords in order, across up to `workers` processes (os.cpu_count() by default)."""
+    workers = workers or os.cpu_count() or 1
+    # Passed explicitly so spawned workers use this process's cost, not their own Config
+    hash_fn = partial(get_password_hash, rounds=Config.BCRYPT_ROUNDS)
+    if workers <= 1 or len(passwords) < _MIN_ROWS_FOR_POOL:
+        return [hash_fn(p) for p in passwords]
+    chunksize = max(1, len(passwords) // (workers * 4))
+    # spawn, not fork: the Streamlit server is multi-threaded (auth pool, backup worker)
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return list(pool.map(hash_fn, passwords, chunksize=chunksize))
+
+
+def import_roster(db: Session, source, workers=None) -> dict:
+    """
+    Imports a roster CSV. Returns {"users_created", "teams_created", "errors", "seconds"},
+    where errors lists (line, message in Spanish, shown as-is in the admin UI) for every skipped row.
+    """
+    start = time.perf_counter()
+    rows, errors = parse_roster(source)
+
+    usernames = [r["username"] for r in rows]
+    existing = set()
+    for i in range(0, len(usernames), 500):
+        existing.update(u for (u,) in db.query(User.username).filter(User.username.in_(usernames[i:i + 500])))
+    teams = {name: (team_id, group) for team_id, name, group in db.query(Team.id, Team.name, Team.group_name)}
+
+    valid, new_teams = [], {}
+    for row in rows:
+        if row["username"] in existing:
+            errors.append((row["line"], f"El usuario ya existe: {row['username']}"))
+            continue
+        team = row["team"]
+        if team and team not in teams and team not in new_teams:
+            if row["group"] is None:
+                errors.append((row["line"], f"El equipo nuevo {team} necesita un grupo"))
+                continue
+            new_teams[team] = row["group"]
+        elif team and row["group"] is not None:
+            team_group = teams[team][1] if team in teams else new_teams[team]
+            if team_group != row["group"]:
+                errors.append((row["line"], f"El equipo {team} es del grupo {team_group.value}, "
+                                            f"no del {row['group'].value}"))
+                continue
+        valid.append(row)
+
+    hashes = hash_passwords([r["password"] for r in valid], workers)
+
+    try:
+        for name, group in new_teams.items():
+            team = Team(name=name, group_name=group)
+            db.add(team)
+            db.flush()
+            teams[name] = (team.id, group)
+        if valid:
+            db.execute(insert(User), [{
+                "username": r["username"],
+                "password_hash": password_hash,
+                "full_name": r["full_name"],
+                "role": r["role"],
+                "team_id": teams[r["team"]][0] if r["team"] else None,
+                "group_name": r["group"],
+            } for r, password_hash in zip(valid, hashes)])
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    return {
+        "users_created": len(valid),
+        "teams_created": len(new_teams),
+        "errors": sorted(errors),
+        "seconds": round(time.perf_counter() - start, 3),
+    }
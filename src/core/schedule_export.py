@@ -0,0 +1,235 @@
+"""
+Read-only HTTP service for the published schedule (JSON, CSV and iCalendar), stdlib only.
+
+Serves the same snapshot viewers see in the app (crud.get_published_schedule), so
+people checking when their team has the lab don't need a Streamlit session. Responses
+carry an ETag derived from the published version id and a hash of its content (ids can
+be reused after a restore); clients sending it back in If-None-Match get a 304 until the
+next publish. Encoded bodies are cached per version and content hash.
+
+Routes:
+    GET /schedule.json[?team_id=N][&group=B]
+    GET /schedule.csv[?team_id=N][&group=B]
+    GET /calendar/<feed>.ics  (lab, team-<id>, group-<B|D>; see core.ics)
+    GET /health
+"""
+import csv
+import hashlib
+import io
+import json
+import threading
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+from core.crud import get_published_schedule, get_schedule_feed
+from core.ics import is_feed_key
+from core.database import SessionLocal
+from core.models import Team
+from core.periods import PERIODS, DAYS
+
+CSV_COLUMNS = ["day_of_week", "day", "period", "period_label", "time",
+               "team_id", "team_name", "is_robotics_class", "group_name", "is_manual"]
+CONTENT_TYPES = {
+    "json": "application/json; charset=utf-8",
+    "csv": "text/csv; charset=utf-8",
+    "ics": "text/calendar; charset=utf-8",
+}
+# Entries of a published version never change, so clients only need to revalidate
+CACHE_CONTROL = "public, no-cache"
+_MAX_CACHED_BODIES = 64
+
+
+def filter_entries(entries, team_id=None, group_name=None, team_groups=None):
+    """
+    Entries of one team and/or one group: the group's teams (team_groups maps
+    team_id -> group name) plus the group's robotics classes.
+    """
+    if team_id is not None:
+        entries = [e for e in entries if e["team_id"] == team_id]
+    if group_name is not None:
+        team_groups = team_groups or {}
+        entries = [e for e in entries
+                   if (e["group_name"] or team_groups.get(e["team_id"])) == group_name]
+    return entries
+
+
+def _expand(entry):
+    period = PERIODS.get(entry["period"], {})
+    return {
+        **entry,
+        "day": DAYS[entry["day_of_week"]] if 0 <= entry["day_of_week"] < len(DAYS) else None,
+        "period_label": period.get("label"),
+        "time": period.get("time"),
+    }
+
+
+def schedule_json(version_id, entries) -> bytes:
+    return json.dumps({
+        "version": version_id,
+        "days": DAYS,
+        "periods": {str(idx): p for idx, p in PERIODS.items()},
+        "entries": [_expand(e) for e in entries],
+    }, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def schedule_csv(entries) -> bytes:
+    out = io.StringIO()
+    writer = csv.DictWriter(out, fieldnames=CSV_COLUMNS, extrasaction="ignore", lineterminator="\n")
+    writer.writeheader()
+    writer.writerows(_expand(e) for e in entries)
+    return out.getvalue().encode("utf-8")
+
+
+def snapshot_digest(entries) -> str:
+    """Short sha256 of a published snapshot's entries."""
+    encoded = json.dumps(entries, ensure_ascii=False, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()[:16]
+
+
+def make_etag(version_id, digest, fmt) -> str:
+    return f'"schedule-v{version_id}-{digest}-{fmt}"'
+
+
+def etag_matches(if_none_match, etag) -> bool:
+    """If-None-Match check with weak comparison, as RFC 9110 requires for GET."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+    return etag.removeprefix("W/") in tags
+
+
+class ScheduleService:
+    """Resolves a request to (status, headers, body), caching encoded bodies by version and content."""
+
+    def __init__(self, session_factory=SessionLocal):
+        self.session_factory = session_factory
+        self._bodies = {}
+        self._lock = threading.Lock()
+
+    def published(self):
+        """(version_id, entries, digest) of the published schedule; (None, [], None) if there is none."""
+        db = self.session_factory()
+        try:
+            version_id, entries = get_published_schedule(db)
+        finally:
+            db.close()
+        return version_id, entries, snapshot_digest(entries) if version_id is not None else None
+
+    def team_groups(self) -> dict:
+        db = self.session_factory()
+        try:
+            return {team_id: group.value for team_id, group in db.query(Team.id, Team.group_name)}
+        finally:
+            db.close()
+
+    def feed(self, key):
+        db = self.session_factory()
+        try:
+            return get_schedule_feed(db, key)
+        finally:
+            db.close()
+
+    def _cached(self, key, build) -> bytes:
+        with self._lock:
+            cached = self._bodies.get(key)
+        if cached is not None:
+            return cached
+        encoded = build()
+        with self._lock:
+            if len(self._bodies) >= _MAX_CACHED_BODIES:
+                self._bodies.clear()
+            self._bodies[key] = encoded
+        return encoded
+
+    def body(self, version_id, digest, entries, fmt, team_id, group_name) -> bytes:
+        def build():
+            team_groups = self.team_groups() if group_name else None
+            selected = filter_entries(entries, team_id, group_name, team_groups)
+            return schedule_json(version_id, selected) if fmt == "json" else schedule_csv(selected)
+        return self._cached((version_id, digest, fmt, team_id, group_name), build)
+
+    def handle_feed(self, key, if_none_match):
+        version_id, _, digest = self.published()
+        if version_id is None:
+            return _error(HTTPStatus.NOT_FOUND, "No published schedule")
+        if not is_feed_key(key):
+            return _error(HTTPStatus.NOT_FOUND, "Unknown calendar")
+        etag = make_etag(version_id, digest, f"{key}.ics")
+        headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+        if etag_matches(if_none_match, etag):
+            return HTTPStatus.NOT_MODIFIED, headers, b""
+        headers["Content-Type"] = CONTENT_TYPES["ics"]
+        return HTTPStatus.OK, headers, self._cached(
+            (version_id, digest, "ics", key), lambda: self.feed(key)[1].encode("utf-8")
+        )
+
+    def handle(self, path, if_none_match=None):
+        url = urlsplit(path)
+        if url.path == "/health":
+            return HTTPStatus.OK, {"Content-Type": CONTENT_TYPES["json"]}, b'{"status":"ok"}'
+        if url.path.startswith("/calendar/") and url.path.endswith(".ics"):
+            return self.handle_feed(url.path[len("/calendar/"):-len(".ics")], if_none_match)
+        fmt = {"/schedule.json": "json", "/schedule.csv": "csv"}.get(url.path)
+        if fmt is None:
+            return _error(HTTPStatus.NOT_FOUND, "Unknown route")
+
+        query = parse_qs(url.query)
+        try:
+            team_id = int(query["team_id"][0]) if "team_id" in query else None
+        except ValueError:
+            return _error(HTTPStatus.BAD_REQUEST, "team_id must be an integer")
+        group_name = query["group"][0].upper() if "group" in query else None
+
+        version_id, entries, digest = self.published()
+        if version_id is None:
+            return _error(HTTPStatus.NOT_FOUND, "No published schedule")
+
+        etag = make_etag(version_id, digest, fmt)
+        headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+        if etag_matches(if_none_match, etag):
+            return HTTPStatus.NOT_MODIFIED, headers, b""
+        headers["Content-Type"] = CONTENT_TYPES[fmt]
+        return HTTPStatus.OK, headers, self.body(version_id, digest, entries, fmt, team_id, group_name)
+
+
+def _error(status, message):
+    return status, {"Content-Type": CONTENT_TYPES["json"]}, json.dumps({"error": message}).encode("utf-8")
+
+
+class ScheduleRequestHandler(BaseHTTPRequestHandler):
+    server_version = "RobolabSchedule/1.0"
+    service: ScheduleService = None  # set by create_server
+
+    def _respond(self, send_body):
+        status, headers, body = self.service.handle(self.path, self.headers.get("If-None-Match"))
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Access-Control-Allow-Origin", "*")
+        if status != HTTPStatus.NOT_MODIFIED:
+            self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if send_body and status != HTTPStatus.NOT_MODIFIED:
+            self.wfile.write(body)
+
+    def do_GET(self):
+        self._respond(send_body=True)
+
+    def do_HEAD(self):
+        self._respond(send_body=False)
+
+    def log_message(self, format, *args):
+        if getattr(self.server, "verbose", False):
+            super().log_message(format, *args)
+
+
+def create_server(host="127.0.0.1", port=8601, session_factory=SessionLocal, verbose=False):
+    """Returns a ThreadingHTTPServer serving the published schedule (call serve_forever())."""
+    handler = type("BoundScheduleRequestHandler", (ScheduleRequestHandler,),
+                   {"service": ScheduleService(session_factory)})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.verbose = verbose
+    return server
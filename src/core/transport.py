@@ -0,0 +1,231 @@
+"""
+Transportes de backup: dónde viven los archivos del backup.
+
+- GitHubTransport escribe con la API de datos de git (blobs, trees, commits, refs)
+  usando una requests.Session compartida. No tiene el límite de ~1 MB del endpoint
+  de contenidos y todos los archivos de un backup quedan en un único commit.
+- LocalDirTransport guarda los mismos archivos en un directorio local.
+
+Los archivos más grandes que `chunk_size` se dividen en partes `<nombre>.part-NNNN`
+y un índice `<nombre>.chunks.json` con el SHA-256 de cada parte y del total.
+"""
+import base64
+import hashlib
+import json
+import os
+import time
+from abc import ABC, abstractmethod
+import requests
+
+DEFAULT_CHUNK_SIZE = 4 * 1024 * 1024
+
+
+class TransportError(Exception):
+    """Fallo al leer o escribir archivos de backup en el transporte."""
+
+
+def _index_name(name):
+    return f"{name}.chunks.json"
+
+
+class BackupTransport(ABC):
+    """
+    Base de los transportes. Las subclases implementan get_file, exists y put_files;
+    esta clase añade la división en partes y su verificación.
+    """
+    label = "el transporte"
+
+    def __init__(self, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.chunk_size = chunk_size
+
+    # --- Primitivas de cada backend ---
+    @abstractmethod
+    def get_file(self, name) -> bytes | None:
+        """Contenido de un archivo tal como está guardado, o None si no existe."""
+
+    @abstractmethod
+    def exists(self, name) -> bool:
+        """Si el archivo existe en el transporte."""
+
+    @abstractmethod
+    def put_files(self, changes: dict, message: str):
+        """Aplica {nombre: bytes o None (borrar)} de forma atómica en lo posible."""
+
+    # --- API de alto nivel (con partes) ---
+    def _read_index(self, name):
+        raw = self.get_file(_index_name(name))
+        return json.loads(raw) if raw is not None else None
+
+    def get(self, name) -> bytes | None:
+        """Lee un archivo, reensamblando y verificando sus partes si está dividido."""
+        index = self._read_index(name)
+        if index is None:
+            return self.get_file(name)
+
+        parts = []
+        for chunk in index["chunks"]:
+            raw = self.get_file(chunk["path"])
+            if raw is None:
+                raise TransportError(f"Falta la parte {chunk['path']} de {name}.")
+            if hashlib.sha256(raw).hexdigest() != chunk["sha256"]:
+                raise TransportError(f"La parte {chunk['path']} de {name} está corrupta.")
+            parts.append(raw)
+        data = b"".join(parts)
+        if hashlib.sha256(data).hexdigest() != index["sha256"]:
+            raise TransportError(f"El archivo {name} reensamblado no coincide con su índice.")
+        return data
+
+    def put(self, files: dict, message="Auto-backup base de datos"):
+        """
+        Escribe {nombre: bytes} (None borra el archivo) en una sola operación,
+        dividiendo en partes los archivos grandes y borrando partes obsoletas.
+        """
+        changes = {}
+        for name, raw in files.items():
+            old_index = self._read_index(name)
+            stale = [c["path"] for c in old_index["chunks"]] if old_index else []
+            if old_index:
+                stale.append(_index_name(name))
+
+            if raw is None:
+                if self.exists(name):
+                    changes[name] = None
+            elif len(raw) <= self.chunk_size:
+                changes[name] = raw
+            else:
+                # Una copia entera anterior quedaría obsoleta y get() podría leerla sin índice
+                if self.exists(name):
+                    stale.append(name)
+                view = memoryview(raw)
+                chunks = []
+                for i, offset in enumerate(range(0, len(raw), self.chunk_size)):
+                    part = view[offset:offset + self.chunk_size]
+                    path = f"{name}.part-{i:04d}"
+                    changes[path] = part
+                    chunks.append({"path": path, "size": len(part), "sha256": hashlib.sha256(part).hexdigest()})
+                index = {"size": len(raw), "sha256": hashlib.sha256(raw).hexdigest(), "chunks": chunks}
+                changes[_index_name(name)] = json.dumps(index, indent=1).encode()
+
+            for path in stale:
+                changes.setdefault(path, None)
+
+        if changes:
+            self.put_files(changes, message)
+
+
+class LocalDirTransport(BackupTransport):
+    """Guarda los archivos de backup en un directorio local."""
+
+    def __init__(self, root, chunk_size=DEFAULT_CHUNK_SIZE):
+        super().__init__(chunk_size)
+        self.root = root
+        self.label = f"el directorio {root}"
+
+    def _path(self, name):
+        return os.path.join(self.root, name)
+
+    def get_file(self, name):
+        try:
+            with open(self._path(name), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def exists(self, name):
+        return os.path.exists(self._path(name))
+
+    def put_files(self, changes, message):
+        # Primero se escriben los archivos nuevos (el manifiesto incluido) y solo después
+        # se borran los obsoletos: si el proceso muere a mitad, nada apunta a archivos borrados.
+        for name, raw in changes.items():
+            if raw is None:
+                continue
+            path = self._path(name)
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            tmp = f"{path}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(raw)
+            os.replace(tmp, path)
+        for name, raw in changes.items():
+            path = self._path(name)
+            if raw is None and os.path.exists(path):
+                os.remove(path)
+
+
+class GitHubTransport(BackupTransport):
+    """Guarda los archivos de backup en un repositorio de GitHub mediante la API de datos de git."""
+    label = "GitHub"
+    LISTING_TTL = 5  # segundos que se reutiliza el listado del árbol
+
+    def __init__(self, token, repo, branch="main", api_url="https://api.github.com",
+                 chunk_size=DEFAULT_CHUNK_SIZE, session=None, timeout=30):
+        super().__init__(chunk_size)
+        self.repo = repo
+        self.branch = branch
+        self.api_url = api_url.rstrip("/")
+        self.timeout = timeout
+        self.session = session or requests.Session()
+        self.session.headers.update({
+            "Authorization": f"token {token}",
+            "Accept": "application/vnd.github+json",
+        })
+        self._listing = None
+        self._listing_at = 0.0
+
+    def _call(self, method, path, expected=(200,), **kwargs):
+        url = f"{self.api_url}/repos/{self.repo}/{path}"
+        try:
+            resp = self.session.request(method, url, timeout=self.timeout, **kwargs)
+        except requests.RequestException as e:
+            raise TransportError(f"{method} {path}: {e}") from e
+        if resp.status_code not in expected:
+            raise TransportError(f"{method} {path}: {resp.status_code} - {resp.text}")
+        return resp.json()
+
+    def _head(self):
+        """Retorna (sha del commit de la rama, sha de su árbol)."""
+        commit_sha = self._call("GET", f"git/ref/heads/{self.branch}")["object"]["sha"]
+        tree_sha = self._call("GET", f"git/commits/{commit_sha}")["tree"]["sha"]
+        return commit_sha, tree_sha
+
+    def _blob_shas(self):
+        """{ruta: sha del blob} de la rama, reutilizado durante LISTING_TTL segundos."""
+        if self._listing is None or time.monotonic() - self._listing_at > self.LISTING_TTL:
+            _, tree_sha = self._head()
+            tree = self._call("GET", f"git/trees/{tree_sha}", params={"recursive": "1"})
+            if tree.get("truncated"):
+                # El listado recursivo tiene límite: los archivos que falten parecerían no existir
+                raise TransportError(f"El árbol de {self.repo} es demasiado grande para listarlo completo.")
+            self._listing = {e["path"]: e["sha"] for e in tree["tree"] if e["type"] == "blob"}
+            self._listing_at = time.monotonic()
+        return self._listing
+
+    def exists(self, name):
+        return name in self._blob_shas()
+
+    def get_file(self, name):
+        sha = self._blob_shas().get(name)
+        if sha is None:
+            return None
+        blob = self._call("GET", f"git/blobs/{sha}")
+        return base64.b64decode(blob["content"])
+
+    def put_files(self, changes, message):
+        commit_sha, tree_sha = self._head()
+        entries = []
+        for path, raw in changes.items():
+            sha = None
+            if raw is not None:
+                blob = self._call("POST", "git/blobs", expected=(201,), json={
+                    "content": base64.b64encode(raw).decode(),
+                    "encoding": "base64",
+                })
+                sha = blob["sha"]
+            entries.append({"path": path, "mode": "100644", "type": "blob", "sha": sha})
+
+        tree = self._call("POST", "git/trees", expected=(201,), json={"base_tree": tree_sha, "tree": entries})
+        commit = self._call("POST", "git/commits", expected=(201,), json={
+            "message": message, "tree": tree["sha"], "parents": [commit_sha],
+        })
+        self._call("PATCH", f"git/refs/heads/{self.branch}", json={"sha": commit["sha"]})
+        self._listing = None
@@ -0,0 +1,21 @@
+"""
+Schedule engines, by name. Engine classes are imported on first use (numpy & co.).
+
+Every engine takes (teams_data, availabilities, group_blocks, robotics_class_slots,
+first_period, seed) -- see crud.get_ga_inputs -- and provides run(generations,
+pop_size, time_budget) and score(schedule).
+"""
+import importlib
+
+# Name -> (module, class)
+ENGINES = {
+    "ga": ("engine.ga_engine", "GeneticAlgorithmEngine"),
+}
+
+
+def load_engine(name):
+    """Returns the engine class registered as `name`. Raises ValueError if unknown."""
+    if name not in ENGINES:
+        raise ValueError(f"Unknown engine: {name} (available: {', '.join(sorted(ENGINES))})")
+    module_name, class_name = ENGINES[name]
+    return getattr(importlib.import_module(module_name), class_name)
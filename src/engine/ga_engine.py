@@ -1,17 +1,21 @@
 import random
+import time
 import numpy as np
 from collections import defaultdict
 from core.periods import PERIOD_INDICES
 
 class GeneticAlgorithmEngine:
-    def __init__(self, teams_data, availabilities, group_blocks, robotics_class_slots=None, first_period=1):
+    def __init__(self, teams_data, availabilities, group_blocks, robotics_class_slots=None, first_period=1,
+                 seed=None):
         """
         teams_data: List of dicts: [{'id': 1, 'group_name': 'B', 'members': [{'id': 101, 'role': 'TEAM_LEADER'}, ...]}, ...]
         availabilities: Dict mapping user_id -> set of (day, period).
         group_blocks: Set of (group_name, day, period) tuples.
         robotics_class_slots: List of {'group_name': 'B', 'day': 0, 'period': 3} - mandatory lab reservations.
         first_period: int, 1 or 3 (whether the lab opens at P1 or P3).
+        seed: seed for this engine's random generator, for reproducible runs.
         """
+        self.rng = random.Random(seed)
         self.teams_data = teams_data
         self.team_ids = [t['id'] for t in teams_data]
         self.team_map = {t['id']: t for t in teams_data}
@@ -51,8 +55,8 @@ class GeneticAlgorithmEngine:
             chromosome = []
             for i in range(self.num_slots):
                 valid_teams = self.valid_teams_for_slot[i]
-                if valid_teams and random.random() > 0.3:
-                    chromosome.append(random.choice(valid_teams))
+                if valid_teams and self.rng.random() > 0.3:
+                    chromosome.append(self.rng.choice(valid_teams))
                 else:
                     chromosome.append(None)
             population.append(chromosome)
@@ -113,7 +117,7 @@ class GeneticAlgorithmEngine:
     def crossover(self, parent1, parent2):
         if self.num_slots < 2:
             return parent1, parent2
-        point = random.randint(1, self.num_slots - 1)
+        point = self.rng.randint(1, self.num_slots - 1)
         child1 = parent1[:point] + parent2[point:]
         child2 = parent2[:point] + parent1[point:]
         return child1, child2
@@ -121,18 +125,27 @@ class GeneticAlgorithmEngine:
     def mutate(self, chromosome, mutation_rate=0.05):
         new_chrom = list(chromosome)
         for i in range(self.num_slots):
-            if random.random() < mutation_rate:
+            if self.rng.random() < mutation_rate:
                 valid_teams = self.valid_teams_for_slot[i]
-                if valid_teams and random.random() > 0.3:
-                    new_chrom[i] = random.choice(valid_teams)
+                if valid_teams and self.rng.random() > 0.3:
+                    new_chrom[i] = self.rng.choice(valid_teams)
                 else:
                     new_chrom[i] = None
         return new_chrom
 
-    def run(self, generations=50, pop_size=20):
+    def run(self, generations=50, pop_size=20, time_budget=None):
+        """
+        Evolves the schedule for `generations` generations, or until `time_budget`
+        seconds have passed. Sets generations_run and best_fitness.
+        """
+        deadline = time.perf_counter() + time_budget if time_budget else None
         population = self.generate_initial_population(pop_size)
+        self.generations_run = 0
 
         for gen in range(generations):
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+            self.generations_run += 1
             fitnesses = [self.calculate_fitness(chrom) for chrom in population]
             pop_fit = list(zip(population, fitnesses))
             pop_fit.sort(key=lambda x: x[1], reverse=True)
@@ -143,8 +156,8 @@ class GeneticAlgorithmEngine:
 
             while len(new_population) < pop_size:
                 limit = len(population) // 2
-                p1 = population[random.randint(0, limit)]
-                p2 = population[random.randint(0, limit)]
+                p1 = population[self.rng.randint(0, limit)]
+                p2 = population[self.rng.randint(0, limit)]
 
                 child1, child2 = self.crossover(p1, p2)
                 new_population.append(self.mutate(child1))
@@ -153,9 +166,27 @@ class GeneticAlgorithmEngine:
 
             population = new_population
 
-        best_chromosome = population[0]
+        best_chromosome = max(population, key=self.calculate_fitness)
+        self.best_fitness = self.calculate_fitness(best_chromosome)
         return self.decode_chromosome(best_chromosome)
 
+    def encode_schedule(self, schedule):
+        """
+        Inverse of decode_chromosome: a chromosome for a schedule in run()'s format.
+        Entries on locked slots, or before the first period, are ignored.
+        """
+        slot_index = {slot: i for i, slot in enumerate(self.slots)}
+        chromosome = [None] * self.num_slots
+        for item in schedule:
+            i = slot_index.get((item['day_of_week'], item['period']))
+            if i is not None and not item.get('is_robotics_class') and item.get('team_id') in self.team_map:
+                chromosome[i] = item['team_id']
+        return chromosome
+
+    def score(self, schedule):
+        """Fitness of an existing schedule (-inf if it breaks a group block)."""
+        return self.calculate_fitness(self.encode_schedule(schedule))
+
     def decode_chromosome(self, chromosome):
         schedule = []
         # Free-slot assignments from GA
@@ -0,0 +1,59 @@
+"""
+Import-time report for the app entry point, using `python -X importtime`.
+
+Prints the slowest imports of `import app` and fails (exit code 1) if a module
+that should only load on demand is imported at startup.
+"""
+import os
+import subprocess
+import sys
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Loaded only when a dashboard, the GA engine or the backup tab needs them
+LAZY_MODULES = [
+    "pandas", "numpy", "requests",
+    "engine.ga_engine", "core.backup", "core.transport",
+    "ui.admin_dashboard", "ui.student_dashboard", "ui.teacher_dashboard",
+    "ui.team_leader_dashboard", "ui.group_chief_dashboard", "ui.components",
+]
+
+
+def measure_imports(module="app"):
+    """Imports `module` in a fresh interpreter. Returns [(cumulative_us, self_us, name)] sorted by cumulative time."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=SRC_DIR, capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative_us), int(self_us), name.strip()))
+    return sorted(rows, reverse=True)
+
+
+def eager_lazy_modules(rows):
+    """Returns the LAZY_MODULES that were imported at startup."""
+    loaded = {name for _, _, name in rows}
+    return [m for m in LAZY_MODULES if m in loaded]
+
+
+def main(top=15):
+    rows = measure_imports()
+    total = sum(self_us for _, self_us, _ in rows)
+    print(f"import app: {total / 1000:.0f} ms across {len(rows)} modules")
+    for cumulative_us, self_us, name in rows[:top]:
+        print(f"  {cumulative_us / 1000:8.1f} ms  {name}")
+
+    eager = eager_lazy_modules(rows)
+    if eager:
+        print(f"Modules that should load lazily were imported at startup: {', '.join(eager)}")
+        return 1
+    print("OK: no lazily-loaded modules imported at startup.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
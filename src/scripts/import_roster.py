@@ -0,0 +1,26 @@
+import argparse
+from core.database import engine, Base, SessionLocal
+from core.roster import import_roster, ROSTER_COLUMNS
+
+def main():
+    parser = argparse.ArgumentParser(description="Import users and teams from a roster CSV.")
+    parser.add_argument("csv_path", help=f"CSV with columns: {', '.join(ROSTER_COLUMNS)}")
+    parser.add_argument("--workers", type=int, default=None, help="Password hashing processes (default: CPU count)")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        with open(args.csv_path, "rb") as f:
+            result = import_roster(db, f, workers=args.workers)
+    finally:
+        db.close()
+
+    print(f"Created {result['users_created']} users and {result['teams_created']} teams "
+          f"in {result['seconds']} s.")
+    for line, message in result["errors"]:
+        print(f"  line {line}: {message}")
+    return 1 if result["errors"] else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -2,10 +2,12 @@ from core.database import engine, Base, SessionLocal
 import core.models as models
 from core.models import User, UserRole, GroupName, Team, RoboticsClassSchedule
 from core.crud import create_user, create_team, init_system_settings
+from core.changelog import install_change_tracking
 
 def init_db():
     print("Creating database tables...")
     Base.metadata.create_all(bind=engine)
+    install_change_tracking(engine)
     print("Database tables created successfully.")
 
     db = SessionLocal()
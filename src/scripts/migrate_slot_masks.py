@@ -0,0 +1,19 @@
+from core.database import engine, Base, SessionLocal
+from core.crud import backfill_slot_masks
+
+def migrate_slot_masks():
+    print("Creating week-mask tables...")
+    Base.metadata.create_all(bind=engine)
+
+    db = SessionLocal()
+    try:
+        print("Backfilling week masks from per-slot tables...")
+        counts = backfill_slot_masks(db)
+        for table, count in counts.items():
+            print(f"  {table}: {count} rows")
+    finally:
+        db.close()
+    print("Migration complete. Set SLOT_STORAGE=mask to read and write the compact tables.")
+
+if __name__ == "__main__":
+    migrate_slot_masks()
@@ -0,0 +1,184 @@
+"""
+Headless schedule generation and scoring, for cron jobs or big machines.
+
+    python -m scripts.schedule_cli export-inputs inputs.json
+    python -m scripts.schedule_cli generate [--inputs inputs.json] [--seed 7] [--time-budget 600]
+                                            [--generations 5000] [--pop-size 200] [--output out.json | --commit]
+    python -m scripts.schedule_cli score (--schedule out.json | --draft | --published) [--inputs inputs.json]
+
+Inputs come from the database unless --inputs points to a JSON snapshot written by
+export-inputs, so generation can run on another machine without the database.
+"""
+import argparse
+import collections
+import json
+import math
+import sys
+import time
+from core.database import SessionLocal
+from core.crud import get_ga_inputs, get_schedule_entries, get_published_schedule, save_schedule_draft
+from engine import ENGINES, load_engine
+
+INPUTS_FORMAT = "robolab-ga-inputs"
+
+
+def _value(x):
+    return getattr(x, "value", x)
+
+
+def dump_ga_inputs(inputs: dict) -> dict:
+    """GA inputs (see crud.get_ga_inputs) as a JSON-serializable snapshot."""
+    return {
+        "format": INPUTS_FORMAT,
+        "teams": [
+            {**t, "group_name": _value(t["group_name"]),
+             "members": [{"id": m["id"], "role": _value(m["role"])} for m in t["members"]]}
+            for t in inputs["teams_data"]
+        ],
+        "availabilities": {str(uid): sorted(slots) for uid, slots in inputs["availabilities"].items()},
+        "group_blocks": sorted([_value(g), d, p] for g, d, p in inputs["group_blocks"]),
+        "robotics_class_slots": [{**s, "group_name": _value(s["group_name"])} for s in inputs["robotics_class_slots"]],
+        "first_period": inputs["first_period"],
+    }
+
+
+def load_ga_inputs(data: dict) -> dict:
+    """Inverse of dump_ga_inputs. Raises ValueError for anything else."""
+    if data.get("format") != INPUTS_FORMAT:
+        raise ValueError(f"Not a {INPUTS_FORMAT} snapshot")
+    return {
+        "teams_data": data["teams"],
+        "availabilities": {int(uid): {tuple(s) for s in slots} for uid, slots in data["availabilities"].items()},
+        "group_blocks": {tuple(b) for b in data["group_blocks"]},
+        "robotics_class_slots": data["robotics_class_slots"],
+        "first_period": int(data["first_period"]),
+    }
+
+
+def _read_inputs(path):
+    if path:
+        with open(path, encoding="utf-8") as f:
+            return load_ga_inputs(json.load(f))
+    db = SessionLocal()
+    try:
+        return get_ga_inputs(db)
+    finally:
+        db.close()
+
+
+def _json_fitness(fitness):
+    # -inf (a group block is broken) is not valid JSON
+    return fitness if math.isfinite(fitness) else None
+
+
+def _write_json(payload, path):
+    text = json.dumps(payload, ensure_ascii=False, indent=2)
+    if path in (None, "-"):
+        print(text)
+    else:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+
+
+def cmd_export_inputs(args):
+    _write_json(dump_ga_inputs(_read_inputs(None)), args.output)
+    return 0
+
+
+def cmd_generate(args):
+    inputs = _read_inputs(args.inputs)
+    engine = load_engine(args.engine)(**inputs, seed=args.seed)
+    start = time.perf_counter()
+    schedule = engine.run(generations=args.generations, pop_size=args.pop_size, time_budget=args.time_budget)
+    seconds = round(time.perf_counter() - start, 3)
+    print(f"{args.engine}: fitness {engine.best_fitness:.2f} after {engine.generations_run} generations "
+          f"in {seconds} s", file=sys.stderr)
+
+    if args.commit:
+        db = SessionLocal()
+        try:
+            rows = save_schedule_draft(db, schedule, keep_manual=False)
+        finally:
+            db.close()
+        print(f"Saved {rows} reservations as a draft.", file=sys.stderr)
+        return 0
+    _write_json({
+        "engine": args.engine,
+        "seed": args.seed,
+        "fitness": _json_fitness(engine.best_fitness),
+        "generations_run": engine.generations_run,
+        "seconds": seconds,
+        "schedule": schedule,
+    }, args.output)
+    return 0
+
+
+def _read_schedule(args):
+    if args.schedule:
+        with open(args.schedule, encoding="utf-8") as f:
+            data = json.load(f)
+        return data["schedule"] if isinstance(data, dict) else data
+    db = SessionLocal()
+    try:
+        return get_published_schedule(db)[1] if args.published else get_schedule_entries(db)
+    finally:
+        db.close()
+
+
+def cmd_score(args):
+    inputs = _read_inputs(args.inputs)
+    engine = load_engine(args.engine)(**inputs)
+    schedule = _read_schedule(args)
+    fitness = engine.score(schedule)
+    team_hours = collections.Counter(
+        e["team_id"] for e in schedule if not e.get("is_robotics_class") and e.get("team_id") is not None
+    )
+    _write_json({
+        "engine": args.engine,
+        "fitness": _json_fitness(fitness),
+        "valid": math.isfinite(fitness),
+        "reservations": sum(team_hours.values()),
+        "team_hours": {str(t["id"]): team_hours.get(t["id"], 0) for t in inputs["teams_data"]},
+    }, args.output)
+    return 0 if math.isfinite(fitness) else 1
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Generate and score lab schedules outside the web app.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    export = sub.add_parser("export-inputs", help="Write the GA inputs from the database as a JSON snapshot")
+    export.add_argument("output", nargs="?", default="-", help="Output file ('-' for stdout)")
+    export.set_defaults(func=cmd_export_inputs)
+
+    def add_common(p):
+        p.add_argument("--inputs", help="JSON snapshot from export-inputs (default: read the database)")
+        p.add_argument("--engine", default="ga", choices=sorted(ENGINES))
+        p.add_argument("--output", default="-", help="Output file ('-' for stdout)")
+
+    generate = sub.add_parser("generate", help="Run an engine and write the schedule")
+    add_common(generate)
+    generate.add_argument("--generations", type=int, default=50)
+    generate.add_argument("--pop-size", type=int, default=20)
+    generate.add_argument("--seed", type=int, default=None)
+    generate.add_argument("--time-budget", type=float, default=None, help="Stop after this many seconds")
+    generate.add_argument("--commit", action="store_true", help="Save the schedule as the draft in the database")
+    generate.set_defaults(func=cmd_generate)
+
+    score = sub.add_parser("score", help="Score an existing schedule")
+    add_common(score)
+    source = score.add_mutually_exclusive_group(required=True)
+    source.add_argument("--schedule", help="JSON file: generate's output or a list of entries")
+    source.add_argument("--draft", action="store_true", help="The working (draft) reservations")
+    source.add_argument("--published", action="store_true", help="The published schedule")
+    score.set_defaults(func=cmd_score)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
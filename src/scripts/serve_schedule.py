@@ -0,0 +1,22 @@
+import argparse
+from core.schedule_export import create_server
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the published schedule as JSON and CSV (read-only).")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8601)
+    parser.add_argument("--verbose", action="store_true", help="Log every request")
+    args = parser.parse_args()
+
+    server = create_server(args.host, args.port, verbose=args.verbose)
+    print(f"Serving /schedule.json, /schedule.csv and /calendar/*.ics on http://{args.host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
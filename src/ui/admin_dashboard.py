@@ -1,28 +1,36 @@
 import streamlit as st
+from core.config import Config
 from core.database import get_db
 from core.crud import (
-    get_system_setting, set_system_setting, clear_schedule, create_reservation,
-    get_all_teams, get_user_availability, get_all_group_blocks, get_all_reservations,
-    delete_reservation, get_users_by_team, get_all_users, update_user_role_and_team,
-    create_team, set_robotics_class_schedule, get_robotics_class_schedule_by_teacher,
-    get_all_robotics_class_schedules
+    get_system_setting, set_system_setting, save_schedule_draft,
+    get_all_teams, get_schedule_entries, get_ga_inputs,
+    publish_schedule, reject_schedule_draft, search_users, get_user_by_id, update_user_role_and_team,
+    create_team, set_robotics_class_schedule, get_robotics_class_slots_by_teacher,
+    get_readiness_report
 )
-from engine.ga_engine import GeneticAlgorithmEngine
 from core.models import (
     KEY_FIRST_PERIOD, KEY_MANUAL_MODE, KEY_SCHEDULE_STATUS,
     ScheduleState, UserRole, GroupName
 )
-from ui.components import schedule_grid, availability_grid
-from core.backup import trigger_backup, export_db_to_json, load_backup_from_github, import_db_from_json
+from ui.components import schedule_grid, availability_editor
+from core.backup_worker import get_auto_backup_worker
+from core.bootstrap import get_init_report
+from core.auth import get_login_metrics
+import io
 import pandas as pd
 
+USERS_PAGE_SIZE = 50
+BACKUP_PREVIEW_PAGE_SIZE = 50
+
 def admin_dashboard():
     user = st.session_state["user"]
     st.title("Panel de Administración")
 
     db = next(get_db())
 
-    tab1, tab2, tab3, tab4 = st.tabs(["Gestión de Horarios", "Gestión de Equipos", "Gestión de Usuarios", "Backup / Restaurar"])
+    tab1, tab2, tab3, tab4, tab5 = st.tabs([
+        "Gestión de Horarios", "Gestión de Equipos", "Gestión de Usuarios", "Backup / Restaurar", "Preparación"
+    ])
 
     # --- TAB 1: Gestión de Horarios ---
     with tab1:
@@ -59,16 +67,15 @@ def admin_dashboard():
             st.write("Selecciona los períodos en los que impartes tu clase de robótica. Estos períodos quedarán reservados obligatoriamente para tu grupo en el laboratorio.")
 
             teacher_id = user['id']
-            existing_rcs = get_robotics_class_schedule_by_teacher(db, teacher_id)
-            current_rcs_slots = [(r.day_of_week, r.period) for r in existing_rcs]
+            current_rcs_slots = get_robotics_class_slots_by_teacher(db, teacher_id)
 
-            new_rcs_slots = availability_grid(
+            new_rcs_slots, rcs_changed = availability_editor(
                 current_rcs_slots,
                 key_prefix=f"rcs_admin_{teacher_id}",
                 title="Horario de Clase Robótica"
             )
 
-            if st.button("Guardar Horario de Clase"):
+            if st.button("Guardar Horario de Clase", disabled=not rcs_changed):
                 set_robotics_class_schedule(db, teacher_id, GroupName(teacher_group), new_rcs_slots)
                 st.success("Horario de clase guardado.")
                 st.rerun()
@@ -87,77 +94,36 @@ def admin_dashboard():
             if st.button("Ejecutar Algoritmo Genético"):
                 with st.spinner("Ejecutando GA... Esto puede tardar unos segundos..."):
                     try:
-                        teams = get_all_teams(db)
-                        teams_data = []
-                        for t in teams:
-                            members = get_users_by_team(db, t.id)
-                            members_data = [{'id': m.id, 'role': m.role} for m in members]
-                            teams_data.append({
-                                'id': t.id,
-                                'name': t.name,
-                                'group_name': t.group_name,
-                                'members': members_data
-                            })
-
-                        availabilities = {}
-                        for t in teams:
-                            for m in t.members:
-                                avails = get_user_availability(db, m.id)
-                                availabilities[m.id] = set((a.day_of_week, a.period) for a in avails)
-
-                        group_blocks = set()
-                        blocks = get_all_group_blocks(db)
-                        for b in blocks:
-                            group_blocks.add((b.group_name, b.day_of_week, b.period))
-
-                        # Robotics class slots
-                        robotics_schedules = get_all_robotics_class_schedules(db)
-                        robotics_class_slots = [
-                            {'group_name': r.group_name, 'day': r.day_of_week, 'period': r.period}
-                            for r in robotics_schedules
-                        ]
-
-                        ga = GeneticAlgorithmEngine(
-                            teams_data, availabilities, group_blocks,
-                            robotics_class_slots, first_period
-                        )
-                        schedule = ga.run()
+                        # El motor (numpy) solo se carga al ejecutarlo
+                        from engine import load_engine
 
-                        clear_schedule(db, keep_manual=False)
-                        for item in schedule:
-                            try:
-                                create_reservation(
-                                    db, item['team_id'], item['day_of_week'], item['period'],
-                                    is_manual=False,
-                                    is_robotics_class=item.get('is_robotics_class', False),
-                                    group_name=item.get('group_name')
-                                )
-                            except ValueError:
-                                pass
+                        ga = load_engine("ga")(**get_ga_inputs(db))
+                        schedule = ga.run()
 
-                        set_system_setting(db, KEY_SCHEDULE_STATUS, ScheduleState.DRAFT)
+                        save_schedule_draft(db, schedule, keep_manual=False)
                         st.success("Horario generado (Borrador). Revísalo abajo.")
                         st.rerun()
                     except Exception as e:
                         st.error(f"Error al ejecutar el algoritmo genético: {str(e)}")
 
-            reservations = get_all_reservations(db)
-            if reservations:
+            entries = get_schedule_entries(db)
+            if entries:
                 st.subheader("Vista Previa del Horario")
-                schedule_grid(reservations)
+                schedule_grid(entries)
 
                 if current_status == ScheduleState.DRAFT:
                     col_app, col_rej = st.columns(2)
                     with col_app:
                         if st.button("Aprobar y Publicar"):
-                            set_system_setting(db, KEY_SCHEDULE_STATUS, ScheduleState.PUBLISHED)
+                            publish_schedule(db)
                             st.success("Horario Publicado.")
                             st.rerun()
                     with col_rej:
                         if st.button("Rechazar (Borrar)"):
-                            clear_schedule(db, keep_manual=False)
-                            set_system_setting(db, KEY_SCHEDULE_STATUS, ScheduleState.NONE)
-                            st.warning("Horario borrado.")
+                            if reject_schedule_draft(db) == ScheduleState.PUBLISHED:
+                                st.warning("Borrador descartado; se mantiene el horario publicado.")
+                            else:
+                                st.warning("Horario borrado.")
                             st.rerun()
             else:
                 st.info("No hay horario generado.")
@@ -194,8 +160,6 @@ def admin_dashboard():
     # --- TAB 3: Gestión de Usuarios ---
     with tab3:
         st.header("Usuarios Registrados")
-        users = get_all_users(db)
-
         teams = get_all_teams(db)
         teams_map = {t.id: t.name for t in teams}
 
@@ -207,38 +171,91 @@ def admin_dashboard():
             "TEAM_MEMBER": "Miembro de Equipo"
         }
 
-        user_data = []
-        for u in users:
-            role_val = u.role.value if hasattr(u.role, 'value') else str(u.role)
-            role_disp = role_translations.get(role_val, role_val)
-
-            user_data.append({
-                "ID": u.id,
-                "Usuario": u.username,
-                "Nombre Completo": u.full_name,
-                "Rol": role_disp,
-                "Equipo": teams_map.get(u.team_id, "Sin Asignar"),
-                "Grupo": u.group_name.value if u.group_name else "-"
-            })
-
-        st.dataframe(pd.DataFrame(user_data))
+        # Filtros: la consulta se pagina en la BD, no se cargan todos los usuarios
+        f_name, f_role, f_team, f_group = st.columns(4)
+        with f_name:
+            name_prefix = st.text_input("Buscar (nombre o usuario)", key="users_search")
+        with f_role:
+            role_filter = st.selectbox(
+                "Rol", ["Todos"] + [r.value for r in UserRole],
+                format_func=lambda x: role_translations.get(x, x), key="users_role"
+            )
+        with f_team:
+            team_filter = st.selectbox(
+                "Equipo", [None] + list(teams_map),
+                format_func=lambda x: "Todos" if x is None else teams_map[x], key="users_team"
+            )
+        with f_group:
+            group_filter = st.selectbox("Grupo", ["Todos", "B", "D"], key="users_group")
+
+        filters = {
+            "role": None if role_filter == "Todos" else UserRole(role_filter),
+            "team_id": team_filter,
+            "group_name": None if group_filter == "Todos" else GroupName(group_filter),
+            "name_prefix": name_prefix.strip() or None,
+        }
+        page = st.session_state.get("users_page", 1)
+        users, total = search_users(db, limit=USERS_PAGE_SIZE, offset=(page - 1) * USERS_PAGE_SIZE, **filters)
+        if not users and page > 1:
+            # Los filtros cambiaron y la página ya no existe: volver a la primera
+            page = st.session_state["users_page"] = 1
+            users, total = search_users(db, limit=USERS_PAGE_SIZE, **filters)
+
+        def role_label(role):
+            role_val = role.value if hasattr(role, 'value') else str(role)
+            return role_translations.get(role_val, role_val)
+
+        if users:
+            st.dataframe(pd.DataFrame([{
+                "ID": u["id"],
+                "Usuario": u["username"],
+                "Nombre Completo": u["full_name"],
+                "Rol": role_label(u["role"]),
+                "Equipo": u["team_name"] or "Sin Asignar",
+                "Grupo": u["group_name"].value if u["group_name"] else "-"
+            } for u in users]), hide_index=True)
+        pages = max(1, -(-total // USERS_PAGE_SIZE))
+        col_page, col_count = st.columns([1, 3])
+        with col_page:
+            st.number_input("Página", min_value=1, max_value=pages, step=1, key="users_page")
+        with col_count:
+            first = (page - 1) * USERS_PAGE_SIZE
+            st.caption(f"Mostrando {first + 1 if users else 0}–{first + len(users)} de {total} usuarios.")
+
+        with st.expander("Importar usuarios desde CSV"):
+            st.write("Columnas: `username, full_name, password, role, team, group`. "
+                     "Los equipos que no existan se crean en el grupo indicado.")
+            roster_file = st.file_uploader("Archivo CSV", type=["csv"], key="roster_csv")
+            if roster_file is not None and st.button("Importar"):
+                from core.roster import import_roster
+                with st.spinner("Importando usuarios..."):
+                    try:
+                        st.session_state["roster_result"] = import_roster(db, roster_file.getvalue())
+                    except Exception as e:
+                        st.error(f"Error al importar: {str(e)}")
+            roster_result = st.session_state.get("roster_result")
+            if roster_result:
+                st.success(f"{roster_result['users_created']} usuarios y {roster_result['teams_created']} "
+                           f"equipos creados en {roster_result['seconds']} s.")
+                if roster_result["errors"]:
+                    st.warning(f"{len(roster_result['errors'])} filas omitidas:")
+                    st.dataframe(pd.DataFrame(roster_result["errors"], columns=["Línea", "Error"]),
+                                 hide_index=True)
 
         st.divider()
         st.subheader("Editar Usuario")
 
         if not users:
-             st.info("No hay usuarios para editar.")
+             st.info("No hay usuarios que coincidan con la búsqueda.")
         else:
-            user_options = {}
-            for u in users:
-                label = f"{u.id}: {u.full_name} ({u.username})"
-                user_options[label] = u.id
-
-            selected_user_label = st.selectbox("Seleccionar Usuario", options=list(user_options.keys()))
+            # El selector solo ofrece los usuarios de la página/búsqueda actual
+            user_labels = {u["id"]: f"{u['id']}: {u['full_name']} ({u['username']})" for u in users}
+            selected_user_id = st.selectbox(
+                "Seleccionar Usuario", options=list(user_labels), format_func=user_labels.get
+            )
 
-            if selected_user_label:
-                selected_user_id = user_options[selected_user_label]
-                selected_user = next((u for u in users if u.id == selected_user_id), None)
+            if selected_user_id:
+                selected_user = get_user_by_id(db, selected_user_id)
 
                 if selected_user:
                     with st.form("edit_user_form"):
@@ -309,6 +326,11 @@ def admin_dashboard():
 
     # --- TAB 4: Backup / Restaurar ---
     with tab4:
+        # El módulo de backup (requests, transporte) solo se carga en esta pestaña
+        from core.backup import (
+            trigger_backup, restore_latest_backup, get_backup_stats, get_table_page, write_backup
+        )
+
         st.header("Backup y Restauración")
         st.write("Guarda los datos en GitHub para que persistan cuando la app se duerma en Streamlit Cloud.")
 
@@ -321,24 +343,117 @@ def admin_dashboard():
                     msg = trigger_backup(db)
                 st.info(msg)
 
+            worker = get_auto_backup_worker()
+            if worker is None:
+                st.caption(
+                    "Auto-backup desactivado: configura GITHUB_TOKEN y GITHUB_REPO (o BACKUP_TRANSPORT=local)."
+                    if Config.AUTO_BACKUP else "Auto-backup desactivado."
+                )
+            else:
+                health = worker.health()
+                last_ok = health["last_success_at"]
+                st.caption(
+                    f"Auto-backup: **{health['state']}** | "
+                    f"Último éxito: {last_ok.strftime('%Y-%m-%d %H:%M:%S') + ' UTC' if last_ok else 'nunca'}"
+                )
+                if health["last_error"]:
+                    st.warning(f"Último error del auto-backup ({health['consecutive_failures']} fallos seguidos): "
+                               f"{health['last_error']}")
+
         with col_rs:
             st.subheader("Restaurar Backup")
             if st.button("Restaurar desde GitHub"):
-                with st.spinner("Descargando backup..."):
-                    data = load_backup_from_github()
-                if data and data.get("users"):
-                    import_db_from_json(db, data)
+                restore_stats, restore_error = None, None
+                with st.spinner("Restaurando backup..."):
+                    try:
+                        restore_stats = restore_latest_backup(db)
+                    except ValueError as e:
+                        restore_error = str(e)
+                if restore_error:
+                    st.error(restore_error)
+                elif restore_stats:
+                    st.session_state["restore_stats"] = restore_stats
                     st.success("Base de datos restaurada exitosamente.")
                     st.rerun()
                 else:
                     st.warning("No se encontró backup en GitHub o está vacío.")
 
+            init_report = get_init_report()
+            if init_report:
+                with st.expander(f"Inicialización del proceso: {init_report['total_ms']} ms"):
+                    st.dataframe(pd.DataFrame(
+                        list(init_report["timings"].items()), columns=["Paso", "ms"]
+                    ))
+
+            login_metrics = get_login_metrics()
+            with st.expander(f"Inicios de sesión: {login_metrics['logins']} (p95 {login_metrics['p95_ms'] or 0} ms)"):
+                st.caption(
+                    f"bcrypt cost {login_metrics['bcrypt_rounds']}, {login_metrics['workers']} hilos | "
+                    f"Fallidos: {login_metrics['failures']} | Rehash: {login_metrics['rehashes']} | "
+                    f"p50: {login_metrics['p50_ms'] or 0} ms | máx: {login_metrics['max_ms'] or 0} ms | "
+                    f"espera en cola p95: {login_metrics['queue_wait_p95_ms'] or 0} ms"
+                )
+
+            restore_stats = st.session_state.get("restore_stats")
+            if restore_stats:
+                st.caption("Última restauración:")
+                st.dataframe(pd.DataFrame.from_dict(restore_stats, orient="index"))
+
         st.divider()
         st.subheader("Vista previa de datos actuales")
-        data_export = export_db_to_json(db)
-        st.write(f"**Usuarios:** {len(data_export.get('users', []))} | "
-                 f"**Equipos:** {len(data_export.get('teams', []))} | "
-                 f"**Disponibilidades:** {len(data_export.get('availabilities', []))} | "
-                 f"**Reservaciones:** {len(data_export.get('reservations', []))}")
-        with st.expander("Ver JSON completo"):
-            st.json(data_export)
+        stats = get_backup_stats(db)
+        st.write(f"**Usuarios:** {stats['users']} | "
+                 f"**Equipos:** {stats['teams']} | "
+                 f"**Disponibilidades:** {stats['availabilities']} | "
+                 f"**Reservaciones:** {stats['reservations']}")
+
+        # El JSON se consulta solo si se pide, y por páginas
+        if st.toggle("Ver datos en JSON", key="backup_preview"):
+            col_table, col_page = st.columns([3, 1])
+            with col_table:
+                preview_table = st.selectbox(
+                    "Tabla", list(stats), format_func=lambda k: f"{k} ({stats[k]} filas)", key="backup_preview_table"
+                )
+            with col_page:
+                preview_pages = max(1, -(-stats[preview_table] // BACKUP_PREVIEW_PAGE_SIZE))
+                if st.session_state.get("backup_preview_page", 1) > preview_pages:
+                    st.session_state["backup_preview_page"] = 1  # otra tabla con menos páginas
+                preview_page = st.number_input("Página", min_value=1, max_value=preview_pages, step=1,
+                                               key="backup_preview_page")
+            st.json(get_table_page(db, preview_table, limit=BACKUP_PREVIEW_PAGE_SIZE,
+                                   offset=(preview_page - 1) * BACKUP_PREVIEW_PAGE_SIZE))
+
+        if st.button("Preparar descarga del backup completo"):
+            with st.spinner("Generando backup..."):
+                buf = io.BytesIO()
+                write_backup(db, buf)
+            st.download_button("Descargar backup (.json.gz)", buf.getvalue(),
+                               file_name="robotics_lab_backup.json.gz", mime="application/gzip")
+
+    # --- TAB 5: Preparación para generar el horario ---
+    with tab5:
+        st.header("Preparación de Equipos")
+        st.write("Estado de cada equipo antes de ejecutar el algoritmo genético.")
+
+        report = get_readiness_report(db, first_period)
+
+        group_cols = st.columns(len(report["groups"]))
+        for col, group in zip(group_cols, report["groups"]):
+            with col:
+                st.subheader(f"Grupo {group['group_name'].value}")
+                st.metric("Equipos bloqueados", f"{group['locked']} / {group['teams']}")
+                st.metric("Miembros con disponibilidad", f"{group['submitted']} / {group['members']}")
+                st.metric("Períodos sin clase teórica", group["unblocked"])
+
+        if report["teams"]:
+            st.dataframe(pd.DataFrame([{
+                "Equipo": t["name"],
+                "Grupo": t["group_name"].value if t["group_name"] else "-",
+                "Bloqueado": "Sí" if t["is_locked"] else "No",
+                "Miembros": t["members"],
+                "Con disponibilidad": t["submitted"],
+                "Cobertura (%)": round(100 * t["submitted"] / t["members"]) if t["members"] else 0,
+                "Períodos posibles": t["open_slots"],
+            } for t in report["teams"]]), use_container_width=True, hide_index=True)
+        else:
+            st.info("No hay equipos registrados.")
@@ -1,18 +1,18 @@
 import streamlit as st
 from core.database import get_db
-from core.crud import get_all_reservations, get_system_setting
-from core.models import KEY_SCHEDULE_STATUS, ScheduleState
-from ui.components import schedule_grid
+from core.crud import get_published_schedule
+from core.ics import LAB_FEED_KEY
+from ui.components import schedule_grid, calendar_feed_downloads
 
 def calendar_view():
     st.subheader("Calendario Semanal del Laboratorio")
 
     db = next(get_db())
-    status = get_system_setting(db, KEY_SCHEDULE_STATUS, ScheduleState.NONE)
+    version_id, entries = get_published_schedule(db)
 
-    if status != ScheduleState.PUBLISHED:
+    if version_id is None:
         st.info("El horario aún no ha sido publicado.")
         return
 
-    reservations = get_all_reservations(db)
-    schedule_grid(reservations)
+    schedule_grid(entries, version_id)
+    calendar_feed_downloads(db, [("Descargar calendario (.ics)", LAB_FEED_KEY)])
@@ -1,65 +1,142 @@
 import streamlit as st
+import numpy as np
 import pandas as pd
+from core.crud import schedule_cache_generation, get_schedule_feed
 from core.periods import PERIODS, PERIOD_INDICES, DAYS, period_label
 
+# Grid row labels and period <-> row lookups, computed once
+ROW_LABELS = [period_label(p) for p in PERIOD_INDICES]
+_ROW_PERIOD = np.array(PERIOD_INDICES)
+_PERIOD_ROW = np.full(max(PERIOD_INDICES) + 1, -1)
+_PERIOD_ROW[PERIOD_INDICES] = np.arange(len(PERIOD_INDICES))
 
-def availability_grid(existing_slots, key_prefix="avail", title="Seleccione su disponibilidad"):
+
+def _slot_cells(days, periods):
+    """Maps day/period arrays to grid (rows, days), dropping out-of-range slots."""
+    in_range = (days >= 0) & (days < len(DAYS)) & (periods >= 0) & (periods < len(_PERIOD_ROW))
+    rows = np.where(in_range, _PERIOD_ROW[np.where(in_range, periods, 0)], -1)
+    valid = rows >= 0
+    return rows[valid], days[valid], valid
+
+
+def slots_to_frame(slots):
+    """(day_index, period) slots -> boolean period x day frame."""
+    grid = np.zeros((len(PERIOD_INDICES), len(DAYS)), dtype=bool)
+    pairs = np.asarray(list(slots), dtype=int).reshape(-1, 2)
+    rows, days, _ = _slot_cells(pairs[:, 0], pairs[:, 1])
+    grid[rows, days] = True
+    return pd.DataFrame(grid, index=ROW_LABELS, columns=DAYS)
+
+
+def frame_to_slots(df):
+    """Boolean period x day frame -> (day_index, period) slots, ordered by day then period."""
+    days, rows = np.nonzero(df.to_numpy(dtype=bool).T)
+    return list(zip(days.tolist(), _ROW_PERIOD[rows].tolist()))
+
+
+def availability_editor(existing_slots, key_prefix="avail", title="Seleccione su disponibilidad"):
     """
     Renders a data editor for availability.
     existing_slots: List of (day_index, period).
-    Returns: List of (day_index, period) selected.
+    Returns: (selected slots, changed), where `changed` is False while the grid
+    still matches `existing_slots`, so callers only save real edits.
     """
-    row_labels = [period_label(p) for p in PERIOD_INDICES]
-    data = {day: [False] * len(PERIOD_INDICES) for day in DAYS}
-    df = pd.DataFrame(data, index=row_labels)
-
-    # Pre-fill
-    for day_idx, period in existing_slots:
-        if 0 <= day_idx < len(DAYS) and period in PERIOD_INDICES:
-            day_name = DAYS[day_idx]
-            row = period_label(period)
-            df.at[row, day_name] = True
+    df = slots_to_frame(existing_slots)
 
     st.subheader(title)
     edited_df = st.data_editor(df, key=f"{key_prefix}_editor", use_container_width=True)
 
-    # Extract selected slots
-    selected_slots = []
-    for day_idx, day_name in enumerate(DAYS):
-        for period in PERIOD_INDICES:
-            row = period_label(period)
-            if edited_df.at[row, day_name]:
-                selected_slots.append((day_idx, period))
+    changed = not np.array_equal(edited_df.to_numpy(dtype=bool), df.to_numpy())
+    return frame_to_slots(edited_df), changed
+
+
+def build_heatmap_frames(summary):
+    """
+    Period x day frames for crud.get_team_availability_summary: cell labels
+    ("available/members", with " (L)" when the leader is available) and CSS backgrounds.
+    """
+    counts = np.zeros((len(PERIOD_INDICES), len(DAYS)), dtype=int)
+    leader = np.zeros_like(counts, dtype=bool)
+    if summary["slots"]:
+        keys = list(summary["slots"])
+        pairs = np.asarray(keys, dtype=int).reshape(-1, 2)
+        available = np.fromiter((summary["slots"][k]["available"] for k in keys), dtype=int, count=len(keys))
+        has_leader = np.fromiter((summary["slots"][k]["leader"] for k in keys), dtype=bool, count=len(keys))
+        rows, days, valid = _slot_cells(pairs[:, 0], pairs[:, 1])
+        counts[rows, days] = available[valid]
+        leader[rows, days] = has_leader[valid]
+
+    total = max(summary["member_count"], 1)
+    labels = np.where(counts > 0, np.char.add(counts.astype(str), f"/{summary['member_count']}"), "")
+    labels = np.where(leader, np.char.add(labels, " (L)"), labels)
+    alpha = 0.15 + 0.75 * counts / total
+    css = np.where(
+        counts > 0,
+        np.char.add(np.char.add("background-color: rgba(46, 160, 67, ", np.round(alpha, 2).astype(str)), ")"),
+        ""
+    )
+    return (pd.DataFrame(labels.astype(object), index=ROW_LABELS, columns=DAYS),
+            pd.DataFrame(css.astype(object), index=ROW_LABELS, columns=DAYS))
 
-    return selected_slots
 
+def team_heatmap(summary):
+    """Renders a team's availability heatmap (no matplotlib: colors come from build_heatmap_frames)."""
+    labels, css = build_heatmap_frames(summary)
+    st.dataframe(labels.style.apply(lambda _: css, axis=None), use_container_width=True)
+    st.caption("Cada celda muestra miembros disponibles / total del equipo; (L) = el líder está disponible.")
 
-def blocked_hours_grid(existing_slots, key_prefix="blocked"):
-    st.subheader("Bloquear Períodos de Clase Teórica")
-    return availability_grid(existing_slots, key_prefix, title="Seleccione los períodos con clase teórica")
 
+def _schedule_cell(entry):
+    if entry['is_robotics_class']:
+        return f"Clase Robótica - Grupo {entry['group_name'] or '?'}"
+    return entry['team_name'] or "Reservado"
 
-def schedule_grid(reservations):
+
+def build_schedule_frame(entries):
     """
-    Renders a read-only schedule.
-    reservations: List of Reservation objects.
+    Builds the period x day frame for a schedule in one vectorized assignment.
+    entries: List of schedule entry dicts (see crud.get_schedule_entries / get_published_schedule).
     """
-    row_labels = [period_label(p) for p in PERIOD_INDICES]
-    data = {day: [""] * len(PERIOD_INDICES) for day in DAYS}
-    df = pd.DataFrame(data, index=row_labels)
-
-    for res in reservations:
-        day_idx = res.day_of_week
-        period = res.period
-        if 0 <= day_idx < len(DAYS) and period in PERIOD_INDICES:
-            day_name = DAYS[day_idx]
-            row = period_label(period)
-
-            if getattr(res, 'is_robotics_class', False) and res.is_robotics_class:
-                group = res.group_name.value if res.group_name else "?"
-                df.at[row, day_name] = f"Clase Robótica - Grupo {group}"
-            else:
-                team_name = res.team.name if res.team else "Reservado"
-                df.at[row, day_name] = team_name
+    grid = np.full((len(PERIOD_INDICES), len(DAYS)), "", dtype=object)
+    if entries:
+        days = np.fromiter((e['day_of_week'] for e in entries), dtype=int, count=len(entries))
+        periods = np.fromiter((e['period'] for e in entries), dtype=int, count=len(entries))
+        cells = np.array([_schedule_cell(e) for e in entries], dtype=object)
+        rows, days, valid = _slot_cells(days, periods)
+        grid[rows, days] = cells[valid]
+    return pd.DataFrame(grid, index=ROW_LABELS, columns=DAYS)
+
 
+@st.cache_data(max_entries=16, show_spinner=False)
+def _cached_schedule_frame(generation, version_id, _entries):
+    # Published versions are immutable; the generation changes if a restore replaces them
+    return build_schedule_frame(_entries)
+
+
+def schedule_grid(entries, version_id=None):
+    """
+    Renders a read-only schedule.
+    entries: List of schedule entry dicts (see crud.get_schedule_entries / get_published_schedule).
+    version_id: id of the published version the entries come from; when given the
+    frame is cached per version. Drafts (no version) are built on every call.
+    """
+    if version_id is None:
+        df = build_schedule_frame(entries)
+    else:
+        df = _cached_schedule_frame(schedule_cache_generation(), version_id, entries)
     st.dataframe(df, use_container_width=True)
+
+
+def calendar_feed_downloads(db, feeds):
+    """
+    Download buttons for iCalendar feeds of the published schedule.
+    feeds: List of (label, feed key) pairs (see core.ics). Nothing is shown before a publish.
+    """
+    for label, key in feeds:
+        version_id, content = get_schedule_feed(db, key)
+        if version_id is None:
+            continue
+        st.download_button(
+            label, content.encode("utf-8"), file_name=f"robolab-{key}.ics",
+            mime="text/calendar", key=f"ics_{key}"
+        )
@@ -1,7 +1,7 @@
 import streamlit as st
 from core.database import get_db
-from core.crud import get_group_blocks, set_group_blocks
-from ui.components import availability_grid
+from core.crud import get_group_block_slots, set_group_blocks
+from ui.components import availability_editor
 
 def group_chief_dashboard():
     user = st.session_state["user"]
@@ -16,13 +16,12 @@ def group_chief_dashboard():
     st.write("Selecciona los períodos en los que este grupo tiene clases teóricas. NINGÚN equipo de este grupo podrá reservar el laboratorio en estos períodos.")
 
     db = next(get_db())
-    current_blocks = get_group_blocks(db, group_name)
-    current_slots = [(b.day_of_week, b.period) for b in current_blocks]
+    current_slots = get_group_block_slots(db, group_name)
 
-    new_slots = availability_grid(current_slots, key_prefix=f"group_{group_name}",
-                                  title="Períodos de Clase Teórica")
+    new_slots, changed = availability_editor(current_slots, key_prefix=f"group_{group_name}",
+                                             title="Períodos de Clase Teórica")
 
-    if st.button("Guardar Bloques"):
+    if st.button("Guardar Bloques", disabled=not changed):
         set_group_blocks(db, group_name, new_slots)
         st.success("Bloques guardados correctamente.")
         st.rerun()
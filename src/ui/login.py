@@ -1,5 +1,5 @@
 import streamlit as st
-from core.crud import get_user_by_username, verify_password
+from core.auth import authenticate
 from core.database import get_db
 
 def login_page():
@@ -11,9 +11,9 @@ def login_page():
 
     if st.button("Ingresar"):
         db = next(get_db())
-        user = get_user_by_username(db, username)
+        user = authenticate(db, username, password)
 
-        if user and verify_password(password, user.password_hash):
+        if user:
             st.session_state['user'] = {
                 "id": user.id,
                 "username": user.username,
@@ -1,11 +1,12 @@
 import streamlit as st
 from core.database import get_db
 from core.crud import (
-    get_robotics_class_schedule_by_teacher, set_robotics_class_schedule,
-    get_all_reservations, get_system_setting
+    get_robotics_class_slots_by_teacher, set_robotics_class_schedule,
+    get_published_schedule
 )
-from core.models import GroupName, KEY_SCHEDULE_STATUS, ScheduleState
-from ui.components import availability_grid, schedule_grid
+from core.models import GroupName
+from core.ics import LAB_FEED_KEY, group_feed_key
+from ui.components import availability_editor, schedule_grid, calendar_feed_downloads
 
 def teacher_dashboard():
     user = st.session_state["user"]
@@ -26,16 +27,15 @@ def teacher_dashboard():
         "Estos períodos quedarán reservados obligatoriamente para tu grupo en el laboratorio."
     )
 
-    existing = get_robotics_class_schedule_by_teacher(db, teacher_id)
-    current_slots = [(r.day_of_week, r.period) for r in existing]
+    current_slots = get_robotics_class_slots_by_teacher(db, teacher_id)
 
-    new_slots = availability_grid(
+    new_slots, changed = availability_editor(
         current_slots,
         key_prefix=f"rcs_teacher_{teacher_id}",
         title="Selecciona tus períodos de clase robótica"
     )
 
-    if st.button("Guardar Horario"):
+    if st.button("Guardar Horario", disabled=not changed):
         set_robotics_class_schedule(db, teacher_id, GroupName(teacher_group), new_slots)
         st.success("Horario guardado correctamente.")
         st.rerun()
@@ -44,9 +44,12 @@ def teacher_dashboard():
 
     # Show published schedule (view-only)
     st.subheader("Calendario Semanal del Laboratorio")
-    status = get_system_setting(db, KEY_SCHEDULE_STATUS, ScheduleState.NONE)
-    if status != ScheduleState.PUBLISHED:
+    version_id, entries = get_published_schedule(db)
+    if version_id is None:
         st.info("El horario aún no ha sido publicado.")
     else:
-        reservations = get_all_reservations(db)
-        schedule_grid(reservations)
+        schedule_grid(entries, version_id)
+        calendar_feed_downloads(db, [
+            (f"Descargar clases del Grupo {teacher_group} (.ics)", group_feed_key(teacher_group)),
+            ("Descargar calendario del laboratorio (.ics)", LAB_FEED_KEY),
+        ])
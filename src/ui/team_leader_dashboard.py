@@ -2,15 +2,17 @@ import streamlit as st
 import pandas as pd
 from core.database import get_db
 from core.crud import (
-    get_user_availability, set_user_availability, get_team_by_id,
-    get_users_by_team, lock_team_availability, unlock_team_availability,
-    get_system_setting, get_all_reservations, create_reservation,
-    delete_reservation, get_group_blocks
+    get_user_slots, set_user_availability, get_team_by_id,
+    lock_team_availability, unlock_team_availability,
+    get_system_setting, get_all_reservations, reserve_slot_for_team,
+    delete_reservation, get_group_block_slots, refresh_published_schedule,
+    get_team_availability_summary, schedule_cache_generation
 )
-from ui.components import availability_grid, schedule_grid
-from core.models import UserRole, KEY_MANUAL_MODE, KEY_FIRST_PERIOD
+from core.changelog import data_version
+from core.ics import team_feed_key
+from ui.components import availability_editor, schedule_grid, team_heatmap, calendar_feed_downloads
+from core.models import UserRole, ReservationOutcome, KEY_MANUAL_MODE, KEY_FIRST_PERIOD
 from core.periods import PERIOD_INDICES, DAYS, period_label
-from sqlalchemy.exc import IntegrityError
 
 MAX_HOURS_PER_TEAM = 3
 
@@ -26,6 +28,7 @@ def team_leader_dashboard():
         return
 
     st.subheader(f"Equipo: {team.name} (Grupo {team.group_name})")
+    calendar_feed_downloads(db, [("Descargar horario del equipo (.ics)", team_feed_key(team.id))])
 
     manual_mode = get_system_setting(db, KEY_MANUAL_MODE, "false").lower() == "true"
 
@@ -43,12 +46,11 @@ def availability_management_ui(db, team, user):
             st.rerun()
     else:
         st.subheader("Tu Disponibilidad")
-        current_avail = get_user_availability(db, user['id'])
-        current_slots = [(a.day_of_week, a.period) for a in current_avail]
+        current_slots = get_user_slots(db, user['id'])
 
-        new_slots = availability_grid(current_slots, key_prefix=f"leader_{user['id']}")
+        new_slots, changed = availability_editor(current_slots, key_prefix=f"leader_{user['id']}")
 
-        if st.button("Guardar Mi Disponibilidad"):
+        if st.button("Guardar Mi Disponibilidad", disabled=not changed):
             set_user_availability(db, user['id'], new_slots)
             st.success("Disponibilidad guardada correctamente.")
             st.rerun()
@@ -56,23 +58,35 @@ def availability_management_ui(db, team, user):
         st.divider()
 
         st.subheader("Disponibilidad de Miembros")
-        members = get_users_by_team(db, team.id)
+        summary = _team_summary(db, team.id)
+        team_heatmap(summary)
 
-        for member in members:
-            if member.id == user['id']:
+        for member in summary["members"]:
+            if member["id"] == user['id']:
                 continue
-            st.write(f"**{member.full_name}** ({member.role})")
-            avail = get_user_availability(db, member.id)
-            if not avail:
+            st.write(f"**{member['full_name']}** ({member['role']})")
+            if not member["slots"]:
                 st.warning("No ha ingresado disponibilidad.")
             else:
-                st.write(f"{len(avail)} períodos disponibles.")
+                st.write(f"{member['slots']} períodos disponibles.")
 
         if st.button("Bloquear Disponibilidad del Equipo"):
             lock_team_availability(db, team.id)
             st.success("Disponibilidad del equipo bloqueada. Listo para asignación.")
             st.rerun()
 
+@st.cache_data(max_entries=64, show_spinner=False)
+def _cached_team_summary(generation, team_id, version, _db):
+    return get_team_availability_summary(_db, team_id)
+
+
+def _team_summary(db, team_id):
+    """Team availability summary, cached per team until any tracked write changes the data version."""
+    version = data_version(db)
+    if version is None:
+        return get_team_availability_summary(db, team_id)
+    return _cached_team_summary(schedule_cache_generation(), team_id, version, db)
+
 def manual_reservation_ui(db, team):
     st.subheader("Reservar Bloques (Manual)")
 
@@ -89,6 +103,7 @@ def manual_reservation_ui(db, team):
             st.write(f"- {day_name} - {label}")
             if st.button(f"Cancelar {day_name} {label}", key=f"cancel_{r.id}"):
                 delete_reservation(db, r.day_of_week, r.period)
+                refresh_published_schedule(db)
                 st.success("Reserva cancelada.")
                 st.rerun()
 
@@ -101,8 +116,7 @@ def manual_reservation_ui(db, team):
     first_period = int(get_system_setting(db, KEY_FIRST_PERIOD, "1"))
 
     # Blocked by Group Chiefs
-    group_blocks = get_group_blocks(db, team.group_name)
-    blocked_slots = set((b.day_of_week, b.period) for b in group_blocks)
+    blocked_slots = set(get_group_block_slots(db, team.group_name))
 
     # Reserved slots (by anyone)
     reserved_slots = set((r.day_of_week, r.period) for r in reservations)
@@ -133,12 +147,12 @@ def manual_reservation_ui(db, team):
                         st.button(f"{label} (Ocupado)", key=key, disabled=True)
                 else:
                     if st.button(f"{label} (Libre)", key=key):
-                        try:
-                            create_reservation(db, team.id, day_idx, period, is_manual=True)
+                        outcome = reserve_slot_for_team(db, team.id, day_idx, period, MAX_HOURS_PER_TEAM)
+                        if outcome == ReservationOutcome.CREATED:
+                            refresh_published_schedule(db)
                             st.success(f"Reservado: {DAYS[day_idx]} {label}")
                             st.rerun()
-                        except ValueError:
-                            st.error("Ya está reservado.")
-                        except IntegrityError:
-                            db.rollback()
+                        elif outcome == ReservationOutcome.SLOT_TAKEN:
                             st.error("Error de concurrencia: Alguien más reservó este bloque justo antes que tú.")
+                        else:
+                            st.error(f"Has alcanzado el límite de {MAX_HOURS_PER_TEAM} períodos por semana.")
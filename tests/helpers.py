@@ -0,0 +1,29 @@
+"""Shared fixtures for the unittest suites (each test module puts src/ on sys.path before importing this)."""
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from core.database import Base
+from core.changelog import install_change_tracking
+
+
+def memory_engine():
+    """Empty in-memory SQLite engine whose single connection is shared across threads."""
+    return create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+
+
+def session_factory(engine):
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def make_session_factory(track_changes=False):
+    """Session factory over a fresh in-memory database with all tables (and the change-log triggers if asked)."""
+    engine = memory_engine()
+    Base.metadata.create_all(bind=engine)
+    if track_changes:
+        install_change_tracking(engine)
+    return session_factory(engine)
+
+
+def make_session(track_changes=False):
+    return make_session_factory(track_changes)()
@@ -0,0 +1,78 @@
+import unittest
+import sys
+import os
+import threading
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from core.config import Config
+from core.models import UserRole
+from core import auth, crud
+from helpers import make_session
+
+
+class TestAuthenticate(unittest.TestCase):
+    def setUp(self):
+        self._rounds = Config.BCRYPT_ROUNDS
+        Config.BCRYPT_ROUNDS = 4
+        auth.reset_login_metrics()
+        self.db = make_session()
+        crud.create_user(self.db, "ana", "secreto", "Ana", UserRole.TEAM_MEMBER)
+
+    def tearDown(self):
+        Config.BCRYPT_ROUNDS = self._rounds
+        self.db.close()
+
+    def test_correct_and_wrong_passwords(self):
+        self.assertEqual(auth.authenticate(self.db, "ana", "secreto").username, "ana")
+        self.assertIsNone(auth.authenticate(self.db, "ana", "otro"))
+        self.assertIsNone(auth.authenticate(self.db, "nadie", "secreto"))
+        self.assertIsNone(auth.authenticate(self.db, "", ""))
+
+        metrics = auth.get_login_metrics()
+        self.assertEqual(metrics["logins"], 4)
+        self.assertEqual(metrics["failures"], 3)
+        self.assertEqual(metrics["in_flight"], 0)
+        self.assertIsNotNone(metrics["p95_ms"])
+
+    def test_configured_cost_is_used(self):
+        self.assertEqual(auth.hash_cost(crud.get_user_by_username(self.db, "ana").password_hash), 4)
+        self.assertEqual(auth.hash_cost(crud.get_password_hash("x", rounds=5)), 5)
+
+    def test_rehash_when_cost_changes(self):
+        Config.BCRYPT_ROUNDS = 5
+        user = auth.authenticate(self.db, "ana", "secreto")
+        self.assertEqual(auth.hash_cost(user.password_hash), 5)
+        self.assertEqual(auth.get_login_metrics()["rehashes"], 1)
+
+        # Same cost: no further rehash, and the new hash still verifies
+        self.assertIsNotNone(auth.authenticate(self.db, "ana", "secreto"))
+        self.assertEqual(auth.get_login_metrics()["rehashes"], 1)
+
+        # A failed login never rehashes
+        Config.BCRYPT_ROUNDS = 4
+        self.assertIsNone(auth.authenticate(self.db, "ana", "otro"))
+        self.assertEqual(auth.hash_cost(crud.get_user_by_username(self.db, "ana").password_hash), 5)
+
+    def test_unknown_users_are_checked_at_the_configured_cost(self):
+        self.assertEqual(auth.hash_cost(auth._get_dummy_hash()), 4)
+        Config.BCRYPT_ROUNDS = 6
+        self.assertEqual(auth.hash_cost(auth._get_dummy_hash()), 6)
+
+    def test_concurrent_logins(self):
+        stored = crud.get_user_by_username(self.db, "ana").password_hash
+        results = []
+
+        def check():
+            results.append(auth._run_in_pool(crud.verify_password, "secreto", stored)[0])
+
+        threads = [threading.Thread(target=check) for _ in range(Config.AUTH_WORKERS * 2)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(results, [True] * len(threads))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,454 @@
+import unittest
+from unittest import mock
+import gzip
+import io
+import json
+import tempfile
+import time
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from sqlalchemy import create_engine
+
+from core.config import Config
+from core.database import Base
+from core.models import (
+    GroupName, UserRole, User, Team, ChangeLog, SystemSetting, KEY_FIRST_PERIOD, KEY_SETTINGS_VERSION
+)
+from core.changelog import install_change_tracking, data_version
+from core.backup_worker import BackupWorker
+from core import crud, backup, backup_worker
+from helpers import make_session, session_factory
+
+
+def without_settings_version(data):
+    """Export minus the settings version row, which a restore moves forward on purpose."""
+    settings = [r for r in data["system_settings"] if r["key"] != KEY_SETTINGS_VERSION]
+    return {**data, "system_settings": settings}
+
+
+def populate(db, students=5):
+    crud.init_system_settings(db)
+    team = crud.create_team(db, "Alpha", GroupName.B)
+    for i in range(students):
+        user = crud.create_user(db, f"student{i}", "pw", f"Student {i}", UserRole.TEAM_MEMBER, team_id=team.id)
+        crud.set_user_availability(db, user.id, [(i % 5, 1 + i % 13), (4, 13)])
+    crud.set_group_blocks(db, GroupName.B, [(0, 1)])
+    crud.save_schedule_draft(db, [{"team_id": team.id, "day_of_week": 1, "period": 2}])
+    crud.publish_schedule(db)
+
+
+class TestBackupExport(unittest.TestCase):
+    def setUp(self):
+        crud.invalidate_settings_cache()
+        self.db = make_session(track_changes=True)
+        populate(self.db)
+
+    def tearDown(self):
+        self.db.close()
+        crud.invalidate_settings_cache()
+
+    def test_stream_matches_dict_export(self):
+        sink = io.StringIO()
+        counts = backup.stream_db_to_json(self.db, sink, chunk_size=3)
+        streamed = json.loads(sink.getvalue())
+
+        self.assertEqual(streamed, backup.export_db_to_json(self.db))
+        self.assertEqual(counts["availabilities"], 10)
+        self.assertEqual(counts["users"], 5)
+
+
+class TestBackupStats(unittest.TestCase):
+    def setUp(self):
+        crud.invalidate_settings_cache()
+        self.db = make_session(track_changes=True)
+        populate(self.db)
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_counts_and_pages_match_export(self):
+        data = backup.export_db_to_json(self.db)
+        self.assertEqual(backup.get_backup_stats(self.db), {k: len(v) for k, v in data.items()})
+        self.assertEqual(backup.get_table_page(self.db, "users", limit=2, offset=3), data["users"][3:5])
+
+
+class TestCompactFormat(unittest.TestCase):
+    def setUp(self):
+        crud.invalidate_settings_cache()
+        self.db = make_session(track_changes=True)
+        populate(self.db)
+
+    def tearDown(self):
+        self.db.close()
+        crud.invalidate_settings_cache()
+
+    def _write(self):
+        sink = io.BytesIO()
+        header = backup.write_backup(self.db, sink)
+        return header, sink.getvalue()
+
+    def test_round_trip_and_header(self):
+        header, raw = self._write()
+        self.assertEqual(header["schema_version"], backup.BACKUP_SCHEMA_VERSION)
+        self.assertEqual(header["counts"]["users"], 5)
+        self.assertEqual(backup.read_backup_header(raw)["sha256"], header["sha256"])
+        self.assertEqual(backup.read_backup(raw), backup.export_db_to_json(self.db))
+
+        legacy = json.dumps(backup.export_db_to_json(self.db), indent=2).encode()
+        self.assertLess(len(raw), len(legacy) / 3)
+
+    def test_hash_is_stable_and_detects_corruption(self):
+        first, raw = self._write()
+        second, _ = self._write()
+        self.assertEqual(first["sha256"], second["sha256"])
+
+        header_line, _, body = gzip.decompress(raw).partition(b"\n")
+        tampered = gzip.compress(header_line + b"\n" + body.replace(b"Alpha", b"Omega"))
+        with self.assertRaises(ValueError):
+            backup.read_backup(tampered)
+
+    def test_reads_legacy_plain_json(self):
+        data = backup.export_db_to_json(self.db)
+        self.assertEqual(backup.read_backup(json.dumps(data, indent=2).encode()), data)
+
+
+class TestBackupRestore(unittest.TestCase):
+    def setUp(self):
+        crud.invalidate_settings_cache()
+        self.source = make_session(track_changes=True)
+        populate(self.source)
+
+    def tearDown(self):
+        self.source.close()
+        crud.invalidate_settings_cache()
+
+    def test_bulk_restore_round_trip(self):
+        data = backup.export_db_to_json(self.source)
+        target = make_session(track_changes=True)
+        crud.create_team(target, "Stale", GroupName.D)
+
+        stats = backup.import_db_from_json(target, data)
+
+        self.assertEqual(without_settings_version(backup.export_db_to_json(target)), without_settings_version(data))
+        self.assertEqual(stats["availabilities"]["rows"], 10)
+        self.assertIn("rows_per_sec", stats["users"])
+        self.assertEqual(crud.get_published_schedule(target)[1][0]["team_name"], "Alpha")
+        # Durability pragmas are restored afterwards
+        self.assertEqual(target.connection().exec_driver_sql("PRAGMA synchronous").scalar(), 2)
+
+    def test_restore_moves_settings_version_forward(self):
+        data = backup.export_db_to_json(self.source)
+        restored_version = int(crud.get_system_setting(self.source, KEY_SETTINGS_VERSION))
+        for value in ("3", "1", "3"):
+            crud.set_system_setting(self.source, KEY_FIRST_PERIOD, value)
+        current = int(crud.get_system_setting(self.source, KEY_SETTINGS_VERSION))
+        self.assertGreater(current, restored_version)
+
+        backup.import_db_from_json(self.source, data)
+        version = self.source.query(SystemSetting.value).filter_by(key=KEY_SETTINGS_VERSION).scalar()
+        self.assertEqual(int(version), current + 1)
+
+    def test_legacy_backup_without_new_tables(self):
+        data = backup.export_db_to_json(self.source)
+        legacy = {k: data[k] for k in ("teams", "users", "availabilities", "reservations", "system_settings")}
+        for r in legacy["reservations"]:
+            del r["is_manual"]
+
+        target = make_session(track_changes=True)
+        stats = backup.import_db_from_json(target, legacy)
+        self.assertEqual(stats["schedule_versions"]["rows"], 0)
+        self.assertEqual(len(crud.get_all_reservations(target)), 1)
+
+
+class TestIncrementalBackup(unittest.TestCase):
+    def setUp(self):
+        crud.invalidate_settings_cache()
+        self.db = make_session(track_changes=True)
+        populate(self.db)
+        # Local directory stand-in for the GitHub repository
+        self.tmp = tempfile.TemporaryDirectory()
+        self._config = (Config.BACKUP_TRANSPORT, Config.BACKUP_LOCAL_DIR)
+        Config.BACKUP_TRANSPORT, Config.BACKUP_LOCAL_DIR = "local", self.tmp.name
+
+    def tearDown(self):
+        Config.BACKUP_TRANSPORT, Config.BACKUP_LOCAL_DIR = self._config
+        self.tmp.cleanup()
+        self.db.close()
+        crud.invalidate_settings_cache()
+
+    def _remote(self):
+        return set(os.listdir(self.tmp.name))
+
+    def _restored(self):
+        """Export of a fresh database restored from the remote (snapshot plus deltas)."""
+        restored = make_session(track_changes=True)
+        try:
+            backup.restore_latest_backup(restored)
+            return without_settings_version(backup.export_db_to_json(restored))
+        finally:
+            restored.close()
+
+    def _mutate(self):
+        user = self.db.query(User).first()
+        crud.set_user_availability(self.db, user.id, [(3, 3)])
+        self.db.query(User).filter(User.username == "student4").delete()
+        self.db.query(Team).update({"name": "Alpha Prime"})
+        self.db.commit()
+        crud.set_system_setting(self.db, "manual_mode", "true")
+
+    def test_auto_restore_reports_errors_instead_of_raising(self):
+        with open(os.path.join(self.tmp.name, "backup.json"), "wb") as f:
+            f.write(b"not a backup")
+        empty = make_session(track_changes=True)
+        try:
+            msg = backup.auto_restore_if_empty(empty)
+        finally:
+            empty.close()
+        self.assertTrue(msg.startswith("Error"))
+
+    def test_auto_restore_reports_unreachable_github(self):
+        Config.BACKUP_TRANSPORT = "github"
+        saved = (os.environ.get("GITHUB_TOKEN"), os.environ.get("GITHUB_REPO"), Config.GITHUB_API_URL)
+        os.environ["GITHUB_TOKEN"], os.environ["GITHUB_REPO"] = "bad-token", "owner/repo"
+        Config.GITHUB_API_URL = "http://127.0.0.1:9"  # nothing listens here
+        empty = make_session(track_changes=True)
+        try:
+            msg = backup.auto_restore_if_empty(empty)
+        finally:
+            empty.close()
+            for name, value in zip(("GITHUB_TOKEN", "GITHUB_REPO"), saved):
+                if value is None:
+                    os.environ.pop(name, None)
+                else:
+                    os.environ[name] = value
+            Config.GITHUB_API_URL = saved[2]
+        self.assertTrue(msg.startswith("Error"))
+
+    def test_without_change_tracking_full_backups_are_uploaded(self):
+        # Non-SQLite databases have no triggers: every backup is a hash-skipped full snapshot
+        with mock.patch.object(backup, "change_tracking_available", return_value=False):
+            backup.trigger_backup(self.db)
+            self._mutate()
+            msg = backup.trigger_backup(self.db)
+            self.assertFalse(msg.startswith("Error") or msg.startswith("Sin cambios"), msg)
+            self.assertFalse([n for n in self._remote() if ".delta-" in n])
+            manifest = backup._load_manifest()
+            self.assertEqual(manifest["deltas"], [])
+            self.assertEqual(backup.trigger_backup(self.db), "Sin cambios desde el último backup; no se subió nada.")
+
+        restored = make_session(track_changes=True)
+        try:
+            backup.restore_latest_backup(restored)
+            self.assertEqual(restored.query(Team).one().name, "Alpha Prime")
+        finally:
+            restored.close()
+
+    def test_full_then_deltas_restore_current_state(self):
+        backup.trigger_backup(self.db)
+        self.assertEqual(self.db.query(ChangeLog).count(), 0)
+        self.assertIn("backup.json.manifest.json", self._remote())
+
+        self._mutate()
+        msg = backup.trigger_backup(self.db)
+        self.assertIn("incremental", msg)
+        self.assertIn("backup.json.delta-0001", self._remote())
+        self.assertEqual(backup.trigger_backup(self.db), "Sin cambios desde el último backup; no se subió nada.")
+
+        crud.create_team(self.db, "Gamma", GroupName.D)
+        backup.trigger_backup(self.db)
+
+        self.assertEqual(self._restored(), without_settings_version(backup.export_db_to_json(self.db)))
+
+    def test_data_version_survives_pruning(self):
+        version = data_version(self.db)
+        backup.prune_change_log(self.db, backup.last_change_seq(self.db))
+        self.assertEqual(data_version(self.db), version)
+        crud.create_team(self.db, "Gamma", GroupName.D)
+        self.assertGreater(data_version(self.db), version)
+
+    def test_delta_only_carries_changed_rows(self):
+        backup.prune_change_log(self.db, backup.last_change_seq(self.db))
+        self._mutate()
+        _, delta = backup.build_delta(self.db)
+        self.assertEqual(len(delta["upserts"]["teams"]), 1)
+        self.assertEqual(delta["deletes"]["users"], [[5]])
+        self.assertNotIn("reservations", delta["upserts"])
+
+
+    def test_sqlite_full_backup_with_deltas(self):
+        Config.BACKUP_FULL_FORMAT = "sqlite"
+        try:
+            backup.trigger_backup(self.db)
+            self._mutate()
+            self.assertIn("incremental", backup.trigger_backup(self.db))
+        finally:
+            Config.BACKUP_FULL_FORMAT = "json"
+        expected = without_settings_version(backup.export_db_to_json(self.db))
+
+        self.db.query(Team).delete()
+        self.db.commit()
+        self.assertIn("snapshot", backup.restore_latest_backup(self.db))
+        self.assertEqual(without_settings_version(backup.export_db_to_json(self.db)), expected)
+
+    def test_full_backup_after_reverted_delta_is_uploaded(self):
+        backup.trigger_backup(self.db)
+        team = self.db.query(Team).one()
+        team.name = "Beta"
+        self.db.commit()
+        self.assertIn("incremental", backup.trigger_backup(self.db))
+        team.name = "Alpha"
+        self.db.commit()
+
+        # Same content as the first snapshot, but the remote still carries the Beta delta
+        msg = backup.trigger_backup(self.db, full=True)
+        self.assertFalse(msg.startswith("Error") or msg.startswith("Sin cambios"), msg)
+        self.assertEqual(backup._load_manifest()["deltas"], [])
+        self.assertEqual(self.db.query(ChangeLog).count(), 0)
+
+        restored = make_session(track_changes=True)
+        try:
+            backup.restore_latest_backup(restored)
+            self.assertEqual(restored.query(Team).one().name, "Alpha")
+        finally:
+            restored.close()
+        self.assertEqual(backup.trigger_backup(self.db, full=True), "Sin cambios desde el último backup; no se subió nada.")
+
+    def test_full_backup_drops_old_deltas(self):
+        backup.trigger_backup(self.db)
+        self._mutate()
+        backup.trigger_backup(self.db)
+        backup.trigger_backup(self.db, full=True)
+        self.assertNotIn("backup.json.delta-0001", self._remote())
+        self.assertEqual(self._restored(), without_settings_version(backup.export_db_to_json(self.db)))
+
+
+
+class TestSqliteSnapshot(unittest.TestCase):
+    def setUp(self):
+        crud.invalidate_settings_cache()
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+        crud.invalidate_settings_cache()
+
+    def _file_session(self):
+        engine = create_engine(f"sqlite:///{os.path.join(self.tmp.name, 'lab.db')}")
+        Base.metadata.create_all(bind=engine)
+        install_change_tracking(engine)
+        return session_factory(engine)()
+
+    def test_file_swap_restores_snapshot(self):
+        db = self._file_session()
+        populate(db)
+        expected = without_settings_version(backup.export_db_to_json(db))
+        buf = io.BytesIO()
+        header = backup.write_sqlite_snapshot(db, buf)
+        self.assertEqual(header["format"], backup.SNAPSHOT_FORMAT)
+        self.assertEqual(header["counts"]["users"], 5)
+
+        db.query(User).delete()
+        db.commit()
+        stats = backup.restore_sqlite_snapshot(db, buf.getvalue())
+
+        self.assertGreater(stats["bytes"], 0)
+        self.assertEqual(without_settings_version(backup.export_db_to_json(db)), expected)
+        self.assertEqual(db.query(ChangeLog).count(), 0)
+        db.get_bind().dispose()
+
+    def test_in_memory_restore_and_corruption(self):
+        db = make_session(track_changes=True)
+        populate(db)
+        expected = without_settings_version(backup.export_db_to_json(db))
+        buf = io.BytesIO()
+        backup.write_sqlite_snapshot(db, buf)
+
+        crud.create_team(db, "Gamma", GroupName.D)
+        backup.restore_sqlite_snapshot(db, buf.getvalue())
+        self.assertEqual(without_settings_version(backup.export_db_to_json(db)), expected)
+
+        raw = bytearray(buf.getvalue())
+        raw[-20] ^= 0xFF
+        with self.assertRaises(Exception):
+            backup.restore_sqlite_snapshot(db, bytes(raw))
+        db.close()
+
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return predicate()
+
+
+class TestAutoBackupStart(unittest.TestCase):
+    def test_worker_not_started_without_backup_destination(self):
+        saved = (Config.AUTO_BACKUP, Config.BACKUP_TRANSPORT)
+        Config.AUTO_BACKUP, Config.BACKUP_TRANSPORT = True, "github"
+        try:
+            with mock.patch.dict(os.environ, {"GITHUB_TOKEN": "", "GITHUB_REPO": ""}):
+                self.assertIsNone(backup_worker.start_auto_backup(lambda: None))
+            self.assertIsNone(backup_worker.get_auto_backup_worker())
+        finally:
+            Config.AUTO_BACKUP, Config.BACKUP_TRANSPORT = saved
+
+
+class TestBackupWorker(unittest.TestCase):
+    def setUp(self):
+        self.db = make_session(track_changes=True)
+        self.factory = session_factory(self.db.get_bind())
+        self.calls = []
+        self.failures = 0
+
+    def tearDown(self):
+        self.worker.stop(flush=False)
+        self.db.close()
+
+    def _backup(self, db):
+        self.calls.append(time.monotonic())
+        if self.failures:
+            self.failures -= 1
+            return "Error al guardar backup: 502 - Bad Gateway"
+        backup.prune_change_log(db, backup.last_change_seq(db))
+        return "Backup guardado en GitHub exitosamente."
+
+    def _start(self, **kwargs):
+        self.worker = BackupWorker(self.factory, backup_fn=self._backup, **kwargs)
+        self.worker.attach()
+        return self.worker.start()
+
+    def test_burst_of_commits_is_one_backup(self):
+        self._start(quiet_period=0.2, max_delay=10)
+        db = self.factory()
+        for i in range(5):
+            crud.create_team(db, f"Team {i}", GroupName.B)
+        db.close()
+        self.assertEqual(self.worker.health()["state"], "pending")
+        self.assertTrue(wait_for(lambda: self.worker.health()["backups_done"] == 1))
+        time.sleep(0.3)
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(self.worker.health()["state"], "idle")
+
+    def test_failures_back_off_and_recover(self):
+        self.failures = 2
+        self._start(quiet_period=0.01, max_delay=10, backoff_base=0.1)
+        crud.create_team(self.factory(), "Alpha", GroupName.B)
+        self.assertTrue(wait_for(lambda: self.worker.health()["backups_done"] == 1))
+
+        health = self.worker.health()
+        self.assertEqual(len(self.calls), 3)
+        self.assertGreaterEqual(self.calls[2] - self.calls[1], 0.2)  # second retry waits twice as long
+        self.assertEqual((health["consecutive_failures"], health["last_error"]), (0, None))
+
+    def test_nothing_to_back_up_skips_backup_fn(self):
+        self._start(quiet_period=0.01)
+        self.worker.notify()
+        self.assertTrue(wait_for(lambda: self.worker.health()["backups_done"] == 1))
+        self.assertEqual(self.calls, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
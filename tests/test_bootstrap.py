@@ -0,0 +1,42 @@
+import unittest
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from sqlalchemy import inspect
+
+from core.config import Config
+from core import bootstrap, crud
+from helpers import memory_engine, session_factory
+
+
+class TestInitializeProcess(unittest.TestCase):
+    def setUp(self):
+        self._auto_backup = Config.AUTO_BACKUP
+        Config.AUTO_BACKUP = False
+        crud.invalidate_settings_cache()
+
+    def tearDown(self):
+        Config.AUTO_BACKUP = self._auto_backup
+        crud.invalidate_settings_cache()
+
+    def test_schema_triggers_and_timings(self):
+        engine = memory_engine()
+        factory = session_factory(engine)
+
+        report = bootstrap.initialize_process(engine, factory)
+
+        self.assertIn("users", inspect(engine).get_table_names())
+        with engine.connect() as conn:
+            triggers = conn.exec_driver_sql("SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger'").scalar()
+        self.assertGreater(triggers, 0)
+        self.assertEqual(
+            list(report["timings"]),
+            ["create_all", "change_tracking", "engine_warmup", "restore_check", "settings_warmup", "auto_backup"]
+        )
+        self.assertIs(bootstrap.get_init_report(), report)
+
+
+if __name__ == '__main__':
+    unittest.main()
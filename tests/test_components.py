@@ -0,0 +1,60 @@
+import unittest
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from core.periods import DAYS, period_label
+from ui import components
+
+
+def entry(day, period, team_name=None, is_robotics_class=False, group_name=None):
+    return {"day_of_week": day, "period": period, "team_id": None, "team_name": team_name,
+            "is_robotics_class": is_robotics_class, "group_name": group_name, "is_manual": False}
+
+
+class TestScheduleFrame(unittest.TestCase):
+    def test_cells_and_out_of_range_entries(self):
+        df = components.build_schedule_frame([
+            entry(0, 1, "Alpha"),
+            entry(4, 13, is_robotics_class=True, group_name="D"),
+            entry(2, 5),
+            entry(5, 1, "Ghost"), entry(1, 14, "Ghost"), entry(-1, 3, "Ghost"),
+        ])
+        self.assertEqual(df.shape, (13, 5))
+        self.assertEqual(df.at[period_label(1), DAYS[0]], "Alpha")
+        self.assertEqual(df.at[period_label(13), DAYS[4]], "Clase Robótica - Grupo D")
+        self.assertEqual(df.at[period_label(5), DAYS[2]], "Reservado")
+        self.assertNotIn("Ghost", df.values)
+        self.assertEqual((df != "").sum().sum(), 3)
+
+    def test_empty_schedule(self):
+        self.assertTrue((components.build_schedule_frame([]) == "").all().all())
+
+
+class TestAvailabilityFrames(unittest.TestCase):
+    def test_slot_round_trip(self):
+        slots = [(0, 1), (0, 13), (2, 7), (4, 13)]
+        df = components.slots_to_frame(slots + [(5, 1), (1, 14)])
+        self.assertEqual(int(df.to_numpy().sum()), 4)
+        self.assertTrue(df.at[period_label(7), DAYS[2]])
+        self.assertEqual(components.frame_to_slots(df), slots)
+        self.assertEqual(components.frame_to_slots(components.slots_to_frame([])), [])
+
+
+class TestTeamHeatmap(unittest.TestCase):
+    def test_labels_and_colors(self):
+        summary = {"member_count": 4, "members": [], "slots": {
+            (0, 1): {"available": 4, "leader": True},
+            (2, 3): {"available": 1, "leader": False},
+        }}
+        labels, css = components.build_heatmap_frames(summary)
+        self.assertEqual(labels.at[period_label(1), DAYS[0]], "4/4 (L)")
+        self.assertEqual(labels.at[period_label(3), DAYS[2]], "1/4")
+        self.assertEqual(css.at[period_label(1), DAYS[0]], "background-color: rgba(46, 160, 67, 0.9)")
+        self.assertEqual(css.at[period_label(2), DAYS[0]], "")
+        labels.style.apply(lambda _: css, axis=None).to_html()
+
+
+if __name__ == '__main__':
+    unittest.main()
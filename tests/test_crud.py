@@ -0,0 +1,408 @@
+import unittest
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from core.config import Config
+from core.models import (
+    Availability, GroupBlock, GroupName, UserRole, Team, SystemSetting, ScheduleVersion, ScheduleState,
+    Reservation, ReservationOutcome, ScheduleArtifact,
+    KEY_FIRST_PERIOD, KEY_MANUAL_MODE, KEY_SCHEDULE_STATUS, KEY_SETTINGS_VERSION
+)
+from core import crud, roster
+from helpers import make_session
+
+
+class TestSlotDiff(unittest.TestCase):
+    def setUp(self):
+        self.db = make_session()
+        self.user = crud.create_user(self.db, "student", "pw", "Student", UserRole.TEAM_MEMBER)
+
+    def tearDown(self):
+        self.db.close()
+
+    def _slots(self):
+        return sorted((a.day_of_week, a.period) for a in crud.get_user_availability(self.db, self.user.id))
+
+    def test_only_changed_rows_are_written(self):
+        crud.set_user_availability(self.db, self.user.id, [(0, 1), (0, 2), (1, 3)])
+        kept_id = next(a.id for a in crud.get_user_availability(self.db, self.user.id)
+                       if (a.day_of_week, a.period) == (0, 1))
+
+        added, removed = crud.set_user_availability(self.db, self.user.id, [(0, 1), (1, 3), (4, 9)])
+
+        self.assertEqual((added, removed), (1, 1))
+        self.assertEqual(self._slots(), [(0, 1), (1, 3), (4, 9)])
+        # Untouched slots keep their original row
+        self.assertIn(kept_id, [a.id for a in self.db.query(Availability).all()])
+
+    def test_no_change_is_a_noop(self):
+        crud.set_user_availability(self.db, self.user.id, [(2, 5)])
+        self.assertEqual(crud.set_user_availability(self.db, self.user.id, [(2, 5)]), (0, 0))
+
+    def test_group_blocks_are_scoped_to_group(self):
+        crud.set_group_blocks(self.db, GroupName.B, [(0, 1), (0, 2)])
+        crud.set_group_blocks(self.db, GroupName.D, [(0, 1)])
+        crud.set_group_blocks(self.db, GroupName.B, [(0, 2)])
+
+        rows = sorted((b.group_name.value, b.day_of_week, b.period) for b in self.db.query(GroupBlock).all())
+        self.assertEqual(rows, [("B", 0, 2), ("D", 0, 1)])
+
+
+class TestWeekMasks(unittest.TestCase):
+    def setUp(self):
+        self.db = make_session()
+        self.user = crud.create_user(self.db, "student", "pw", "Student", UserRole.TEAM_MEMBER)
+        self._storage = Config.SLOT_STORAGE
+
+    def tearDown(self):
+        Config.SLOT_STORAGE = self._storage
+        self.db.close()
+
+    def test_mask_round_trip(self):
+        slots = [(0, 1), (0, 13), (2, 7), (4, 13)]
+        mask = crud.slots_to_mask(slots)
+        self.assertEqual(crud.mask_to_slots(mask), slots)
+        # 5 days x 13 periods needs all 65 bits
+        self.assertEqual(crud.slots_to_mask([(4, 13)]).bit_length(), 65)
+        self.assertEqual(crud.slots_to_mask([(5, 1), (0, 14)]), 0)
+
+    def test_mask_mode_reads_and_writes(self):
+        Config.SLOT_STORAGE = "mask"
+        self.assertEqual(crud.set_user_availability(self.db, self.user.id, [(1, 2), (4, 13)]), (2, 0))
+        self.assertEqual(crud.set_user_availability(self.db, self.user.id, [(4, 13), (3, 3)]), (1, 1))
+        self.assertEqual(crud.get_user_slots(self.db, self.user.id), [(3, 3), (4, 13)])
+        self.assertEqual(self.db.query(Availability).count(), 0)
+
+        crud.set_group_blocks(self.db, GroupName.D, [(0, 5)])
+        self.assertEqual(crud.get_all_group_block_slots(self.db), {(GroupName.D, 0, 5)})
+
+    def test_backfill_matches_row_storage(self):
+        crud.set_user_availability(self.db, self.user.id, [(0, 1), (3, 8)])
+        crud.set_robotics_class_schedule(self.db, self.user.id, GroupName.B, [(2, 4)])
+        counts = crud.backfill_slot_masks(self.db)
+        self.assertEqual(counts["availability_masks"], 1)
+
+        Config.SLOT_STORAGE = "mask"
+        self.assertEqual(crud.get_user_slots(self.db, self.user.id), [(0, 1), (3, 8)])
+        self.assertEqual(
+            crud.get_all_robotics_class_slots(self.db),
+            [{'group_name': GroupName.B, 'day': 2, 'period': 4}]
+        )
+
+
+class TestSettingsCache(unittest.TestCase):
+    def setUp(self):
+        self.db = make_session()
+        self._ttl = Config.SETTINGS_CACHE_TTL
+        Config.SETTINGS_CACHE_TTL = 60
+        crud.invalidate_settings_cache()
+
+    def tearDown(self):
+        Config.SETTINGS_CACHE_TTL = self._ttl
+        self.db.close()
+        crud.invalidate_settings_cache()
+
+    def test_cached_reads_and_version_bump(self):
+        crud.init_system_settings(self.db)
+        self.assertEqual(crud.get_system_setting(self.db, KEY_FIRST_PERIOD), "1")
+        version = crud.get_system_setting(self.db, KEY_SETTINGS_VERSION)
+
+        crud.set_system_setting(self.db, KEY_FIRST_PERIOD, "3")
+        self.assertEqual(crud.get_system_setting(self.db, KEY_FIRST_PERIOD), "3")
+        self.assertEqual(int(crud.get_system_setting(self.db, KEY_SETTINGS_VERSION)), int(version) + 1)
+
+    def test_version_row_is_created_once(self):
+        crud.ensure_settings_version(self.db)
+        crud.set_system_setting(self.db, KEY_MANUAL_MODE, "true")
+        crud.ensure_settings_version(self.db)  # another process starting later: no-op
+        self.assertEqual(self.db.query(SystemSetting.value).filter_by(key=KEY_SETTINGS_VERSION).scalar(), "1")
+
+    def test_other_process_write_is_picked_up_by_version(self):
+        crud.set_system_setting(self.db, KEY_MANUAL_MODE, "false")
+        self.assertEqual(crud.get_system_setting(self.db, KEY_MANUAL_MODE), "false")
+
+        # Simulate another process: write directly, bump the version, let the TTL lapse
+        self.db.query(SystemSetting).filter_by(key=KEY_MANUAL_MODE).update({"value": "true"})
+        self.db.query(SystemSetting).filter_by(key=KEY_SETTINGS_VERSION).update({"value": "99"})
+        self.db.commit()
+        self.assertEqual(crud.get_system_setting(self.db, KEY_MANUAL_MODE), "false")
+
+        crud._settings_cache["checked_at"] = 0.0
+        self.assertEqual(crud.get_system_setting(self.db, KEY_MANUAL_MODE), "true")
+
+
+class TestScheduleVersions(unittest.TestCase):
+    def setUp(self):
+        self.db = make_session()
+        crud.invalidate_settings_cache()
+        crud.invalidate_schedule_cache()
+        self.team = crud.create_team(self.db, "Alpha", GroupName.B)
+
+    def tearDown(self):
+        self.db.close()
+        crud.invalidate_settings_cache()
+
+    def test_drafts_do_not_touch_published_snapshot(self):
+        self.assertEqual(crud.get_published_schedule(self.db), (None, []))
+
+        crud.save_schedule_draft(self.db, [
+            {"team_id": self.team.id, "day_of_week": 0, "period": 1},
+            {"team_id": None, "day_of_week": 1, "period": 2, "is_robotics_class": True, "group_name": GroupName.D},
+        ])
+        self.assertEqual(crud.get_system_setting(self.db, KEY_SCHEDULE_STATUS), ScheduleState.DRAFT)
+        version_id = crud.publish_schedule(self.db)
+
+        # A new draft (and rejecting it) leaves the published version in place
+        crud.save_schedule_draft(self.db, [{"team_id": self.team.id, "day_of_week": 4, "period": 9}])
+        crud.clear_schedule(self.db, keep_manual=False)
+
+        published_id, entries = crud.get_published_schedule(self.db)
+        self.assertEqual(published_id, version_id)
+        self.assertEqual(
+            [(e["day_of_week"], e["period"], e["team_name"], e["group_name"]) for e in entries],
+            [(0, 1, "Alpha", None), (1, 2, None, "D")]
+        )
+
+    def test_manual_booking_after_reject_is_published(self):
+        crud.save_schedule_draft(self.db, [{"team_id": self.team.id, "day_of_week": 0, "period": 1}])
+        crud.publish_schedule(self.db)
+        crud.save_schedule_draft(self.db, [{"team_id": self.team.id, "day_of_week": 4, "period": 9}])
+
+        self.assertEqual(crud.reject_schedule_draft(self.db), ScheduleState.PUBLISHED)
+        self.assertEqual([(e["day_of_week"], e["period"]) for e in crud.get_schedule_entries(self.db)], [(0, 1)])
+
+        outcome = crud.reserve_slot_for_team(self.db, self.team.id, 2, 3, max_per_team=5)
+        self.assertEqual(outcome, ReservationOutcome.CREATED)
+        crud.refresh_published_schedule(self.db)
+        self.assertEqual(
+            [(e["day_of_week"], e["period"], e["is_manual"]) for e in crud.get_published_schedule(self.db)[1]],
+            [(0, 1, False), (2, 3, True)]
+        )
+
+    def test_reject_without_published_version_clears_schedule(self):
+        crud.save_schedule_draft(self.db, [{"team_id": self.team.id, "day_of_week": 0, "period": 1}])
+        self.assertEqual(crud.reject_schedule_draft(self.db), ScheduleState.NONE)
+        self.assertEqual(crud.get_schedule_entries(self.db), [])
+
+    def test_legacy_published_status_is_migrated(self):
+        # A pre-versioning database: PUBLISHED, but no KEY_PUBLISHED_VERSION pointer
+        crud.create_reservation(self.db, self.team.id, 0, 1, is_manual=False)
+        crud.set_system_setting(self.db, KEY_SCHEDULE_STATUS, ScheduleState.PUBLISHED)
+
+        version_id, entries = crud.get_published_schedule(self.db)
+        self.assertIsNotNone(version_id)
+        self.assertEqual([(e["day_of_week"], e["period"], e["team_name"]) for e in entries], [(0, 1, "Alpha")])
+        # Only once: later reads use the new version
+        self.assertEqual(crud.get_published_schedule(self.db)[0], version_id)
+        self.assertEqual(self.db.query(ScheduleVersion).count(), 1)
+
+    def test_draft_status_is_not_migrated(self):
+        crud.create_reservation(self.db, self.team.id, 0, 1, is_manual=False)
+        crud.set_system_setting(self.db, KEY_SCHEDULE_STATUS, ScheduleState.DRAFT)
+        self.assertEqual(crud.get_published_schedule(self.db), (None, []))
+
+    def test_old_versions_are_pruned(self):
+        for _ in range(crud.MAX_SCHEDULE_VERSIONS + 3):
+            latest = crud.publish_schedule(self.db)
+        self.assertEqual(self.db.query(ScheduleVersion).count(), crud.MAX_SCHEDULE_VERSIONS)
+        self.assertEqual(crud.get_published_schedule(self.db)[0], latest)
+        self.assertEqual(
+            self.db.query(ScheduleArtifact.version_id).distinct().count(), crud.MAX_SCHEDULE_VERSIONS
+        )
+
+    def test_feeds_are_stored_at_publish(self):
+        self.assertEqual(crud.get_schedule_feed(self.db, "lab"), (None, None))
+        crud.create_reservation(self.db, self.team.id, 0, 1, is_manual=False)
+        version_id = crud.publish_schedule(self.db)
+
+        keys = {k for (k,) in self.db.query(ScheduleArtifact.key).filter_by(version_id=version_id)}
+        self.assertEqual(keys, {"lab", f"team-{self.team.id}"})
+        published_id, content = crud.get_schedule_feed(self.db, f"team-{self.team.id}")
+        self.assertEqual(published_id, version_id)
+        self.assertIn("SUMMARY:Laboratorio de Robótica - Alpha", content)
+
+        # Unscheduled groups get an empty calendar; unknown keys nothing
+        self.assertNotIn("BEGIN:VEVENT", crud.get_schedule_feed(self.db, "group-D")[1])
+        self.assertEqual(crud.get_schedule_feed(self.db, "bogus"), (None, None))
+
+        # Versions without artifacts (e.g. after a JSON restore) get them rebuilt on read
+        self.db.query(ScheduleArtifact).delete()
+        self.db.commit()
+        self.assertEqual(crud.get_schedule_feed(self.db, f"team-{self.team.id}")[1], content)
+        self.assertEqual(self.db.query(ScheduleArtifact).count(), 2)
+
+
+class TestManualReservation(unittest.TestCase):
+    def setUp(self):
+        self.db = make_session()
+        self.alpha = crud.create_team(self.db, "Alpha", GroupName.B)
+        self.beta = crud.create_team(self.db, "Beta", GroupName.D)
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_slot_conflict_and_quota(self):
+        reserve = crud.reserve_slot_for_team
+        self.assertEqual(reserve(self.db, self.alpha.id, 0, 1, 2), ReservationOutcome.CREATED)
+        self.assertEqual(reserve(self.db, self.beta.id, 0, 1, 2), ReservationOutcome.SLOT_TAKEN)
+        self.assertEqual(reserve(self.db, self.alpha.id, 0, 2, 2), ReservationOutcome.CREATED)
+        self.assertEqual(reserve(self.db, self.alpha.id, 0, 3, 2), ReservationOutcome.QUOTA_EXCEEDED)
+
+        rows = self.db.query(Reservation.team_id, Reservation.is_manual).all()
+        self.assertEqual(sorted(rows), [(self.alpha.id, True), (self.alpha.id, True)])
+
+    def test_generated_reservations_count_toward_quota(self):
+        crud.save_schedule_draft(self.db, [{"team_id": self.alpha.id, "day_of_week": 1, "period": 1}])
+        reserve = crud.reserve_slot_for_team
+        self.assertEqual(reserve(self.db, self.alpha.id, 0, 1, 2), ReservationOutcome.CREATED)
+        self.assertEqual(reserve(self.db, self.alpha.id, 0, 2, 2), ReservationOutcome.QUOTA_EXCEEDED)
+
+
+class TestTeamAvailabilitySummary(unittest.TestCase):
+    def setUp(self):
+        self.db = make_session()
+        self._storage = Config.SLOT_STORAGE
+        team = crud.create_team(self.db, "Alpha", GroupName.B)
+        self.team_id = team.id
+        self.leader = crud.create_user(self.db, "leader", "pw", "Leader", UserRole.TEAM_LEADER, team_id=team.id)
+        self.member = crud.create_user(self.db, "member", "pw", "Member", UserRole.TEAM_MEMBER, team_id=team.id)
+        self.idle = crud.create_user(self.db, "idle", "pw", "Idle", UserRole.TEAM_MEMBER, team_id=team.id)
+        crud.create_user(self.db, "outsider", "pw", "Outsider", UserRole.TEAM_MEMBER)
+
+    def tearDown(self):
+        Config.SLOT_STORAGE = self._storage
+        self.db.close()
+
+    def _check(self):
+        crud.set_user_availability(self.db, self.leader.id, [(0, 1), (0, 2)])
+        crud.set_user_availability(self.db, self.member.id, [(0, 2), (3, 5)])
+        summary = crud.get_team_availability_summary(self.db, self.team_id)
+
+        self.assertEqual(summary["member_count"], 3)
+        self.assertEqual([m["slots"] for m in summary["members"]], [2, 2, 0])
+        self.assertEqual(summary["slots"], {
+            (0, 1): {"available": 1, "leader": True},
+            (0, 2): {"available": 2, "leader": True},
+            (3, 5): {"available": 1, "leader": False},
+        })
+
+    def test_row_storage(self):
+        self._check()
+
+    def test_mask_storage(self):
+        Config.SLOT_STORAGE = "mask"
+        self._check()
+
+
+class TestReadinessReport(unittest.TestCase):
+    def setUp(self):
+        self.db = make_session()
+        self._storage = Config.SLOT_STORAGE
+
+    def tearDown(self):
+        Config.SLOT_STORAGE = self._storage
+        self.db.close()
+
+    def _check(self):
+        alpha = crud.create_team(self.db, "Alpha", GroupName.B)
+        beta = crud.create_team(self.db, "Beta", GroupName.B)
+        crud.create_team(self.db, "Gamma", GroupName.D)
+        a1 = crud.create_user(self.db, "a1", "pw", "A1", UserRole.TEAM_LEADER, team_id=alpha.id)
+        a2 = crud.create_user(self.db, "a2", "pw", "A2", UserRole.TEAM_MEMBER, team_id=alpha.id)
+        crud.create_user(self.db, "b1", "pw", "B1", UserRole.TEAM_LEADER, team_id=beta.id)
+        crud.set_user_availability(self.db, a1.id, [(0, 1), (0, 3), (1, 4)])
+        crud.set_user_availability(self.db, a2.id, [(1, 4), (2, 5)])
+        crud.set_group_blocks(self.db, GroupName.B, [(0, 3), (1, 1)])
+        crud.lock_team_availability(self.db, alpha.id)
+
+        report = crud.get_readiness_report(self.db, first_period=3)
+        teams = {t["name"]: t for t in report["teams"]}
+        # (0, 1) is before the first period and (0, 3) is blocked for group B
+        self.assertEqual(
+            {k: teams["Alpha"][k] for k in ("is_locked", "members", "submitted", "open_slots")},
+            {"is_locked": True, "members": 2, "submitted": 2, "open_slots": 2}
+        )
+        self.assertEqual((teams["Beta"]["submitted"], teams["Gamma"]["members"]), (0, 0))
+
+        group_b, group_d = report["groups"]
+        self.assertEqual((group_b["teams"], group_b["locked"], group_b["members"]), (2, 1, 3))
+        self.assertEqual((group_b["blocked"], group_b["unblocked"]), (1, 5 * 11 - 1))
+        self.assertEqual(group_d["unblocked"], 5 * 11)
+
+    def test_row_storage(self):
+        self._check()
+
+    def test_mask_storage(self):
+        Config.SLOT_STORAGE = "mask"
+        self._check()
+
+
+class TestSearchUsers(unittest.TestCase):
+    def setUp(self):
+        self.db = make_session()
+        self.team = crud.create_team(self.db, "Alpha", GroupName.B)
+        for i in range(7):
+            crud.create_user(self.db, f"student{i}", "pw", f"Ana {i}", UserRole.TEAM_MEMBER, team_id=self.team.id)
+        crud.create_user(self.db, "chief_b", "pw", "Jefe 100%", UserRole.GROUP_CHIEF, group_name=GroupName.B)
+        crud.create_user(self.db, "bob", "pw", "Roberto", UserRole.TEAM_MEMBER)
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_pagination_and_filters(self):
+        rows, total = crud.search_users(self.db, team_id=self.team.id, limit=3, offset=6)
+        self.assertEqual((total, [r["username"] for r in rows]), (7, ["student6"]))
+        self.assertEqual(rows[0]["team_name"], "Alpha")
+
+        rows, total = crud.search_users(self.db, role=UserRole.TEAM_MEMBER, name_prefix="ro")
+        self.assertEqual((total, rows[0]["username"], rows[0]["team_name"]), (1, "bob", None))
+        self.assertEqual(crud.search_users(self.db, name_prefix="STUDENT")[1], 7)
+        self.assertEqual(crud.search_users(self.db, group_name=GroupName.B)[1], 1)
+        # LIKE wildcards in the prefix are matched literally
+        self.assertEqual(crud.search_users(self.db, name_prefix="Jefe 100%")[1], 1)
+        self.assertEqual(crud.search_users(self.db, name_prefix="%")[1], 0)
+
+
+class TestRosterImport(unittest.TestCase):
+    def setUp(self):
+        self.db = make_session()
+        crud.create_team(self.db, "Alpha", GroupName.B)
+        crud.create_user(self.db, "taken", "pw", "Taken", UserRole.TEAM_MEMBER)
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_valid_rows_imported_in_one_go_and_errors_reported(self):
+        csv_text = "\n".join([
+            "username,full_name,password,role,team,group",
+            "ana,Ana,pw1,team_leader,Alpha,",
+            "beto,Beto,pw2,,Omega,D",
+            "carla,Carla,pw3,,Omega,",
+            "taken,Someone,pw,,,",
+            "dup,Dup,pw,,,",
+            "dup,Dup Again,pw,,,",
+            "eve,Eve,pw,WIZARD,,",
+            "fran,Fran,,,,",
+            "gus,Gus,pw,,Nowhere,",
+            "hugo,Hugo,pw,,Alpha,D",
+        ])
+        result = roster.import_roster(self.db, csv_text.encode(), workers=1)
+
+        self.assertEqual((result["users_created"], result["teams_created"]), (4, 1))
+        self.assertEqual([line for line, _ in result["errors"]], [5, 7, 8, 9, 10, 11])
+        self.assertEqual(result["errors"][-1][1], "El equipo Alpha es del grupo B, no del D")
+        omega = self.db.query(Team).filter_by(name="Omega").one()
+        self.assertEqual(omega.group_name, GroupName.D)
+        carla = crud.get_user_by_username(self.db, "carla")
+        self.assertEqual((carla.team_id, carla.role), (omega.id, UserRole.TEAM_MEMBER))
+        self.assertTrue(crud.verify_password("pw1", crud.get_user_by_username(self.db, "ana").password_hash))
+
+    def test_pool_hashing_matches_inline(self):
+        hashes = roster.hash_passwords([f"pw{i}" for i in range(10)], workers=2)
+        self.assertTrue(all(crud.verify_password(f"pw{i}", h) for i, h in enumerate(hashes)))
+
+
+if __name__ == '__main__':
+    unittest.main()
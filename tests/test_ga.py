@@ -57,5 +57,37 @@ class TestGAEngine(unittest.TestCase):
         # Ensure distinct slots (implicit in GA representation)
         self.assertEqual(len(schedule), len(assigned_slots), "Duplicate slots found")
 
+class TestGARunControls(unittest.TestCase):
+    teams_data = [
+        {'id': 1, 'name': 'Team 1', 'group_name': 'B', 'members': [{'id': 101, 'role': 'TEAM_LEADER'}]},
+        {'id': 2, 'name': 'Team 2', 'group_name': 'D', 'members': [{'id': 102, 'role': 'TEAM_LEADER'}]},
+    ]
+    availabilities = {101: {(0, 1), (1, 2)}, 102: {(0, 2), (2, 5)}}
+    group_blocks = {('B', 0, 2), ('D', 0, 1)}
+    robotics_class_slots = [{'group_name': 'B', 'day': 4, 'period': 1}]
+
+    def engine(self, seed=None):
+        return GeneticAlgorithmEngine(
+            self.teams_data, self.availabilities, self.group_blocks, self.robotics_class_slots, seed=seed
+        )
+
+    def test_seed_makes_runs_reproducible(self):
+        self.assertEqual(self.engine(7).run(generations=5, pop_size=8), self.engine(7).run(generations=5, pop_size=8))
+
+    def test_time_budget_stops_early(self):
+        ga = self.engine(1)
+        ga.run(generations=10 ** 6, pop_size=8, time_budget=0.2)
+        self.assertLess(ga.generations_run, 10 ** 6)
+
+    def test_score_matches_run_fitness(self):
+        ga = self.engine(3)
+        schedule = ga.run(generations=5, pop_size=8)
+        self.assertEqual(ga.score(schedule), ga.best_fitness)
+        self.assertEqual(ga.decode_chromosome(ga.encode_schedule(schedule)), schedule)
+
+        blocked = [{'team_id': 1, 'day_of_week': 0, 'period': 2}]
+        self.assertEqual(ga.score(blocked), -float('inf'))
+
+
 if __name__ == '__main__':
     unittest.main()
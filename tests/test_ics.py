@@ -0,0 +1,68 @@
+import unittest
+import sys
+import os
+import datetime
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from core import ics
+
+
+def entry(day, period, team_id=None, team_name=None, robotics=False, group=None):
+    return {"day_of_week": day, "period": period, "team_id": team_id, "team_name": team_name,
+            "is_robotics_class": robotics, "group_name": group, "is_manual": False}
+
+
+class TestIcsFeeds(unittest.TestCase):
+    published_at = datetime.datetime(2026, 10, 21, 15, 30)  # a Wednesday
+
+    def test_merge_periods_stops_at_breaks(self):
+        # P2 ends 8:40 and P3 starts 9:10 (break), so they are not merged
+        self.assertEqual(ics.merge_periods([1, 2, 3, 4, 6]), [(1, 2), (3, 4), (6, 6)])
+
+    def test_feeds_and_events(self):
+        entries = [
+            entry(0, 1, 5, "Alpha"), entry(0, 2, 5, "Alpha"), entry(2, 9, 5, "Alpha"),
+            entry(1, 3, robotics=True, group="B"), entry(1, 4, robotics=True, group="B"),
+            entry(4, 1, 7, "Beta, Gamma"),
+        ]
+        feeds = ics.build_feeds(entries, 3, self.published_at)
+        self.assertEqual(set(feeds), {"lab", "team-5", "team-7", "group-B"})
+
+        team = feeds["team-5"]
+        self.assertEqual(team.count("BEGIN:VEVENT"), 2)
+        self.assertIn("DTSTART:20261019T070000\r\nDTEND:20261019T084000\r\n", team)
+        self.assertIn("DTSTART:20261021T141000\r\n", team)
+        self.assertIn("RRULE:FREQ=WEEKLY\r\n", team)
+        self.assertIn("UID:team-5-d0-p1@robolab-schedule\r\n", team)
+        self.assertIn("SEQUENCE:3\r\n", team)
+        self.assertTrue(team.startswith("BEGIN:VCALENDAR\r\nVERSION:2.0\r\n"))
+        self.assertTrue(team.endswith("END:VCALENDAR\r\n"))
+
+        self.assertEqual(feeds["group-B"].count("BEGIN:VEVENT"), 1)
+        self.assertIn("DTEND:20261020T105000", feeds["group-B"])
+        self.assertEqual(feeds["lab"].count("BEGIN:VEVENT"), 4)
+        self.assertIn("SUMMARY:Laboratorio de Robótica - Beta\\, Gamma", feeds["lab"])
+
+    def test_uids_are_stable_across_versions(self):
+        entries = [entry(0, 1, 5, "Alpha")]
+        first = ics.build_feeds(entries, 1, self.published_at)["team-5"]
+        later = ics.build_feeds(entries, 2, self.published_at + datetime.timedelta(days=7))["team-5"]
+        uid = [line for line in first.split("\r\n") if line.startswith("UID:")]
+        self.assertEqual(uid, [line for line in later.split("\r\n") if line.startswith("UID:")])
+
+    def test_long_lines_are_folded(self):
+        feeds = ics.build_feeds([entry(0, 1, 5, "Equipo " + "ñ" * 80)], 1, self.published_at)
+        for line in feeds["team-5"].split("\r\n"):
+            self.assertLessEqual(len(line.encode("utf-8")), 75)
+
+    def test_feed_keys(self):
+        self.assertTrue(ics.is_feed_key("lab"))
+        self.assertTrue(ics.is_feed_key("team-12"))
+        self.assertTrue(ics.is_feed_key(ics.group_feed_key("D")))
+        self.assertFalse(ics.is_feed_key("team-x"))
+        self.assertFalse(ics.is_feed_key("group-Z"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+import unittest
+import sys
+import os
+import io
+import json
+import tempfile
+import contextlib
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from core.config import Config
+from core.models import GroupName, UserRole
+from core import crud
+from engine import load_engine
+from scripts import schedule_cli
+from helpers import make_session
+
+
+class TestScheduleCli(unittest.TestCase):
+    def setUp(self):
+        self._rounds = Config.BCRYPT_ROUNDS
+        Config.BCRYPT_ROUNDS = 4
+        self.db = make_session()
+        crud.invalidate_settings_cache()
+        alpha = crud.create_team(self.db, "Alpha", GroupName.B)
+        beta = crud.create_team(self.db, "Beta", GroupName.D)
+        lead_a = crud.create_user(self.db, "a", "x", "A", UserRole.TEAM_LEADER, alpha.id, GroupName.B)
+        lead_b = crud.create_user(self.db, "b", "x", "B", UserRole.TEAM_LEADER, beta.id, GroupName.D)
+        crud.set_user_availability(self.db, lead_a.id, [(0, 1), (1, 2)])
+        crud.set_user_availability(self.db, lead_b.id, [(0, 2), (3, 4)])
+        crud.set_group_blocks(self.db, GroupName.B, [(0, 2)])
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        Config.BCRYPT_ROUNDS = self._rounds
+        self.db.close()
+        self.tmp.cleanup()
+        crud.invalidate_settings_cache()
+
+    def path(self, name):
+        return os.path.join(self.tmp.name, name)
+
+    def run_cli(self, *argv):
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out), contextlib.redirect_stderr(io.StringIO()):
+            code = schedule_cli.main(list(argv))
+        return code, out.getvalue()
+
+    def test_ga_inputs_from_database(self):
+        inputs = crud.get_ga_inputs(self.db)
+        self.assertEqual([t["name"] for t in inputs["teams_data"]], ["Alpha", "Beta"])
+        self.assertEqual([len(t["members"]) for t in inputs["teams_data"]], [1, 1])
+        self.assertEqual(inputs["group_blocks"], {(GroupName.B, 0, 2)})
+        self.assertEqual(inputs["first_period"], 1)
+
+    def test_snapshot_round_trip_gives_same_schedule(self):
+        inputs = crud.get_ga_inputs(self.db)
+        snapshot = json.loads(json.dumps(schedule_cli.dump_ga_inputs(inputs)))
+        from_db = load_engine("ga")(**inputs, seed=5).run(generations=5, pop_size=8)
+        from_json = load_engine("ga")(**schedule_cli.load_ga_inputs(snapshot), seed=5).run(generations=5, pop_size=8)
+        self.assertEqual(from_db, from_json)
+        with self.assertRaises(ValueError):
+            schedule_cli.load_ga_inputs({"format": "other"})
+
+    def test_generate_and_score_from_snapshot(self):
+        with open(self.path("inputs.json"), "w", encoding="utf-8") as f:
+            json.dump(schedule_cli.dump_ga_inputs(crud.get_ga_inputs(self.db)), f)
+
+        code, _ = self.run_cli("generate", "--inputs", self.path("inputs.json"), "--seed", "3",
+                               "--generations", "10", "--pop-size", "8", "--output", self.path("out.json"))
+        self.assertEqual(code, 0)
+        with open(self.path("out.json"), encoding="utf-8") as f:
+            generated = json.load(f)
+        self.assertEqual(generated["seed"], 3)
+        self.assertEqual(generated["generations_run"], 10)
+
+        code, out = self.run_cli("score", "--inputs", self.path("inputs.json"), "--schedule", self.path("out.json"))
+        self.assertEqual(code, 0)
+        report = json.loads(out)
+        self.assertTrue(report["valid"])
+        self.assertAlmostEqual(report["fitness"], generated["fitness"])
+        self.assertEqual(report["reservations"], sum(1 for e in generated["schedule"] if e["team_id"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,134 @@
+import unittest
+import sys
+import os
+import json
+import threading
+import http.client
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from core.models import GroupName, ScheduleArtifact, ScheduleVersion
+from core import crud
+from core.schedule_export import create_server, etag_matches
+from helpers import make_session_factory
+
+
+class TestScheduleServer(unittest.TestCase):
+    def setUp(self):
+        self.factory = make_session_factory()
+        self.db = self.factory()
+        crud.invalidate_settings_cache()
+        crud.invalidate_schedule_cache()
+        self.alpha = crud.create_team(self.db, "Alpha", GroupName.B)
+        self.beta = crud.create_team(self.db, "Beta", GroupName.D)
+        crud.create_reservation(self.db, self.alpha.id, 0, 1, is_manual=False)
+        crud.create_reservation(self.db, self.beta.id, 2, 3, is_manual=False)
+
+        self.server = create_server("127.0.0.1", 0, session_factory=self.factory)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.db.close()
+        crud.invalidate_settings_cache()
+        crud.invalidate_schedule_cache()
+
+    def get(self, path, headers=None):
+        conn = http.client.HTTPConnection("127.0.0.1", self.server.server_port, timeout=5)
+        try:
+            conn.request("GET", path, headers=headers or {})
+            response = conn.getresponse()
+            return response.status, dict(response.getheaders()), response.read()
+        finally:
+            conn.close()
+
+    def test_not_published_and_unknown_route(self):
+        self.assertEqual(self.get("/schedule.json")[0], 404)
+        self.assertEqual(self.get("/nope")[0], 404)
+        self.assertEqual(self.get("/health")[0], 200)
+
+    def test_json_csv_and_filters(self):
+        version = crud.publish_schedule(self.db)
+
+        status, headers, body = self.get("/schedule.json")
+        self.assertEqual(status, 200)
+        payload = json.loads(body)
+        self.assertEqual(payload["version"], version)
+        self.assertEqual([e["team_name"] for e in payload["entries"]], ["Alpha", "Beta"])
+        self.assertEqual(payload["entries"][0]["day"], "Lunes")
+        self.assertEqual(payload["entries"][0]["time"], "7:00 - 7:50")
+
+        team_only = json.loads(self.get(f"/schedule.json?team_id={self.beta.id}")[2])
+        self.assertEqual([e["team_name"] for e in team_only["entries"]], ["Beta"])
+        group_only = json.loads(self.get("/schedule.json?group=b")[2])
+        self.assertEqual([e["team_name"] for e in group_only["entries"]], ["Alpha"])
+        self.assertEqual(self.get("/schedule.json?team_id=x")[0], 400)
+
+        status, headers, body = self.get("/schedule.csv")
+        self.assertEqual(status, 200)
+        self.assertTrue(headers["Content-Type"].startswith("text/csv"))
+        lines = body.decode("utf-8").splitlines()
+        self.assertTrue(lines[0].startswith("day_of_week,day,period"))
+        self.assertEqual(len(lines), 3)
+
+    def test_etag_revalidation_follows_published_version(self):
+        crud.publish_schedule(self.db)
+        status, headers, _ = self.get("/schedule.json")
+        etag = headers["ETag"]
+
+        status, headers, body = self.get("/schedule.json", {"If-None-Match": etag})
+        self.assertEqual(status, 304)
+        self.assertEqual(body, b"")
+        self.assertEqual(headers["ETag"], etag)
+
+        # A new publish changes the ETag
+        crud.create_reservation(self.db, self.alpha.id, 4, 5, is_manual=False)
+        crud.publish_schedule(self.db)
+        crud.invalidate_settings_cache()
+        status, headers, body = self.get("/schedule.json", {"If-None-Match": etag})
+        self.assertEqual(status, 200)
+        self.assertNotEqual(headers["ETag"], etag)
+        self.assertEqual(len(json.loads(body)["entries"]), 3)
+
+    def test_etag_changes_when_a_restore_reuses_the_version_id(self):
+        version = crud.publish_schedule(self.db)
+        etag = self.get("/schedule.json")[1]["ETag"]
+        feed_etag = self.get("/calendar/lab.ics")[1]["ETag"]
+
+        # Like a restore of an older backup: same version id, different content
+        self.db.query(ScheduleArtifact).delete()
+        self.db.query(ScheduleVersion).delete()
+        self.db.commit()
+        crud.create_reservation(self.db, self.alpha.id, 4, 5, is_manual=False)
+        self.assertEqual(crud.publish_schedule(self.db), version)
+        crud.invalidate_schedule_cache()
+
+        status, headers, body = self.get("/schedule.json", {"If-None-Match": etag})
+        self.assertEqual(status, 200)
+        self.assertEqual(len(json.loads(body)["entries"]), 3)
+        status, _, body = self.get("/calendar/lab.ics", {"If-None-Match": feed_etag})
+        self.assertEqual(status, 200)
+        self.assertEqual(body.count(b"BEGIN:VEVENT"), 3)
+
+    def test_calendar_feeds(self):
+        self.assertEqual(self.get("/calendar/lab.ics")[0], 404)
+        crud.publish_schedule(self.db)
+
+        status, headers, body = self.get(f"/calendar/team-{self.alpha.id}.ics")
+        self.assertEqual(status, 200)
+        self.assertTrue(headers["Content-Type"].startswith("text/calendar"))
+        self.assertIn(b"SUMMARY:Laboratorio de Rob", body)
+        self.assertEqual(self.get(f"/calendar/team-{self.alpha.id}.ics", {"If-None-Match": headers["ETag"]})[0], 304)
+        self.assertEqual(self.get("/calendar/lab.ics")[2].count(b"BEGIN:VEVENT"), 2)
+        self.assertEqual(self.get("/calendar/nope.ics")[0], 404)
+
+    def test_etag_matches(self):
+        self.assertTrue(etag_matches('"a", W/"b"', '"b"'))
+        self.assertTrue(etag_matches("*", '"b"'))
+        self.assertFalse(etag_matches('"a"', '"b"'))
+        self.assertFalse(etag_matches(None, '"b"'))
+
+
+if __name__ == "__main__":
+    unittest.main()
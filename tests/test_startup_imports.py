@@ -0,0 +1,17 @@
+import unittest
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from scripts.import_report import measure_imports, eager_lazy_modules
+
+
+class TestStartupImports(unittest.TestCase):
+    def test_dashboards_engine_and_backup_load_lazily(self):
+        rows = measure_imports("app")
+        self.assertIn("app", [name for _, _, name in rows])
+        self.assertEqual(eager_lazy_modules(rows), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
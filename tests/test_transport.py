@@ -0,0 +1,172 @@
+import unittest
+from unittest import mock
+import base64
+import hashlib
+import json
+import re
+import tempfile
+import threading
+import sys
+import os
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from core.transport import GitHubTransport, LocalDirTransport, TransportError
+
+
+class StubGitRepo:
+    """Just enough of the GitHub git data API (refs, commits, trees, blobs) to back a transport."""
+
+    def __init__(self):
+        self.objects = {}
+        self.requests = []
+        self.truncated = False
+        root_tree = self._store({"type": "tree", "entries": {}})
+        self.head = self._store({"type": "commit", "tree": root_tree, "parents": []})
+
+    def _store(self, obj):
+        sha = hashlib.sha1(json.dumps(obj, sort_keys=True, default=str).encode()).hexdigest()
+        self.objects[sha] = obj
+        return sha
+
+    def handle(self, method, path, body):
+        self.requests.append((method, path))
+        path = path.split("?")[0]
+        if method == "GET" and re.fullmatch(r".*/git/ref/heads/main", path):
+            return 200, {"object": {"sha": self.head}}
+        if method == "PATCH" and path.endswith("/git/refs/heads/main"):
+            self.head = body["sha"]
+            return 200, {"object": {"sha": self.head}}
+        match = re.fullmatch(r".*/git/(commits|trees|blobs)(?:/(\w+))?", path)
+        kind, sha = match.groups()
+        if method == "GET":
+            obj = self.objects[sha]
+            if kind == "commits":
+                return 200, {"sha": sha, "tree": {"sha": obj["tree"]}}
+            if kind == "trees":
+                return 200, {"sha": sha, "truncated": self.truncated, "tree": [
+                    {"path": p, "type": "blob", "sha": s} for p, s in obj["entries"].items()
+                ]}
+            return 200, {"sha": sha, "content": base64.b64encode(obj["data"]).decode(), "encoding": "base64"}
+        if kind == "blobs":
+            return 201, {"sha": self._store({"type": "blob", "data": base64.b64decode(body["content"])})}
+        if kind == "trees":
+            entries = dict(self.objects[body["base_tree"]]["entries"])
+            for entry in body["tree"]:
+                if entry["sha"] is None:
+                    entries.pop(entry["path"])
+                else:
+                    entries[entry["path"]] = entry["sha"]
+            return 201, {"sha": self._store({"type": "tree", "entries": entries})}
+        return 201, {"sha": self._store({"type": "commit", "tree": body["tree"], "parents": body["parents"]})}
+
+    def files(self):
+        tree = self.objects[self.objects[self.head]["tree"]]
+        return {p: self.objects[s]["data"] for p, s in tree["entries"].items()}
+
+
+def start_stub_server(repo):
+    class Handler(BaseHTTPRequestHandler):
+        def _respond(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            body = json.loads(self.rfile.read(length)) if length else None
+            status, payload = repo.handle(self.command, self.path, body)
+            raw = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(raw)))
+            self.end_headers()
+            self.wfile.write(raw)
+
+        do_GET = do_POST = do_PATCH = _respond
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class TestGitHubTransport(unittest.TestCase):
+    def setUp(self):
+        self.repo = StubGitRepo()
+        self.server = start_stub_server(self.repo)
+        self.transport = GitHubTransport(
+            "token", "owner/repo", api_url=f"http://127.0.0.1:{self.server.server_port}", chunk_size=1000
+        )
+
+    def tearDown(self):
+        self.transport.session.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_large_file_is_chunked_in_one_commit(self):
+        raw = os.urandom(2500)
+        self.transport.put({"backup.json": raw, "backup.json.manifest.json": b"{}"})
+
+        self.assertEqual(sorted(self.repo.files()), [
+            "backup.json.chunks.json", "backup.json.manifest.json",
+            "backup.json.part-0000", "backup.json.part-0001", "backup.json.part-0002",
+        ])
+        self.assertEqual(sum(1 for m, _ in self.repo.requests if m == "PATCH"), 1)
+        self.assertEqual(self.transport.get("backup.json"), raw)
+
+    def test_shrinking_file_removes_stale_chunks(self):
+        self.transport.put({"backup.json": os.urandom(2500)})
+        self.transport.put({"backup.json": b"small"})
+        self.assertEqual(self.repo.files(), {"backup.json": b"small"})
+        self.assertEqual(self.transport.get("backup.json"), b"small")
+        self.assertIsNone(self.transport.get("missing.json"))
+
+    def test_growing_file_removes_the_whole_copy(self):
+        self.transport.put({"backup.json": b"small"})
+        raw = os.urandom(2500)
+        self.transport.put({"backup.json": raw})
+        self.assertNotIn("backup.json", self.repo.files())
+        self.assertEqual(self.transport.get("backup.json"), raw)
+
+    def test_truncated_listing_is_an_error(self):
+        self.repo.truncated = True
+        with self.assertRaises(TransportError):
+            self.transport.get("backup.json")
+
+    def test_corrupt_chunk_is_rejected(self):
+        self.transport.put({"backup.json": os.urandom(2500)})
+        self.transport.put_files({"backup.json.part-0001": b"tampered"}, "corrupt")
+        with self.assertRaises(TransportError):
+            self.transport.get("backup.json")
+
+
+class TestLocalDirTransport(unittest.TestCase):
+    def test_round_trip_and_delete(self):
+        with tempfile.TemporaryDirectory() as root:
+            transport = LocalDirTransport(root, chunk_size=1000)
+            raw = os.urandom(1500)
+            transport.put({"backup.json": raw, "backup.json.delta-0001": b"delta"})
+            self.assertEqual(transport.get("backup.json"), raw)
+            self.assertEqual(len([n for n in os.listdir(root) if ".part-" in n]), 2)
+
+            transport.put({"backup.json.delta-0001": None})
+            self.assertIsNone(transport.get("backup.json.delta-0001"))
+
+    def test_new_files_are_written_before_old_ones_are_deleted(self):
+        with tempfile.TemporaryDirectory() as root:
+            transport = LocalDirTransport(root)
+            transport.put({"backup.json.delta-0001": b"delta"})
+            manifest = os.path.join(root, "backup.json.manifest.json")
+            removed = []
+            real_remove = os.remove
+
+            def remove(path):
+                # The manifest that stops referencing the delta must already be on disk
+                removed.append(os.path.exists(manifest))
+                real_remove(path)
+
+            with mock.patch("core.transport.os.remove", side_effect=remove):
+                transport.put_files({"backup.json.delta-0001": None, "backup.json.manifest.json": b"{}"}, "msg")
+            self.assertEqual(removed, [True])
+
+
+if __name__ == '__main__':
+    unittest.main()